@@ -0,0 +1,60 @@
+"""
+chunked転送のデコードのベンチマーク
+
+    python -m benchmarks.bench_chunked
+"""
+
+import io
+import time
+
+from src.network import ChunkedDecoder
+
+
+def encode_chunks(n: int, size: int) -> bytes:
+    chunk = b"%x\r\n" % size + b"x" * size + b"\r\n"
+    return chunk * n + b"0\r\n\r\n"
+
+
+def old_unchunked(response):
+    """以前の実装(bytesの+=でつなげる)。コピー量も数える"""
+    body = b""
+    copied = 0
+    while True:
+        chunk_size = int(response.readline().rstrip(), 16)
+        if chunk_size == 0:
+            break
+        body += response.read(chunk_size)
+        copied += len(body)
+        response.read(2)
+    return body, copied
+
+
+def main():
+    size = 16
+    print(
+        "{:>8} {:>12} {:>14} {:>12} {:>14}".format(
+            "chunks", "old [s]", "old copied", "new [s]", "new copied"
+        )
+    )
+    for n in (1_000, 10_000, 30_000, 100_000):
+        data = encode_chunks(n, size)
+        if n <= 30_000:
+            start = time.perf_counter()
+            _, old_copied = old_unchunked(io.BufferedReader(io.BytesIO(data)))
+            old_time = "{:.4f}".format(time.perf_counter() - start)
+        else:
+            # 二乗で遅くなるので大きいものは測らない
+            old_time, old_copied = "-", "-"
+        start = time.perf_counter()
+        decoder = ChunkedDecoder(io.BufferedReader(io.BytesIO(data)))
+        decoder.read_all()
+        new_time = time.perf_counter() - start
+        print(
+            "{:>8} {:>12} {:>14} {:>12.4f} {:>14}".format(
+                n, old_time, old_copied, new_time, decoder.bytes_copied
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+オブジェクトのDOMと配列のDOM(ColumnarParser)の比較
+
+    python -m benchmarks.bench_columnar
+"""
+
+import gc
+import time
+import tracemalloc
+
+from benchmarks.bench_html_parse import make_document
+from src.columnar import ColumnarParser
+from src.text import HTMLParser
+
+
+def build(parser_class, body: str):
+    gc.collect()
+    start = time.perf_counter()
+    parser = parser_class(body)
+    tree = parser.parse()
+    return parser, tree, time.perf_counter() - start
+
+
+def retained_bytes(parser_class, body: str) -> int:
+    gc.collect()
+    tracemalloc.start()
+    parser = parser_class(body)
+    parser.parse()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def gc_pause(rounds: int = 5) -> float:
+    """木を持ったままフルGCにかかる時間(最小値)"""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        gc.collect()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(
+        "{:>4} {:>10} {:>10} {:>10} {:>12} {:>10}".format(
+            "MB", "DOM", "build [s]", "mem [MB]", "GC objects", "GC [ms]"
+        )
+    )
+    for mb in (4, 16):
+        body = make_document(mb * 1024 * 1024)
+        for name, parser_class in (
+            ("object", HTMLParser),
+            ("columnar", ColumnarParser),
+        ):
+            size = retained_bytes(parser_class, body)
+            parser, tree, elapsed = build(parser_class, body)
+            objects = len(gc.get_objects())
+            pause = gc_pause()
+            print(
+                "{:>4} {:>10} {:>10.3f} {:>10.1f} {:>12} {:>10.1f}".format(
+                    mb, name, elapsed, size / 1024 / 1024, objects, pause * 1000
+                )
+            )
+            del parser, tree
+
+
+if __name__ == "__main__":
+    main()
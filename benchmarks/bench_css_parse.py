@@ -0,0 +1,234 @@
+"""
+CSSParser.parseのベンチマーク。1文字ずつ読む以前のパーサーと比べる
+
+    python -m benchmarks.bench_css_parse
+"""
+
+import random
+import time
+from typing import List, Tuple
+
+from src.cssparser import CSSParser
+from src.selector import (
+    ClassSelector,
+    CSSRule,
+    Declaration,
+    DesendantSelector,
+    IdSelector,
+    Selector,
+    SequenceSelector,
+    TagSelector,
+)
+
+TAGS = "div p span a li ul h1 h2 table td nav header footer".split()
+CLASSES = "nav item active title meta button card row col".split()
+DECLARATIONS = [
+    "color: #333",
+    "background-color: white",
+    "font-size: 1.5em",
+    "font-weight: bold",
+    "margin: 0 auto",
+    "padding: 4px 8px",
+    "border-radius: 4px",
+    "opacity: 0.5",
+    "color: rgb(10, 20, 30)",
+    "display: none !important",
+    "width: 100%",
+    "border: 1px solid #ccc",
+    "font: 12px/1.5 sans-serif",
+    "transition: opacity 0.2s ease-in-out",
+    "box-shadow: 0 1px 2px rgba(0, 0, 0, 0.2)",
+    "background: url(/img/bg.png) no-repeat",
+]
+
+
+def make_selector(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(1, 3)):
+        kind = rng.random()
+        if kind < 0.4:
+            parts.append(rng.choice(TAGS))
+        elif kind < 0.8:
+            parts.append("." + rng.choice(CLASSES))
+        elif kind < 0.9:
+            parts.append(rng.choice(TAGS) + "." + rng.choice(CLASSES))
+        else:
+            parts.append("#id{}".format(rng.randint(0, 99)))
+    return " ".join(parts)
+
+
+def make_stylesheet(size: int, real_world: bool = False, seed: int = 0) -> str:
+    """sizeバイトくらいのスタイルシート
+
+    real_worldならコメント、引用符で囲んだ値、@mediaも混ぜる(以前のパーサーは読めない)
+    """
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        body = ";\n  ".join(rng.choice(DECLARATIONS) for _ in range(rng.randint(1, 6)))
+        if real_world and rng.random() < 0.2:
+            body += ';\n  font-family: "Helvetica Neue"'
+        part = "{} {{\n  {};\n}}\n".format(make_selector(rng), body)
+        if real_world:
+            kind = rng.random()
+            if kind < 0.1:
+                part = "/* {} */\n".format(make_selector(rng)) + part
+            elif kind < 0.12:
+                part = "@media (max-width: 600px) {{ {} }}\n".format(part)
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)
+
+
+class OldCSSParser:
+    """1文字ずつ読み、assertで失敗を伝える以前のパーサー"""
+
+    def __init__(self, s: str):
+        self.s = s
+        self.i = 0
+
+    def whitespace(self) -> None:
+        while self.i < len(self.s) and self.s[self.i].isspace():
+            self.i += 1
+
+    def literal(self, literal: str) -> None:
+        assert self.i < len(self.s) and self.s[self.i] == literal
+        self.i += 1
+
+    def word(self) -> str:
+        start = self.i
+        while self.i < len(self.s):
+            if self.s[self.i].isalnum() or self.s[self.i] in "#-.%":
+                self.i += 1
+            else:
+                break
+        assert self.i > start
+        return self.s[start : self.i]
+
+    def pair(self) -> Tuple[str, str]:
+        # <div style="background-color:lightblue"></div> -> ("background-color", "lightblue")
+        prop = self.word()
+        self.whitespace()
+        self.literal(":")
+        self.whitespace()
+        val = self.word()
+        return prop.lower(), val
+
+    def ignore_until(self, chars):
+        # skip developers error
+        while self.i < len(self.s):
+            if self.s[self.i] in chars:
+                return self.s[self.i]
+            else:
+                self.i += 1
+
+    def body(self) -> Declaration:
+        pairs: Declaration = {}
+        while self.i < len(self.s) and self.s[self.i] != "}":
+            try:
+                prop, val = self.pair()
+                pairs[prop] = val
+                self.whitespace()
+                self.literal(";")
+                self.whitespace()
+            except AssertionError:
+                why = self.ignore_until([";", "}"])
+                if why == ";":
+                    self.literal(";")
+                    self.whitespace()
+                else:
+                    break
+
+        return pairs
+
+    def simple_selector(self) -> Selector:
+        # impl: .class, #id, tag
+        word = self.word().lower()
+        if word.startswith("."):
+            return ClassSelector(word[1:])
+        elif word.startswith("#"):
+            return IdSelector(word[1:])
+        else:
+            # impl: tag.class, tag#id
+            # TODO: impl: tag.class#id, tag.class.class, tag#id#id
+            if "." in word:
+                tag, cls = word.split(".", 1)
+                if "#" in cls or "." in cls or "#" in tag or "." in tag:
+                    print("[warning] invalid selector: ", word)
+                return SequenceSelector(TagSelector(tag), ClassSelector(cls))
+            if "#" in word:
+                tag, id_ = word.split("#", 1)
+                if "#" in id_ or "." in id_ or "#" in tag or "." in tag:
+                    print("[warning] invalid selector: ", word)
+                return SequenceSelector(TagSelector(tag), IdSelector(id_))
+            return TagSelector(word)
+
+    def selector(self) -> Selector:
+        out: Selector = self.simple_selector()
+        self.whitespace()
+        while self.i < len(self.s) and self.s[self.i] != "{":
+            desendant = self.simple_selector()
+            out = DesendantSelector(out, desendant)
+            self.whitespace()
+        return out
+
+    def parse(self) -> List[CSSRule]:
+        rules: List[CSSRule] = []  # type: ignore
+        while self.i < len(self.s):
+            try:
+                self.whitespace()
+                selector = self.selector()
+                self.literal("{")
+                self.whitespace()
+                body = self.body()
+                self.literal("}")
+                rules.append((selector, body))
+            except AssertionError:
+                why = self.ignore_until(["}"])
+                if why == "}":
+                    self.literal("}")
+                    self.whitespace()
+                else:
+                    break
+        return rules
+
+
+def measure(parser, css: str, rounds: int = 5) -> Tuple[float, List[CSSRule]]:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        rules = parser(css).parse()
+        best = min(best, time.perf_counter() - start)
+    return best, rules
+
+
+def main():
+    print(
+        "{:>10} {:>8} {:>10} {:>10} {:>8}".format(
+            "sheet", "rules", "old [s]", "new [s]", "speedup"
+        )
+    )
+    for mb in [1, 4]:
+        css = make_stylesheet(mb * 1024 * 1024)
+        old, old_rules = measure(OldCSSParser, css)
+        new, new_rules = measure(CSSParser, css)
+        assert repr(old_rules) == repr(new_rules)
+        print(
+            "{:>8}MB {:>8} {:>10.3f} {:>10.3f} {:>7.1f}x".format(
+                mb, len(new_rules), old, new, old / new
+            )
+        )
+    css = make_stylesheet(1024 * 1024, real_world=True)
+    old, old_rules = measure(OldCSSParser, css)
+    new, new_rules = measure(CSSParser, css)
+    print(
+        "{:>10} {:>8} {:>10.3f} {:>10.3f} {:>7.1f}x".format(
+            "1MB real", len(new_rules), old, new, old / new
+        )
+    )
+    print("old parser read {} rules of the same sheet".format(len(old_rules)))
+
+
+if __name__ == "__main__":
+    main()
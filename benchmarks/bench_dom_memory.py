@@ -0,0 +1,95 @@
+"""
+DOMのノード1つあたりのメモリのベンチマーク
+
+    python -m benchmarks.bench_dom_memory
+"""
+
+import gc
+import tracemalloc
+from typing import Dict, List, Tuple
+
+import src.text
+from benchmarks.bench_html_parse import make_document
+from src.entities import decode_entities
+from src.text import HTMLParser
+from src.util.node import tree_to_list
+
+
+class OldText:
+    """以前のText(__dict__あり、ノードごとにchildrenとstyleを持つ)"""
+
+    def __init__(self, text: str, parent):
+        self.parent = parent
+        self.children: List = []
+        self.style: Dict[str, str] = {}
+        self.text = decode_entities(text)
+
+
+class OldElement:
+    def __init__(self, tag: str, attributes: Dict[str, str], parent):
+        self.parent = parent
+        self.children: List = []
+        self.style: Dict[str, str] = {}
+        self.tag = tag
+        self.attributes = attributes
+
+
+class OldParser(HTMLParser):
+    def get_attributes(self, text: str):
+        # 以前はタグ名も属性名も毎回新しい文字列だった
+        parts = text.split()
+        tag = parts[0].lower()
+        attributes = {}
+        for attrpair in parts[1:]:
+            if "=" in attrpair:
+                key, value = attrpair.split("=", 1)
+                if len(value) > 2 and value[0] in ["'", '"']:
+                    value = value[1:-1]
+                attributes[key.lower()] = value
+            else:
+                attributes[attrpair.lower()] = ""
+        return tag, attributes
+
+
+def measure(parser_class, body: str, old_nodes: bool) -> Tuple[int, int]:
+    """木を作るのに確保したままのバイト数とノード数"""
+    saved = (src.text.Text, src.text.Element)
+    if old_nodes:
+        src.text.Text, src.text.Element = OldText, OldElement  # type: ignore
+    try:
+        gc.collect()
+        tracemalloc.start()
+        tree = parser_class(body).parse()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        src.text.Text, src.text.Element = saved
+    return size, len(tree_to_list(tree, []))
+
+
+def main():
+    print(
+        "{:>6} {:>8} {:>12} {:>12} {:>12} {:>12}".format(
+            "MB", "nodes", "old [MB]", "new [MB]", "old B/node", "new B/node"
+        )
+    )
+    for mb in (1, 4):
+        body = make_document(mb * 1024 * 1024)
+        old_size, nodes = measure(OldParser, body, old_nodes=True)
+        new_size, new_nodes = measure(HTMLParser, body, old_nodes=False)
+        assert nodes == new_nodes
+        print(
+            "{:>6} {:>8} {:>12.1f} {:>12.1f} {:>12.0f} {:>12.0f}".format(
+                mb,
+                nodes,
+                old_size / 1024 / 1024,
+                new_size / 1024 / 1024,
+                old_size / nodes,
+                new_size / nodes,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+HTMLの解析とDOMスナップショットからの復元の比較
+
+    python -m benchmarks.bench_dom_snapshot
+"""
+
+import time
+
+from benchmarks.bench_html_parse import make_document
+from src.dom_snapshot import body_key, deserialize, serialize
+from src.text import HTMLParser
+
+
+def best_of(func, rounds: int = 3) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(
+        "{:>4} {:>10} {:>10} {:>10} {:>12} {:>10}".format(
+            "MB", "parse [s]", "hash [s]", "load [s]", "snapshot MB", "speedup"
+        )
+    )
+    for mb in (1, 4):
+        body = make_document(mb * 1024 * 1024)
+        data = serialize(HTMLParser(body).parse())
+        parse = best_of(lambda: HTMLParser(body).parse())
+        key = best_of(lambda: body_key(body))
+        load = best_of(lambda: deserialize(data))
+        print(
+            "{:>4} {:>10.3f} {:>10.3f} {:>10.3f} {:>12.1f} {:>9.1f}x".format(
+                mb,
+                parse,
+                key,
+                load,
+                len(data) / 1024 / 1024,
+                parse / (key + load),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+文字参照のデコードのベンチマーク
+
+    python -m benchmarks.bench_entities
+"""
+
+import time
+
+from src.entities import ENTITIES_DICT, decode_entities
+
+
+def old_decode(text: str) -> str:
+    """以前のText.__init__(辞書の全エントリでreplaceする)"""
+    for c in ENTITIES_DICT:
+        text = text.replace(c, ENTITIES_DICT[c])
+    return text
+
+
+def measure(f, texts) -> float:
+    start = time.perf_counter()
+    for text in texts:
+        f(text)
+    return time.perf_counter() - start
+
+
+def main():
+    runs = {
+        "entity-free": ["The quick brown fox jumps over the lazy dog. " * 4] * 20_000,
+        "entity-dense": ["Tom &amp; Jerry &lt;3 &copy; &#8212; &#x1F600; " * 4]
+        * 20_000,
+        "short words": ["word"] * 200_000,
+    }
+    print("{:>14} {:>10} {:>10} {:>8}".format("text", "old [s]", "new [s]", "speedup"))
+    for name, texts in runs.items():
+        old = measure(old_decode, texts)
+        new = measure(decode_entities, texts)
+        print("{:>14} {:>10.3f} {:>10.3f} {:>7.1f}x".format(name, old, new, old / new))
+
+
+if __name__ == "__main__":
+    main()
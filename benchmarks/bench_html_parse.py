@@ -0,0 +1,182 @@
+"""
+HTMLParser.parseのベンチマーク
+
+    python -m benchmarks.bench_html_parse
+"""
+
+import queue
+import random
+import threading
+import time
+from typing import Union
+
+from src.text import HTMLParser
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+
+
+def make_document(size: int, seed: int = 0) -> str:
+    """段落、リンク、リストが並んだsizeバイトくらいの文書"""
+    rng = random.Random(seed)
+    parts = ["<!doctype html><html><head><title>bench</title></head><body>"]
+    length = 0
+    while length < size:
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40)))
+        kind = rng.random()
+        if kind < 0.6:
+            part = "<p class=text>{}</p>\n".format(words)
+        elif kind < 0.8:
+            part = '<div id=d{}><a href="/x">{}</a> {}</div>\n'.format(
+                length, words[:20], words
+            )
+        else:
+            part = "<ul><li>{}</li><li>{}</li></ul>\n".format(words, words[::-1])
+        parts.append(part)
+        length += len(part)
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+class OldParser(HTMLParser):
+    """以前の1文字ずつ読むparse"""
+
+    def parse(self):
+        text = ""
+        in_tag = False
+        for c in self.body:
+            if c == "<":
+                in_tag = True
+                if text:
+                    self.add_text(text)
+                text = ""
+            elif c == ">":
+                in_tag = False
+                self.add_tag(text)
+                text = ""
+            else:
+                text += c
+        if not in_tag and text:
+            self.add_text(text)
+        return self.finish()
+
+
+class TokenCounter:
+    """木を作らずに字句解析だけを測る"""
+
+    def __init__(self, body):
+        self.body = body
+        self.tokens = 0
+        self._pending = []
+        self._in_tag = False
+
+    def add_text(self, text):
+        self.tokens += 1
+
+    def add_tag(self, tag):
+        self.tokens += 1
+
+    def finish(self):
+        return self.tokens
+
+
+class OldTokenizer(TokenCounter):
+    parse = OldParser.parse
+
+
+class NewTokenizer(TokenCounter):
+    parse = HTMLParser.parse
+    feed = HTMLParser.feed
+    close = HTMLParser.close
+
+
+def measure(f, body):
+    start = time.perf_counter()
+    result = f(body)
+    return time.perf_counter() - start, result
+
+
+def slow_chunks(body: str, chunk_size: int, delay: float):
+    """delay秒ごとに1チャンク届くネットワークの代わり
+
+    ソケットと同じく、読む側が忙しくても受信は別スレッドで進む
+    """
+    received: "queue.Queue[Union[str, None]]" = queue.Queue()
+
+    def receive():
+        for i in range(0, len(body), chunk_size):
+            time.sleep(delay)
+            received.put(body[i : i + chunk_size])
+        received.put(None)
+
+    threading.Thread(target=receive, daemon=True).start()
+    while True:
+        chunk = received.get()
+        if chunk is None:
+            return
+        yield chunk
+
+
+def download_then_parse(body: str, chunk_size: int, delay: float):
+    return HTMLParser("".join(slow_chunks(body, chunk_size, delay))).parse()
+
+
+def parse_while_downloading(body: str, chunk_size: int, delay: float):
+    parser = HTMLParser()
+    for chunk in slow_chunks(body, chunk_size, delay):
+        parser.feed(chunk)
+    return parser.close()
+
+
+def main():
+    print(
+        "{:>6} {:>14} {:>14} {:>8} {:>14} {:>14} {:>8}".format(
+            "MB",
+            "old tokens[s]",
+            "new tokens[s]",
+            "speedup",
+            "old parse[s]",
+            "new parse[s]",
+            "speedup",
+        )
+    )
+    for mb in (1, 2, 5):
+        body = make_document(mb * 1024 * 1024)
+        old_tok, old_count = measure(lambda b: OldTokenizer(b).parse(), body)
+        new_tok, new_count = measure(lambda b: NewTokenizer(b).parse(), body)
+        assert old_count == new_count
+        old_parse, _ = measure(lambda b: OldParser(b).parse(), body)
+        new_parse, _ = measure(lambda b: HTMLParser(b).parse(), body)
+        print(
+            "{:>6} {:>14.3f} {:>14.3f} {:>7.1f}x {:>14.3f} {:>14.3f} {:>7.1f}x".format(
+                mb,
+                old_tok,
+                new_tok,
+                old_tok / new_tok,
+                old_parse,
+                new_parse,
+                old_parse / new_parse,
+            )
+        )
+
+    # 64KBずつ届くページで、受信と解析を重ねた場合
+    body = make_document(2 * 1024 * 1024)
+    chunk_size, delay = 64 * 1024, 0.02
+    sequential, _ = measure(lambda b: download_then_parse(b, chunk_size, delay), body)
+    streaming, _ = measure(
+        lambda b: parse_while_downloading(b, chunk_size, delay), body
+    )
+    print()
+    print("2MB in 64KB chunks, {:.0f}ms per chunk".format(delay * 1000))
+    print("download then parse: {:.3f}s".format(sequential))
+    print("feed while downloading: {:.3f}s".format(streaming))
+
+    # 同じ数のタグが深く入れ子になった文書と平らに並んだ文書
+    n = 10_000
+    deep, _ = measure(lambda b: HTMLParser(b).parse(), "<div>" * n + "x" + "</div>" * n)
+    flat, _ = measure(lambda b: HTMLParser(b).parse(), "<div></div>" * n + "x")
+    print()
+    print("{} divs nested: {:.3f}s, flat: {:.3f}s".format(n, deep, flat))
+
+
+if __name__ == "__main__":
+    main()
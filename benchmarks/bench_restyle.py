@@ -0,0 +1,54 @@
+"""
+入力欄に1文字打つたびのスタイル計算を、全体のstyleとrestyleで比べる
+
+    python -m benchmarks.bench_restyle
+"""
+
+import time
+
+from benchmarks.bench_html_parse import make_document
+from src.cssparser import CSSParser, restyle, style
+from src.selector import cascade_priority
+from src.text import Element, HTMLParser
+from src.util.node import find, walk
+
+
+def keystrokes(input: Element, update, count: int) -> float:
+    """1文字あたりの秒数"""
+    start = time.perf_counter()
+    for i in range(count):
+        input.set_attribute("value", "x" * (i + 1))
+        update()
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    with open("src/browser.css") as f:
+        rules = sorted(CSSParser(f.read()).parse(), key=cascade_priority)
+    print(
+        "{:>10} {:>8} {:>12} {:>14} {:>8}".format(
+            "size", "nodes", "style [ms]", "restyle [ms]", "speedup"
+        )
+    )
+    for size in [64 * 1024, 256 * 1024, 1024 * 1024]:
+        html = make_document(size).replace(
+            "<body>", "<body><form><input name=q></form>", 1
+        )
+        nodes = HTMLParser(html).parse()
+        count = sum(1 for _ in walk(nodes))
+        style(nodes, rules)
+        input = find(
+            nodes, lambda node: isinstance(node, Element) and node.tag == "input"
+        )
+        assert isinstance(input, Element)
+        full = keystrokes(input, lambda: style(nodes, rules), 3)
+        incremental = keystrokes(input, lambda: restyle(nodes, rules), 100)
+        print(
+            "{:>9}K {:>8} {:>12.3f} {:>14.3f} {:>7.0f}x".format(
+                size // 1024, count, full * 1000, incremental * 1000, full / incremental
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
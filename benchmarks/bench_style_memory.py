@@ -0,0 +1,97 @@
+"""
+計算済みスタイルのメモリと、ページ中の異なるスタイルの数
+
+    python -m benchmarks.bench_style_memory
+"""
+
+import gc
+import time
+import tracemalloc
+from typing import List
+
+from benchmarks.bench_html_parse import make_document
+from src.cssparser import (
+    INHERITED_PROPERTIES,
+    CSSParser,
+    compute_style,
+    distinct_styles,
+    style,
+)
+from src.selector import CSSRule, cascade_priority
+from src.text import EMPTY_STYLE, Element, HTMLNode, HTMLParser
+from src.util.node import walk
+
+CSS = """
+.text { color: gray; }
+a { color: blue; }
+li { font-size: 90%; }
+div a { font-weight: bold; }
+"""
+
+
+def old_style(node: HTMLNode, rules: List[CSSRule]) -> None:
+    """以前のstyle(ノードごとに辞書を作る)"""
+    for node in walk(node):
+        node.style = {}
+        for property, default_value in INHERITED_PROPERTIES.items():
+            if node.parent:
+                node.style[property] = node.parent.style[property]
+            else:
+                node.style[property] = default_value
+        for selector, body in rules:
+            if not selector.matches(node):
+                continue
+            for property, value in body.items():
+                computed_value = compute_style(node, property, value)
+                if not computed_value:
+                    continue
+                node.style[property] = computed_value
+        if isinstance(node, Element) and node.get_attribute("style") is not None:
+            pairs = CSSParser(node.attributes["style"]).body()
+            for property, value in pairs.items():
+                node.style[property] = value
+
+
+def measure(style_func, nodes: HTMLNode, rules: List[CSSRule]):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    style_func(nodes, rules)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, size
+
+
+def main():
+    with open("src/browser.css") as f:
+        rules = CSSParser(f.read()).parse()
+    rules = sorted(rules + CSSParser(CSS).parse(), key=cascade_priority)
+    print(
+        "{:>4} {:>8} {:>8} {:>10} {:>10} {:>10}".format(
+            "MB", "nodes", "style", "time [s]", "mem [kB]", "distinct"
+        )
+    )
+    for mb in (1, 4):
+        nodes = HTMLParser(make_document(mb * 1024 * 1024)).parse()
+        count = sum(1 for _ in walk(nodes))
+        for name, style_func in (("old", old_style), ("interned", style)):
+            elapsed, size = measure(style_func, nodes, rules)
+            print(
+                "{:>4} {:>8} {:>8} {:>10.3f} {:>10.0f} {:>10}".format(
+                    mb,
+                    count,
+                    name,
+                    elapsed,
+                    size / 1024,
+                    distinct_styles(nodes),
+                )
+            )
+            # 次の計測で前の結果の解放を数えないように消しておく
+            for node in walk(nodes):
+                node.style = EMPTY_STYLE
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+スタイル共有のキャッシュを使ったstyleと使わないstyleの比較
+
+    python -m benchmarks.bench_style_sharing
+"""
+
+import time
+
+from benchmarks.bench_html_parse import make_document
+from src.cssparser import STYLE_SHARING_STATS, CSSParser, style, style_node
+from src.selector import cascade_priority
+from src.text import HTMLParser
+from src.util.node import walk
+
+CSS = """
+.text { color: gray; }
+a { color: blue; }
+li { font-size: 90%; }
+nav a { font-weight: bold; }
+"""
+
+
+def make_list_page(items: int) -> str:
+    rows = "".join(
+        "<li class=item><a href=/{}>item {}</a> <span class=meta>meta</span></li>".format(
+            i, i
+        )
+        for i in range(items)
+    )
+    return "<html><body><ul>{}</ul></body></html>".format(rows)
+
+
+def style_without_sharing(nodes, rules) -> None:
+    for node in walk(nodes):
+        style_node(node, rules)
+
+
+def best_of(func, rounds: int = 3) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    with open("src/browser.css") as f:
+        rules = CSSParser(f.read()).parse()
+    rules = sorted(rules + CSSParser(CSS).parse(), key=cascade_priority)
+    pages = {
+        "document 1MB": make_document(1024 * 1024),
+        "list 20k items": make_list_page(20_000),
+    }
+    print(
+        "{:>16} {:>10} {:>10} {:>8} {:>9}".format(
+            "page", "off [s]", "on [s]", "speedup", "hit rate"
+        )
+    )
+    for name, html in pages.items():
+        nodes = HTMLParser(html).parse()
+        off = best_of(lambda: style_without_sharing(nodes, rules))
+        for key in STYLE_SHARING_STATS:
+            STYLE_SHARING_STATS[key] = 0
+        on = best_of(lambda: style(nodes, rules), rounds=1)
+        hits = STYLE_SHARING_STATS["hits"]
+        total = hits + STYLE_SHARING_STATS["misses"] + STYLE_SHARING_STATS["skipped"]
+        print(
+            "{:>16} {:>10.3f} {:>10.3f} {:>7.1f}x {:>8.1f}%".format(
+                name, off, on, off / on, hits / total * 100
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
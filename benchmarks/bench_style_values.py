@@ -0,0 +1,84 @@
+"""
+1フレーム(layout, paint, raster)あたりのスタイルの値の解析回数
+
+スタイルは文書をまたいで共有されるので、2つ目の文書では最初のフレームでも解析しない。
+
+    python -m benchmarks.bench_style_values
+"""
+
+import time
+
+import skia
+
+from benchmarks.bench_html_parse import make_document
+from src.cssparser import CSSParser, style
+from src.layout import BlockLayout, DocumentLayout, InlineLayout, InputLayout
+from src.layout import TextLayout
+from src.selector import cascade_priority
+from src.text import HTMLParser
+from src.util.draw_skia import PARSE_STATS
+from src.util.node import walk
+
+CSS = """
+.text { color: gray; }
+a { color: blue; background-color: lightblue; border-radius: 2px; }
+li { font-size: 90%; }
+"""
+
+
+def frame(nodes, canvas) -> DocumentLayout:
+    document = DocumentLayout(nodes)
+    document.layout()
+    display_list = []
+    document.paint(display_list)
+    for cmd in display_list:
+        cmd.execute(canvas)
+    return document
+
+
+def old_parse_count(document: DocumentLayout) -> int:
+    """以前の実装が1フレームで文字列を解析していた回数
+
+    単語ごとにfont-sizeと色を、箱ごとにopacity, mix-blend-mode, border-radiusを
+    (背景があればborder-radiusと色も)解析していた。
+    """
+    count = 0
+    for obj in walk(document):
+        if isinstance(obj, (TextLayout, InputLayout)):
+            count += 2
+        if isinstance(obj, (BlockLayout, InlineLayout, InputLayout)):
+            count += 3
+            if obj.node.style.get("background-color", "transparent") != "transparent":
+                count += 2
+    return count
+
+
+def main():
+    with open("src/browser.css") as f:
+        rules = CSSParser(f.read()).parse()
+    rules = sorted(rules + CSSParser(CSS).parse(), key=cascade_priority)
+    canvas = skia.Surface(800, 600).getCanvas()
+    print(
+        "{:>6} {:>12} {:>12} {:>12} {:>10}".format(
+            "kB", "old parses", "1st frame", "next frame", "frame [s]"
+        )
+    )
+    for kb in (64, 256):
+        nodes = HTMLParser(make_document(kb * 1024)).parse()
+        style(nodes, rules)
+        counts = []
+        for _ in range(2):
+            before = sum(PARSE_STATS.values())
+            start = time.perf_counter()
+            document = frame(nodes, canvas)
+            elapsed = time.perf_counter() - start
+            counts.append(sum(PARSE_STATS.values()) - before)
+        print(
+            "{:>6} {:>12} {:>12} {:>12} {:>10.3f}".format(
+                kb, old_parse_count(document), counts[0], counts[1], elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
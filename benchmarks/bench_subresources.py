@@ -0,0 +1,46 @@
+"""
+サブリソースの逐次取得と並行取得の比較
+
+遅延を入れたローカルサーバーから、スタイルシートを取得する時間を測る。
+
+    python -m benchmarks.bench_subresources
+"""
+
+import time
+
+from src.fetcher import Fetcher
+from src.network import HTTP_CACHE, request
+from tests.util.server import LocalServer
+
+
+def main():
+    delays = [0.05, 0.1, 0.2, 0.1, 0.05, 0.3]
+    routes = {"/{}.css".format(i): (200, {}, b"p { color: red; }") for i in range(6)}
+    with LocalServer(routes) as server:
+        for path, delay in zip(routes, delays):
+            server.delays[path] = delay
+        urls = [server.url(path) for path in routes]
+
+        HTTP_CACHE.clear()
+        start = time.perf_counter()
+        for url in urls:
+            request(url, None)
+        sequential = time.perf_counter() - start
+
+        HTTP_CACHE.clear()
+        fetcher = Fetcher()
+        start = time.perf_counter()
+        for fetch in fetcher.fetch_all(urls, None):
+            fetch.result()
+        concurrent = time.perf_counter() - start
+        fetcher.shutdown()
+
+    print("resources:  {}".format(len(urls)))
+    print("sum delay:  {:.3f} s".format(sum(delays)))
+    print("max delay:  {:.3f} s".format(max(delays)))
+    print("sequential: {:.3f} s".format(sequential))
+    print("concurrent: {:.3f} s".format(concurrent))
+
+
+if __name__ == "__main__":
+    main()
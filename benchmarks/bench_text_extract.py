@@ -0,0 +1,84 @@
+"""
+python -m src.network URL のテキスト抽出(lex)のスループット
+
+    python -m benchmarks.bench_text_extract
+"""
+
+import io
+import time
+
+from benchmarks.bench_html_parse import make_document
+from src.network import READ_SIZE, extract_text
+
+
+def old_lex(body: str) -> str:
+    """以前の1文字ずつ読むlex(lt/gt以外の文字参照はKeyErrorになる)"""
+    in_angle = False
+    out_angle = False
+    in_entity = False
+    entity = ""
+    out = ""
+    tags = []
+
+    ENTRY_DICT = {
+        "lt": "<",
+        "gt": ">",
+    }
+
+    for c in body:
+        if c == "<":
+            in_angle = True
+            tags.append("")
+        elif c == ">":
+            if not out_angle:
+                tags[len(tags) - 1] = tags[len(tags) - 1].split()[0]
+            in_angle = False
+            out_angle = False
+        elif in_angle and c == "/":
+            out_angle = True
+            tags.pop()
+        elif in_angle and (not out_angle):
+            tags[len(tags) - 1] += c
+        elif c == "&":
+            in_entity = True
+            entity = ""
+        elif in_entity:
+            if c == ";":
+                if "body" in tags:
+                    out += ENTRY_DICT[entity]
+                in_entity = False
+            else:
+                entity += c
+        elif not in_angle and "body" in tags:
+            out += c
+    return out
+
+
+def new_lex(body: str) -> str:
+    out = io.StringIO()
+    chunks = (body[i : i + READ_SIZE] for i in range(0, len(body), READ_SIZE))
+    extract_text(chunks, out)
+    return out.getvalue()
+
+
+def main():
+    print(
+        "{:>4} {:>12} {:>12} {:>8}".format("MB", "old [MB/s]", "new [MB/s]", "speedup")
+    )
+    for mb in (1, 4, 16):
+        body = make_document(mb * 1024 * 1024)
+        times = []
+        for lex in (old_lex, new_lex):
+            start = time.perf_counter()
+            lex(body)
+            times.append(time.perf_counter() - start)
+        old, new = times
+        print(
+            "{:>4} {:>12.1f} {:>12.1f} {:>7.1f}x".format(
+                mb, mb / old, mb / new, old / new
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
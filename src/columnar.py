@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterable, List, Mapping, Sequence, Union
+
+from src.entities import decode_entities
+from src.text import (
+    BLOCK_ELEMENTS,
+    EMPTY_STYLE,
+    LAYOUT_MODE,
+    NO_CHILDREN,
+    Element,
+    HTMLNode,
+    HTMLParser,
+    Text,
+)
+
+NONE = -1  # 親や兄弟がいないことを表すインデックス
+TEXT = -1  # tagの列でテキストノードを表す
+
+# displayの列の値
+_UNKNOWN, _INLINE, _BLOCK = 0, 1, 2
+
+
+class ColumnarDocument:
+    """ノードをオブジェクトではなく、インデックスで引く配列の列として持つDOM
+
+    ノードiの情報は各列のi番目に入っている。テキストは1つのバッファに
+    まとめ、ノードには開始位置と長さだけを持たせる。ノードを指す
+    オブジェクトはElementView/TextViewとしてその都度作る。
+    """
+
+    def __init__(self):
+        self.tag = array("i")  # タグ名のid。テキストはTEXT
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.last_child = array("i")
+        self.next_sibling = array("i")
+        self.text_start = array("i")
+        self.text_length = array("i")
+        self.display = array("b")  # 計算済みのLAYOUT_MODE
+        self.tag_names: List[str] = []
+        self._tag_ids: Dict[str, int] = {}
+        # 属性とスタイルは持っているノードの分だけ辞書に入れる
+        self.attributes: Dict[int, Dict[str, str]] = {}
+        self.styles: Dict[int, Mapping[str, str]] = {}
+        self.dirty: Dict[int, int] = {}  # Element._dirty
+        self._text_parts: List[str] = []
+        self._text_size = 0
+        self._text: Union[str, None] = ""
+
+    def __len__(self) -> int:
+        return len(self.tag)
+
+    def _add(self, tag_id: int, parent: int, start: int, length: int) -> int:
+        index = len(self.tag)
+        self.tag.append(tag_id)
+        self.parent.append(parent)
+        self.first_child.append(NONE)
+        self.last_child.append(NONE)
+        self.next_sibling.append(NONE)
+        self.text_start.append(start)
+        self.text_length.append(length)
+        self.display.append(_UNKNOWN)
+        return index
+
+    def add_element(self, tag: str, attributes: Dict[str, str], parent: int) -> int:
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self._tag_ids[tag] = len(self.tag_names)
+            self.tag_names.append(tag)
+        index = self._add(tag_id, parent, NONE, 0)
+        if attributes:
+            self.attributes[index] = attributes
+        return index
+
+    def add_text(self, text: str, parent: int) -> int:
+        index = self._add(TEXT, parent, self._text_size, len(text))
+        self._text_parts.append(text)
+        self._text_size += len(text)
+        self._text = None
+        return index
+
+    def append_child(self, parent: int, child: int) -> None:
+        last = self.last_child[parent]
+        if last == NONE:
+            self.first_child[parent] = child
+        else:
+            self.next_sibling[last] = child
+        self.last_child[parent] = child
+        self.display[parent] = _UNKNOWN
+
+    def import_node(self, node: HTMLNode, parent: int) -> int:
+        """ほかの木のノードを子孫ごとこの文書に写してparentの最後の子にし、インデックスを返す"""
+        root = NONE
+        stack = [(node, parent)]
+        while stack:
+            node, parent = stack.pop()
+            if isinstance(node, Element):
+                attributes = dict(node.attributes)
+                index = self.add_element(node.tag, attributes, parent)
+                stack.extend((child, index) for child in reversed(node.children))
+            else:
+                assert isinstance(node, Text)
+                index = self.add_text(node.text, parent)
+            if parent != NONE:
+                self.append_child(parent, index)
+            if root == NONE:
+                root = index
+        return root
+
+    def replace_children(self, index: int, children: Iterable[HTMLNode]) -> None:
+        """indexの子をchildrenの写しに置き換える"""
+        # 今の子は切り離す。配列には残るが、どこからもたどれなくなる
+        child = self.first_child[index]
+        while child != NONE:
+            self.parent[child] = NONE
+            child = self.next_sibling[child]
+        self.first_child[index] = NONE
+        self.last_child[index] = NONE
+        self.display[index] = _UNKNOWN
+        for node in list(children):
+            self.import_node(node, index)
+
+    def text(self, index: int) -> str:
+        if self._text is None:
+            # 読まれたときにまとめて1つの文字列にする
+            self._text = "".join(self._text_parts)
+            self._text_parts = [self._text]
+        start = self.text_start[index]
+        return self._text[start : start + self.text_length[index]]
+
+    def children(self, index: int) -> List[int]:
+        out = []
+        child = self.first_child[index]
+        while child != NONE:
+            out.append(child)
+            child = self.next_sibling[child]
+        return out
+
+    def node(self, index: int) -> Union["ElementView", "TextView"]:
+        if self.tag[index] == TEXT:
+            return TextView(self, index)
+        return ElementView(self, index)
+
+    def layout_mode(self, index: int) -> LAYOUT_MODE:
+        mode = self.display[index]
+        if mode == _UNKNOWN:
+            mode = _INLINE
+            child = self.first_child[index]
+            if child == NONE:
+                if self.tag_names[self.tag[index]] != "input":
+                    mode = _BLOCK
+            while child != NONE:
+                tag_id = self.tag[child]
+                if tag_id != TEXT and self.tag_names[tag_id] in BLOCK_ELEMENTS:
+                    mode = _BLOCK
+                    break
+                child = self.next_sibling[child]
+            self.display[index] = mode
+        return LAYOUT_MODE.BLOCK if mode == _BLOCK else LAYOUT_MODE.INLINE
+
+
+class _NodeView(HTMLNode):
+    """ColumnarDocumentの1つのノードを指すオブジェクトに共通する部分
+
+    HTMLNodeのparentとstyleを配列を読み書きするプロパティで置き換える。
+    ElementViewとTextViewはこれを先に継承するので、どちらも同じ定義を使う。
+    """
+
+    __slots__ = ()
+    doc: ColumnarDocument
+    index: int
+
+    @property
+    def parent(self) -> Union[ElementView, None]:
+        parent = self.doc.parent[self.index]
+        if parent == NONE:
+            return None
+        return ElementView(self.doc, parent)
+
+    @parent.setter
+    def parent(self, parent: Union[HTMLNode, None]) -> None:
+        # 親子のつながりはreplace_childrenなどで作る。ここでは同じ文書の要素しか受け付けない
+        if parent is None:
+            self.doc.parent[self.index] = NONE
+            return
+        assert isinstance(parent, ElementView) and parent.doc is self.doc
+        self.doc.parent[self.index] = parent.index
+
+    @property
+    def style(self) -> Mapping[str, str]:
+        return self.doc.styles.get(self.index, EMPTY_STYLE)
+
+    @style.setter
+    def style(self, style: Mapping[str, str]) -> None:
+        self.doc.styles[self.index] = style
+
+    # 同じノードを指すビューは同じものとして扱う
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, _NodeView)
+            and other.doc is self.doc
+            and other.index == self.index
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self.doc), self.index))
+
+
+class ElementView(_NodeView, Element):
+    """Elementとして振る舞うColumnarDocumentのノード"""
+
+    __slots__ = ("doc", "index")
+
+    def __init__(self, doc: ColumnarDocument, index: int):
+        self.doc = doc
+        self.index = index
+
+    @property
+    def tag(self) -> str:  # type: ignore
+        return self.doc.tag_names[self.doc.tag[self.index]]
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        attributes = self.doc.attributes.get(self.index)
+        if attributes is None:
+            attributes = self.doc.attributes[self.index] = {}
+        return attributes
+
+    @attributes.setter
+    def attributes(self, attributes: Dict[str, str]) -> None:
+        self.doc.attributes[self.index] = attributes
+        self.mark_style_dirty(subtree=True)
+
+    def get_attribute(
+        self, name: str, default: Union[str, None] = None
+    ) -> Union[str, None]:
+        attributes = self.doc.attributes.get(self.index)
+        if attributes is None:
+            return default
+        return attributes.get(name, default)
+
+    @property
+    def children(self) -> List[HTMLNode]:
+        doc = self.doc
+        return [doc.node(child) for child in doc.children(self.index)]
+
+    @children.setter
+    def children(self, children: Sequence[HTMLNode]) -> None:
+        # innerHTMLなどで作ったオブジェクトの木は文書に写して持つ
+        self.doc.replace_children(self.index, children)
+        self.mark_style_dirty(subtree=True)
+
+    def append_child(self, node: HTMLNode) -> None:
+        assert isinstance(node, _NodeView) and node.doc is self.doc
+        self.doc.append_child(self.index, node.index)
+
+    @property
+    def display(self) -> LAYOUT_MODE:
+        return self.doc.layout_mode(self.index)
+
+    @property
+    def _dirty(self) -> int:  # type: ignore
+        return self.doc.dirty.get(self.index, 0)
+
+    @_dirty.setter
+    def _dirty(self, dirty: int) -> None:
+        if dirty:
+            self.doc.dirty[self.index] = dirty
+        else:
+            self.doc.dirty.pop(self.index, None)
+
+    def __repr__(self):
+        return "<" + self.tag + ">"
+
+
+class TextView(_NodeView, Text):
+    """Textとして振る舞うColumnarDocumentのノード"""
+
+    __slots__ = ("doc", "index")
+
+    def __init__(self, doc: ColumnarDocument, index: int):
+        self.doc = doc
+        self.index = index
+
+    @property
+    def text(self) -> str:  # type: ignore
+        return self.doc.text(self.index)
+
+    @property
+    def children(self) -> List[HTMLNode]:  # type: ignore
+        return NO_CHILDREN  # type: ignore
+
+    @property
+    def _dirty(self) -> int:  # type: ignore
+        return 0
+
+
+class ColumnarParser(HTMLParser):
+    """HTMLParserと同じ規則で、ノードをColumnarDocumentに作る"""
+
+    def __init__(self, body: str = ""):
+        super().__init__(body)
+        self.document = ColumnarDocument()
+
+    def create_element(
+        self, tag: str, attributes: Dict[str, str], parent: Union[Element, None]
+    ) -> Element:
+        parent_index = parent.index if isinstance(parent, ElementView) else NONE
+        index = self.document.add_element(tag, attributes, parent_index)
+        return ElementView(self.document, index)
+
+    def create_text(self, text: str, parent: Element) -> Text:
+        assert isinstance(parent, ElementView)
+        index = self.document.add_text(decode_entities(text), parent.index)
+        return TextView(self.document, index)
@@ -1,5 +1,14 @@
-from typing import List, Tuple, Union
-from src.text import HTMLNode, Element
+import re
+import sys
+import weakref
+from typing import Dict, FrozenSet, Iterator, List, Mapping, Tuple, Union
+from src.text import (
+    STYLE_DIRTY_DESCENDANT,
+    STYLE_DIRTY_SELF,
+    STYLE_DIRTY_SUBTREE,
+    Element,
+    HTMLNode,
+)
 from src.selector import (
     CSSRule,
     ClassSelector,
@@ -10,7 +19,8 @@ from src.selector import (
     TagSelector,
     DesendantSelector,
 )
-
+from src.util.draw_skia import PARSE_STATS, parse_blend_mode, parse_color
+from src.util.node import walk
 
 INHERITED_PROPERTIES = {
     "font-size": "16px",
@@ -21,17 +31,169 @@ INHERITED_PROPERTIES = {
 }
 
 
+def parse_length(value: str) -> float:
+    """ "12px"をピクセル数にする"""
+    PARSE_STATS["length"] += 1
+    return float(value[:-2])
+
+
+def parse_number(value: str) -> float:
+    PARSE_STATS["number"] += 1
+    return float(value)
+
+
+class TypedStyle:
+    """レイアウトと描画で使うスタイルの値を、文字列から変換しておいたもの"""
+
+    __slots__ = (
+        "font_size",
+        "font_weight",
+        "font_style",
+        "font_family",
+        "color",
+        "background_color",
+        "border_radius",
+        "opacity",
+        "blend_mode",
+        "clip",
+    )
+
+    def __init__(self, style: Mapping[str, str]):
+        get = style.get
+        self.font_size = parse_length(
+            get("font-size", INHERITED_PROPERTIES["font-size"])
+        )
+        self.font_weight = get("font-weight", INHERITED_PROPERTIES["font-weight"])
+        self.font_style = get("font-style", INHERITED_PROPERTIES["font-style"])
+        self.font_family = get("font-family", INHERITED_PROPERTIES["font-family"])
+        self.color: int = parse_color(get("color", INHERITED_PROPERTIES["color"]))
+        background_color = get("background-color", "transparent")
+        # 透明なら背景を描かないのでNone
+        self.background_color: Union[int, None] = (
+            None if background_color == "transparent" else parse_color(background_color)
+        )
+        self.border_radius = parse_length(get("border-radius", "0px"))
+        self.opacity = parse_number(get("opacity", "1.0"))
+        self.blend_mode = parse_blend_mode(get("mix-blend-mode", ""))
+        self.clip = get("overflow", "visible") == "clip"
+
+
+class ComputedStyle(Mapping):
+    """計算済みのスタイル。変更できず、同じ値の組は1つのオブジェクトを共有する
+
+    直接作らずにintern_styleを使うこと。
+    """
+
+    __slots__ = (
+        "_values",
+        "_key",
+        "_hash",
+        "_inherited",
+        "_inherited_only",
+        "_typed",
+        "__weakref__",
+    )
+
+    def __init__(self, values: Dict[str, str], key: FrozenSet[Tuple[str, str]]):
+        self._values = values
+        self._key = key
+        self._hash = hash(key)
+        self._inherited: Union[ComputedStyle, None] = None
+        self._inherited_only = all(
+            property in INHERITED_PROPERTIES for property in values
+        )
+        self._typed: Union[TypedStyle, None] = None
+
+    def __getitem__(self, property: str) -> str:
+        return self._values[property]
+
+    def get(self, property, default=None):
+        return self._values.get(property, default)
+
+    def __contains__(self, property) -> bool:
+        return property in self._values
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if isinstance(other, ComputedStyle):
+            return self._key == other._key
+        return super().__eq__(other)
+
+    @property
+    def typed(self) -> TypedStyle:
+        """値を変換したもの。同じスタイルのノードで共有するので、解析は1回で済む"""
+        if self._typed is None:
+            self._typed = TypedStyle(self._values)
+        return self._typed
+
+    def inherited(self) -> "ComputedStyle":
+        """子に引き継ぐプロパティだけのスタイル"""
+        if self._inherited is None:
+            if self._inherited_only:
+                return self
+            self._inherited = intern_style(
+                {
+                    property: value
+                    for property, value in self._values.items()
+                    if property in INHERITED_PROPERTIES
+                }
+            )
+        return self._inherited
+
+    def __repr__(self) -> str:
+        return "ComputedStyle({})".format(self._values)
+
+
+# 値の組 -> 使われているComputedStyle。どのノードからも使われなくなれば消える
+_STYLES: "weakref.WeakValueDictionary[FrozenSet[Tuple[str, str]], ComputedStyle]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def intern_style(values: Dict[str, str]) -> ComputedStyle:
+    """同じ値の組には同じComputedStyleを返す。valuesはこのあと変更しないこと"""
+    key = frozenset(values.items())
+    style = _STYLES.get(key)
+    if style is None:
+        style = _STYLES[key] = ComputedStyle(values, key)
+    return style
+
+
+ROOT_STYLE = intern_style(dict(INHERITED_PROPERTIES))
+
+
+def typed_style(style: Mapping[str, str]) -> TypedStyle:
+    if isinstance(style, ComputedStyle):
+        return style.typed
+    # style()を通していない辞書などはその都度変換する
+    return TypedStyle(style)
+
+
+def distinct_styles(node: HTMLNode) -> int:
+    """nodeの部分木で使われているスタイルのオブジェクトの数"""
+    return len({id(descendant.style) for descendant in walk(node)})
+
+
 def compute_style(node: HTMLNode, property: str, value: str) -> Union[str, None]:
     if property == "font-size":
         if value.endswith("px"):
             return value
         elif value.endswith("%"):
             if node.parent:
-                parent_font_size = node.parent.style["font-size"]
+                parent_px = typed_style(node.parent.style).font_size
             else:
-                parent_font_size = INHERITED_PROPERTIES["font-size"]
+                parent_px = ROOT_STYLE.typed.font_size
             node_pct = float(value[:-1]) / 100
-            parent_px = float(parent_font_size[:-2])
             return str(node_pct * parent_px) + "px"
         else:
             return None
@@ -39,13 +201,164 @@ def compute_style(node: HTMLNode, property: str, value: str) -> Union[str, None]
         return value
 
 
-def style(node: HTMLNode, rules: List[CSSRule]) -> None:
-    node.style = {}
-    for property, default_value in INHERITED_PROPERTIES.items():
-        if node.parent:
-            node.style[property] = node.parent.style[property]
+# スタイル共有のキャッシュで計算を省いた回数(hits)、計算した回数(misses)、
+# idやstyle属性があってキャッシュを使えなかった回数(skipped)
+STYLE_SHARING_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "skipped": 0}
+
+
+class StyleSharingCache:
+    """同じ規則が当たるはずの要素どうしで計算済みのスタイルを使い回す
+
+    規則が見るのはタグ、class、idと(子孫セレクタなら)祖先だけなので、
+    親のスタイル、タグ、classの集合、祖先に当たった子孫セレクタの左側が同じで、
+    idとstyle属性のない要素は同じスタイルになる。兄弟だけでなくいとこの間でも共有できる。
+    """
+
+    def __init__(self, rules: List[CSSRule]):
+        self._ancestor_selectors = [
+            ancestor
+            for selector, _ in rules
+            for ancestor in selector.ancestor_selectors()
+        ]
+        self._styles: Dict[Tuple, ComputedStyle] = {}
+        # 要素 -> その要素か祖先に当たった_ancestor_selectorsの番号
+        self._contexts: Dict[HTMLNode, FrozenSet[int]] = {}
+        self._class_sets: Dict[str, FrozenSet[str]] = {}
+
+    def _context(self, node: HTMLNode) -> FrozenSet[int]:
+        if not self._ancestor_selectors:
+            return frozenset()
+        context = self._contexts.get(node)
+        if context is None:
+            # 部分木だけをstyleしたときは、先祖の分をまとめて調べる
+            ancestors = []
+            ancestor: Union[HTMLNode, None] = node
+            while ancestor is not None:
+                ancestors.append(ancestor)
+                ancestor = ancestor.parent
+            context = frozenset(
+                i
+                for i, selector in enumerate(self._ancestor_selectors)
+                if any(selector.matches(ancestor) for ancestor in ancestors)
+            )
+            self._contexts[node] = context
+        return context
+
+    def key(self, node: Element) -> Union[Tuple, None]:
+        parent = node.parent
+        if parent is None:
+            return None
+        parent_context = self._context(parent)
+        if self._ancestor_selectors:
+            # 前順にたどるので、子の分を親の分から足して作っておく
+            matched = [
+                i
+                for i, selector in enumerate(self._ancestor_selectors)
+                if selector.matches(node)
+            ]
+            self._contexts[node] = (
+                parent_context.union(matched) if matched else parent_context
+            )
+        if (
+            node.get_attribute("id") is not None
+            or node.get_attribute("style") is not None
+        ):
+            STYLE_SHARING_STATS["skipped"] += 1
+            return None
+        classes = node.get_attribute("class")
+        class_set = None
+        if classes:
+            class_set = self._class_sets.get(classes)
+            if class_set is None:
+                class_set = self._class_sets[classes] = frozenset(classes.split())
+        return (parent.style, node.tag, class_set, parent_context)
+
+    def get(self, key: Tuple) -> Union[ComputedStyle, None]:
+        style = self._styles.get(key)
+        if style is None:
+            STYLE_SHARING_STATS["misses"] += 1
         else:
-            node.style[property] = default_value
+            STYLE_SHARING_STATS["hits"] += 1
+        return style
+
+    def put(self, key: Tuple, style: ComputedStyle) -> None:
+        self._styles[key] = style
+
+
+def style(node: HTMLNode, rules: List[CSSRule]) -> None:
+    sharing = StyleSharingCache(rules)
+    # 親のスタイルを先に決めるので前順にたどる
+    for descendant in walk(node):
+        style_node(descendant, rules, sharing)
+        if isinstance(descendant, Element):
+            descendant._dirty = 0
+
+
+def restyle(node: HTMLNode, rules: List[CSSRule]) -> int:
+    """前回のstyleから変わったところだけスタイルを計算し直し、計算したノードの数を返す
+
+    印のついた要素と、継承する値が変わった要素の子だけを計算する。
+    たどるのは印のある要素への道筋だけなので、文書の大きさにはほぼよらない。
+    """
+    sharing = StyleSharingCache(rules)
+    count = 0
+    # (ノード, 0: 印がなければ計算しない, 1: 自身を計算する, 2: 子孫もすべて計算する)
+    stack: List[Tuple[HTMLNode, int]] = [(node, 0)]
+    while stack:
+        node, forced = stack.pop()
+        dirty = node._dirty
+        if not isinstance(node, Element):
+            if forced:
+                style_node(node, rules, sharing)
+                count += 1
+            continue
+        node._dirty = 0
+        if dirty & STYLE_DIRTY_SUBTREE:
+            forced = 2
+        elif dirty & STYLE_DIRTY_SELF:
+            forced = max(forced, 1)
+        child_forced = 0
+        if forced:
+            old_style = node.style
+            style_node(node, rules, sharing)
+            count += 1
+            if forced == 2:
+                child_forced = 2
+            elif old_style is not node.style and (
+                not isinstance(old_style, ComputedStyle)
+                or old_style.inherited() is not node.style.inherited()  # type: ignore
+            ):
+                # 継承する値が変わったので子も計算し直す
+                child_forced = 1
+        children = node.children
+        if child_forced:
+            stack.extend((child, child_forced) for child in reversed(children))
+        elif dirty & STYLE_DIRTY_DESCENDANT:
+            stack.extend((child, 0) for child in reversed(children) if child._dirty)
+    return count
+
+
+def style_node(
+    node: HTMLNode,
+    rules: List[CSSRule],
+    sharing: Union[StyleSharingCache, None] = None,
+) -> None:
+    """nodeだけのスタイルを計算する。親のスタイルは計算済みであること"""
+    inherited = _inherited_style(node)
+    if not isinstance(node, Element):
+        # テキストにはどのセレクタも当たらない
+        node.style = inherited
+        return
+    key = None
+    if sharing is not None:
+        key = sharing.key(node)
+        if key is not None:
+            shared = sharing.get(key)
+            if shared is not None:
+                node.style = shared
+                return
+    # 規則が当たらなければ親から引き継いだスタイルをそのまま使う
+    values: Union[Dict[str, str], None] = None
     for selector, body in rules:
         if not selector.matches(node):
             continue
@@ -53,77 +366,143 @@ def style(node: HTMLNode, rules: List[CSSRule]) -> None:
             computed_value = compute_style(node, property, value)
             if not computed_value:
                 continue
-            node.style[property] = computed_value
-    if isinstance(node, Element) and "style" in node.attributes:
+            if values is None:
+                values = dict(inherited._values)
+            values[property] = computed_value
+    if isinstance(node, Element) and node.get_attribute("style") is not None:
         pairs = CSSParser(node.attributes["style"]).body()
-        for property, value in pairs.items():
-            node.style[property] = value
-    for child in node.children:
-        style(child, rules)
+        if pairs:
+            if values is None:
+                values = dict(inherited._values)
+            values.update(pairs)
+    node.style = inherited if values is None else intern_style(values)
+    if key is not None:
+        assert sharing is not None
+        sharing.put(key, node.style)
+
+
+def _inherited_style(node: HTMLNode) -> ComputedStyle:
+    if node.parent is None:
+        return ROOT_STYLE
+    parent_style = node.parent.style
+    if isinstance(parent_style, ComputedStyle):
+        return parent_style.inherited()
+    return intern_style(
+        {property: parent_style[property] for property in INHERITED_PROPERTIES}
+    )
+
+
+# 空白とコメント(閉じていないコメントは最後まで)を読み飛ばした後の1つのトークン。
+# 単語、文字列(閉じていなければ行末まで)、それ以外の1文字のどれかで、
+# 入力の最後では空文字列になる
+_TOKEN = re.compile(
+    r"\s*(?:/\*.*?(?:\*/|\Z)\s*)*"
+    r"([\w#.%-]+"
+    r'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"?'
+    r"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'?"
+    r"|.|\Z)",
+    re.DOTALL,
+)
+_WORD_CHAR = re.compile(r"[\w#.%-]")
+
+
+class _WordStart(dict):
+    """トークンの先頭の文字 -> 単語の文字か。正規表現を当てるのは文字ごとに1回だけ"""
+
+    def __missing__(self, c: str) -> bool:
+        is_word = self[c] = _WORD_CHAR.match(c) is not None
+        return is_word
+
+
+_WORD_START = _WordStart()
+_CLOSED_STRING = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'', re.DOTALL)
+# 文字列の中のエスケープ。\の後は16進のコードポイントか、そのままの1文字(改行は消える)
+_ESCAPE = re.compile(r"\\(?:([0-9a-fA-F]{1,6})[ \t\n]?|\n|(.))", re.DOTALL)
+# 入力の終わりを表すトークン
+_END = ""
+
+
+def tokenize(s: str) -> List[str]:
+    """空白とコメントを除いたトークンの列。最後に入力の終わりを1つ置く"""
+    tokens = _TOKEN.findall(s)
+    while tokens and not tokens[-1]:
+        tokens.pop()
+    tokens.append(_END)
+    return tokens
+
+
+def _unescape(m: "re.Match[str]") -> str:
+    if m.group(1):
+        return chr(min(int(m.group(1), 16), sys.maxunicode) or 0xFFFD)
+    return m.group(2) or ""
 
 
 class CSSParser:
+    """トークンの列を先頭から読む再帰下降パーサー
+
+    例外は使わず、読めない宣言は次の;か}まで、読めない規則は次の}まで読み飛ばす。
+    """
+
     def __init__(self, s: str):
         self.s = s
+        self.tokens = tokenize(s)
         self.i = 0
 
-    def whitespace(self) -> None:
-        while self.i < len(self.s) and self.s[self.i].isspace():
-            self.i += 1
+    def literal(self, literal: str) -> bool:
+        if self.tokens[self.i] != literal:
+            return False
+        self.i += 1
+        return True
 
-    def literal(self, literal: str) -> None:
-        assert self.i < len(self.s) and self.s[self.i] == literal
+    def word(self) -> Union[str, None]:
+        token = self.tokens[self.i]
+        if not _WORD_START[token[:1]]:
+            return None
         self.i += 1
+        return token
 
-    def word(self) -> str:
-        start = self.i
-        while self.i < len(self.s):
-            if self.s[self.i].isalnum() or self.s[self.i] in "#-.%":
-                self.i += 1
-            else:
-                break
-        assert self.i > start
-        return self.s[start : self.i]
+    def value(self) -> Union[str, None]:
+        # 単語か、引用符を外した文字列。閉じていない文字列は読めない
+        token = self.tokens[self.i]
+        if token.startswith(("'", '"')):
+            if not _CLOSED_STRING.fullmatch(token):
+                return None
+            self.i += 1
+            return _ESCAPE.sub(_unescape, token[1:-1])
+        return self.word()
 
-    def pair(self) -> Tuple[str, str]:
+    def pair(self) -> Union[Tuple[str, str], None]:
         # <div style="background-color:lightblue"></div> -> ("background-color", "lightblue")
         prop = self.word()
-        self.whitespace()
-        self.literal(":")
-        self.whitespace()
-        val = self.word()
+        if prop is None or not self.literal(":"):
+            return None
+        val = self.value()
+        if val is None:
+            return None
         return prop.lower(), val
 
-    def ignore_until(self, chars):
-        # skip developers error
-        while self.i < len(self.s):
-            if self.s[self.i] in chars:
-                return self.s[self.i]
-            else:
-                self.i += 1
+    def ignore_until(self, chars: Tuple[str, ...]) -> str:
+        # 見つけたトークンの手前で止まる。入力の終わりでも止まる
+        tokens = self.tokens
+        while tokens[self.i] not in chars and tokens[self.i] != _END:
+            self.i += 1
+        return tokens[self.i]
 
     def body(self) -> Declaration:
         pairs: Declaration = {}
-        while self.i < len(self.s) and self.s[self.i] != "}":
-            try:
-                prop, val = self.pair()
+        while self.tokens[self.i] not in ("}", _END):
+            pair = self.pair()
+            if pair is not None:
+                prop, val = pair
                 pairs[prop] = val
-                self.whitespace()
-                self.literal(";")
-                self.whitespace()
-            except AssertionError:
-                why = self.ignore_until([";", "}"])
-                if why == ";":
-                    self.literal(";")
-                    self.whitespace()
-                else:
-                    break
-
+            # 値の後ろの余計なものも、読めない宣言も次の;まで読み飛ばす
+            if self.ignore_until((";", "}")) == ";":
+                self.i += 1
         return pairs
 
-    def simple_selector(self) -> Selector:
+    def simple_selector(self, word: str) -> Selector:
         # impl: .class, #id, tag
-        word = self.word().lower()
+        word = word.lower()
         if word.startswith("."):
             return ClassSelector(word[1:])
         elif word.startswith("#"):
@@ -143,31 +522,31 @@ class CSSParser:
                 return SequenceSelector(TagSelector(tag), IdSelector(id_))
             return TagSelector(word)
 
-    def selector(self) -> Selector:
-        out: Selector = self.simple_selector()
-        self.whitespace()
-        while self.i < len(self.s) and self.s[self.i] != "{":
-            desendant = self.simple_selector()
-            out = DesendantSelector(out, desendant)
-            self.whitespace()
+    def selector(self) -> Union[Selector, None]:
+        # 単語の並びが{か入力の終わりまで続けば子孫セレクタ
+        words = []
+        while True:
+            word = self.word()
+            if word is None:
+                break
+            words.append(word)
+        if not words or self.tokens[self.i] not in ("{", _END):
+            return None
+        out = self.simple_selector(words[0])
+        for word in words[1:]:
+            out = DesendantSelector(out, self.simple_selector(word))
         return out
 
     def parse(self) -> List[CSSRule]:
         rules: List[CSSRule] = []  # type: ignore
-        while self.i < len(self.s):
-            try:
-                self.whitespace()
-                selector = self.selector()
-                self.literal("{")
-                self.whitespace()
+        while self.tokens[self.i] != _END:
+            selector = self.selector()
+            if selector is not None and self.literal("{"):
                 body = self.body()
-                self.literal("}")
-                rules.append((selector, body))
-            except AssertionError:
-                why = self.ignore_until(["}"])
-                if why == "}":
-                    self.literal("}")
-                    self.whitespace()
-                else:
-                    break
+                if self.literal("}"):
+                    rules.append((selector, body))
+                    continue
+            # 読めない規則は次の}まで読み飛ばす
+            if self.ignore_until(("}",)) == "}":
+                self.i += 1
         return rules
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Union
+
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+# これより小さいボディはmmapせずに読み込み、ファイルを開いたままにしない
+SMALL_BODY = 64 * 1024
+
+
+class MappedBody:
+    """mmapしたレスポンスボディ。text()を呼ぶまでPythonの文字列にしない
+
+    mmapはファイルを閉じても内部で複製したfdを持ち続けるので、text()で読み切るか
+    close()するまで開いたままになる。小さいボディはbytesに読み込んですぐ閉じる。
+    """
+
+    def __init__(self, path: str):
+        self._data = b""
+        self._map: Union[mmap.mmap, None] = None
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            if self.size > SMALL_BODY:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._data = f.read()
+        self._text: Union[str, None] = None
+
+    def text(self) -> str:
+        if self._text is None:
+            if self._map is None:
+                self._text = str(self._data, "utf-8")
+            else:
+                with memoryview(self._map) as view:
+                    self._text = str(view, "utf-8")
+            self.close()
+        return self._text
+
+    def chunks(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        data = self._map if self._map is not None else self._data
+        for i in range(0, self.size, chunk_size):
+            yield data[i : i + chunk_size]
+
+    def close(self) -> None:
+        self._data = b""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class DiskEntry:
+    def __init__(
+        self,
+        name: str,
+        size: int,
+        stored_at: float,
+        lifetime: float,
+        headers: Dict[str, str],
+    ):
+        self.name = name
+        self.size = size
+        self.stored_at = stored_at
+        self.lifetime = lifetime
+        self.headers = headers
+
+    def is_fresh(self, now: float) -> bool:
+        return now - self.stored_at < self.lifetime
+
+    def to_list(self, url: str) -> List:
+        return [url, self.name, self.size, self.stored_at, self.lifetime, self.headers]
+
+
+class DiskCache:
+    """インデックスファイル1つとエントリごとのボディファイルからなるディスクキャッシュ
+
+    書き込みは一時ファイルに書いてからos.replaceするので、途中で落ちても
+    インデックスとボディが食い違ったエントリは読み込み時に捨てられる。
+    インデックスの書き出しはindex_interval秒に1回までにまとめ、残りはflush()で書く。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        index_interval: float = 1.0,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_interval = index_interval
+        self.size = 0
+        self._entries: "OrderedDict[str, DiskEntry]" = OrderedDict()  # LRU順
+        self._lock = threading.Lock()
+        self._index_dirty = False
+        self._index_written = float("-inf")
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        if index.get("version") != INDEX_VERSION:
+            index = {"entries": []}
+        for record in index["entries"]:
+            try:
+                url, name, size, stored_at, lifetime, headers = record
+                if os.path.getsize(self._path(name)) != size:
+                    continue
+            except (OSError, TypeError, ValueError):
+                continue
+            self._entries[url] = DiskEntry(name, size, stored_at, lifetime, headers)
+            self.size += size
+        # インデックスにないボディ(書き込み途中で落ちたものなど)を消す
+        names = {entry.name for entry in self._entries.values()}
+        for file in os.listdir(self.directory):
+            if file == INDEX_FILE:
+                continue
+            if file.endswith(".body") and file[: -len(".body")] in names:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, file))
+            except OSError:
+                pass
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".body")
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _write_index(self) -> None:
+        index = {
+            "version": INDEX_VERSION,
+            "entries": [entry.to_list(url) for url, entry in self._entries.items()],
+        }
+        data = json.dumps(index, separators=(",", ":")).encode("utf-8")
+        self._write_atomic(os.path.join(self.directory, INDEX_FILE), data)
+        self._index_dirty = False
+        self._index_written = time.monotonic()
+
+    def _index_changed(self) -> None:
+        # 毎回書くとエントリ数に比例する書き込みとfsyncが保存のたびに起きる。
+        # 書かずに落ちても、インデックスにないボディは次の読み込みで捨てられるだけ
+        self._index_dirty = True
+        if time.monotonic() - self._index_written >= self.index_interval:
+            self._write_index()
+
+    def get(self, url: str) -> Union[DiskEntry, None]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+                self._index_dirty = True
+            return entry
+
+    def open_body(self, entry: DiskEntry) -> Union[MappedBody, None]:
+        try:
+            return MappedBody(self._path(entry.name))
+        except OSError:
+            return None
+
+    def put(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        body: str,
+        stored_at: float,
+        lifetime: float,
+    ) -> bool:
+        if "set-cookie" in headers:
+            return False
+        data = body.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return False
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._write_atomic(self._path(name), data)
+            self._remove(url, unlink=False)
+            self._entries[url] = DiskEntry(
+                name, len(data), stored_at, lifetime, dict(headers)
+            )
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                evicted_url = next(iter(self._entries))
+                self._remove(evicted_url)
+            self._index_changed()
+        return True
+
+    def update(
+        self, url: str, headers: Dict[str, str], stored_at: float, lifetime: float
+    ) -> None:
+        """再検証したエントリのメタデータだけを書き換える"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return
+            entry.headers = dict(headers)
+            entry.stored_at = stored_at
+            entry.lifetime = lifetime
+            self._index_changed()
+
+    def invalidate(self, url: str) -> None:
+        with self._lock:
+            if url in self._entries:
+                self._remove(url)
+                self._index_changed()
+
+    def _remove(self, url: str, unlink: bool = True) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is None:
+            return
+        self.size -= entry.size
+        if unlink:
+            try:
+                os.remove(self._path(entry.name))
+            except OSError:
+                pass
+
+    def flush(self) -> None:
+        """まだ書いていない変更とヒットで変わったLRU順をインデックスに書き出す"""
+        with self._lock:
+            if self._index_dirty:
+                self._write_index()
+
+    def clear(self) -> None:
+        with self._lock:
+            for url in list(self._entries):
+                self._remove(url)
+            self._write_index()
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return url in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
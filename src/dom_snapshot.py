@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple, Union
+
+from src.text import (
+    EMPTY_STYLE,
+    NO_CHILDREN,
+    SELF_CLOSING_TAGS,
+    Element,
+    HTMLNode,
+    Text,
+)
+
+# 形式を変えたら上げる。違う版のスナップショットは読まずに捨てる
+SNAPSHOT_VERSION = 1
+
+
+def body_key(body: Union[str, Iterable[str]]) -> str:
+    """レスポンスボディのハッシュ。チャンクのイテレータも受け取る"""
+    h = hashlib.sha256()
+    if isinstance(body, str):
+        body = [body]
+    for chunk in body:
+        h.update(chunk.encode("utf-8"))
+    return h.hexdigest()
+
+
+def serialize(root: HTMLNode) -> bytes:
+    """解析済みの木をバイト列にする
+
+    文字列はすべて重複を除いた表に入れ、木の形は前順に並べた整数の列で表す。
+    要素は [タグ, 属性の数, (名前, 値)..., 子の数]、テキストは [-1 - 文字列] の形。
+    """
+    strings: List[str] = []
+    ids: Dict[str, int] = {}
+
+    def sid(s: str) -> int:
+        i = ids.get(s)
+        if i is None:
+            i = ids[s] = len(strings)
+            strings.append(s)
+        return i
+
+    out = array("i")
+    stack: List[HTMLNode] = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Element):
+            attributes = node._attributes or {}
+            out.append(sid(node.tag))
+            out.append(len(attributes))
+            for key, value in attributes.items():
+                out.append(sid(key))
+                out.append(sid(value))
+            out.append(len(node.children))
+            stack.extend(reversed(node.children))
+        else:
+            assert isinstance(node, Text)
+            out.append(-1 - sid(node.text))
+    return marshal.dumps((SNAPSHOT_VERSION, strings, out.tobytes()))
+
+
+def deserialize(data: bytes) -> HTMLNode:
+    """serializeしたバイト列から木を作り直す
+
+    テキストはデコード済みなので、コンストラクタを通さずにスロットを直接埋める。
+    """
+    version, strings, raw = marshal.loads(data)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError("unsupported snapshot version {}".format(version))
+    codes = array("i")
+    codes.frombytes(raw)
+    new_element = Element.__new__
+    new_text = Text.__new__
+    intern = sys.intern
+    root: Union[Element, None] = None
+    # (親, 残りの子の数)
+    stack: List[Tuple[Element, int]] = []
+    i = 0
+    n = len(codes)
+    while i < n:
+        code = codes[i]
+        i += 1
+        parent = stack[-1][0] if stack else None
+        if code < 0:
+            text = new_text(Text)
+            text.parent = parent
+            text.style = EMPTY_STYLE  # type: ignore
+            text._dirty = 0
+            text.children = NO_CHILDREN  # type: ignore
+            text.text = strings[-1 - code]
+            node: HTMLNode = text
+            remaining = 0
+        else:
+            tag = intern(strings[code])
+            count = codes[i]
+            i += 1
+            attributes: Union[Dict[str, str], None] = None
+            if count:
+                attributes = {}
+                for _ in range(count):
+                    attributes[intern(strings[codes[i]])] = strings[codes[i + 1]]
+                    i += 2
+            remaining = codes[i]
+            i += 1
+            element = new_element(Element)
+            element.parent = parent
+            element.style = EMPTY_STYLE  # type: ignore
+            element.tag = tag
+            element._attributes = attributes
+            element._display = None
+            element._dirty = 0
+            element._children = (
+                NO_CHILDREN if tag in SELF_CLOSING_TAGS else []  # type: ignore
+            )
+            node = element
+        if parent is None:
+            assert isinstance(node, Element)
+            root = node
+        else:
+            parent._children.append(node)
+            # 子を全部読んだ親をたどって閉じる
+            top, left = stack[-1]
+            stack[-1] = (top, left - 1)
+        while stack and stack[-1][1] == 0:
+            stack.pop()
+        if remaining:
+            assert isinstance(node, Element)
+            stack.append((node, remaining))
+    assert root is not None
+    return root
+
+
+class DOMSnapshotCache:
+    """ボディのハッシュをキーにした、解析済みの木のスナップショットのLRUキャッシュ
+
+    メモリにはバイト列で持ち、取り出すたびに新しい木を作る(木はJSで書き換わるため)。
+    directoryを渡すとディスクにも残し、メモリから追い出されたものや
+    再起動後もそこから読む。
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        directory: Union[str, None] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.size = 0
+        self.disk_size = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # key -> size
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "disk_evictions": 0,
+        }
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._load_disk()
+
+    def _path(self, key: str) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, key + ".dom")
+
+    def _load_disk(self) -> None:
+        assert self.directory is not None
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".dom"):
+                # 書き込み途中で残った一時ファイル
+                if name.endswith(".tmp"):
+                    os.remove(path)
+                continue
+            st = os.stat(path)
+            files.append((st.st_mtime, name[: -len(".dom")], st.st_size))
+        # 最後に使った時刻(mtime)の古い順に並べる
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self.disk_size += size
+
+    def get(self, key: str) -> Union[HTMLNode, None]:
+        data = self._get_bytes(key)
+        if data is None:
+            return None
+        try:
+            return deserialize(data)
+        except (ValueError, EOFError, TypeError, IndexError):
+            self.invalidate(key)
+            with self._lock:
+                self._stats["hits"] -= 1
+                self._stats["misses"] += 1
+            return None
+
+    def _get_bytes(self, key: str) -> Union[bytes, None]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return data
+            on_disk = key in self._disk
+        if on_disk:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                data = None
+        with self._lock:
+            if data is None:
+                self.disk_size -= self._disk.pop(key, 0)
+                self._stats["misses"] += 1
+                return None
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._insert(key, data)
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            return data
+
+    def put(self, key: str, root: HTMLNode) -> None:
+        data = serialize(root)
+        with self._lock:
+            self._insert(key, data)
+            self._stats["stores"] += 1
+        if self.directory is not None and len(data) <= self.max_disk_bytes:
+            self._write_disk(key, data)
+
+    def _insert(self, key: str, data: bytes) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        assert self.directory is not None
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        evicted = []
+        with self._lock:
+            self.disk_size -= self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self.disk_size += len(data)
+            while self.disk_size > self.max_disk_bytes:
+                old, size = self._disk.popitem(last=False)
+                self.disk_size -= size
+                self._stats["disk_evictions"] += 1
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self._path(old))
+            except OSError:
+                pass
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is not None:
+                self.size -= len(data)
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self.disk_size -= size
+        if size is not None:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries or key in self._disk
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self.size
+            stats["disk_entries"] = len(self._disk)
+            stats["disk_bytes"] = self.disk_size
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+# Tab.loadで使うスナップショットのキャッシュ。enable_dom_snapshotsで有効にする
+DOM_SNAPSHOTS: Union[DOMSnapshotCache, None] = None
+
+
+def enable_dom_snapshots(
+    directory: Union[str, None] = None, max_bytes: int = 32 * 1024 * 1024
+) -> DOMSnapshotCache:
+    global DOM_SNAPSHOTS
+    DOM_SNAPSHOTS = DOMSnapshotCache(max_bytes, directory)
+    return DOM_SNAPSHOTS
@@ -1,3 +1,5 @@
+from typing import Union
+
 import skia
 
 
@@ -9,14 +11,14 @@ class Draw:
         right: float,
         bottom: float,
         rect: skia.Rect,
-        color: str,
+        color: Union[str, int],
     ):
         self.top: float = top
         self.left: float = left
         self.right: float = right
         self.bottom: float = bottom
         self.rect: skia.Rect = rect
-        self.color: str = color
+        self.color: Union[str, int] = color
 
     def execute(self, canvas):
         raise NotImplementedError
@@ -1,3 +1,5 @@
+from typing import Union
+
 import skia
 
 from src.draw.abstract import Draw
@@ -5,7 +7,9 @@ from src.util.draw_skia import draw_text, linespace
 
 
 class DrawText(Draw):
-    def __init__(self, x1: float, y1: float, text: str, font: skia.Font, color: str):
+    def __init__(
+        self, x1: float, y1: float, text: str, font: skia.Font, color: Union[str, int]
+    ):
         bottom = y1 + linespace(font)
         super().__init__(
             y1,
@@ -1,3 +1,5 @@
+import re
+
 # sourced mostly from https://www.w3schools.com/charsets/ref_html_entities_4.asp
 ENTITIES_DICT = {
     "&amp;": "&",
@@ -229,3 +231,42 @@ ENTITIES_DICT = {
     "&diams;": "♦",
     "&quot;": '"',
 }
+
+# 名前つき(&amp;)と数値(&#123; &#x1F600;)の文字参照
+ENTITY_PATTERN = re.compile(r"&(#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);")
+
+# "amp" -> "&" のように&と;を除いた名前で引く
+_NAMED = {
+    name[1:-1]: value
+    for name, value in ENTITIES_DICT.items()
+    if name.startswith("&") and name.endswith(";")
+}
+
+
+def _decode_reference(name: str) -> str:
+    if name[0] != "#":
+        # 知らない名前はそのまま残す
+        return "&" + name + ";"
+    if name[1] in "xX":
+        codepoint = int(name[2:], 16)
+    else:
+        codepoint = int(name[1:])
+    if codepoint == 0 or codepoint > 0x10FFFF or 0xD800 <= codepoint <= 0xDFFF:
+        return "\ufffd"
+    return chr(codepoint)
+
+
+def decode_entities(text: str) -> str:
+    """文字参照を1回の走査で置き換える。置き換えた結果はもう一度は展開しない"""
+    if "&" not in text:
+        return text
+    # splitすると奇数番目に参照の名前が入る
+    parts = ENTITY_PATTERN.split(text)
+    if len(parts) == 1:
+        return text
+    named = _NAMED
+    parts[1::2] = [
+        named[name] if name in named else _decode_reference(name)
+        for name in parts[1::2]
+    ]
+    return "".join(parts)
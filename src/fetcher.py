@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple, Union
+
+from src.netlog import NetworkLog
+from src.network import request
+from src.util.url import url_origin
+
+Response = Tuple[Dict[str, str], str, List[str]]
+# 1回の読み込みの間だけ使う、プリロードスキャナーが先に始めたリクエスト(URL -> Future)
+Preloads = Dict[str, "Future[Response]"]
+
+
+class Fetcher:
+    """サブリソースをスレッドプールで並行して取得する
+
+    同じオリジンへの同時リクエストはmax_per_originまでに抑える。
+    CSPなどのチェックは呼び出し側でfetchの前に済ませておくこと。
+    プリロードは読み込みごとのPreloadsに入れ、読み込みが終わったらdiscardで捨てる。
+    """
+
+    def __init__(
+        self, max_workers: int = 16, max_per_origin: int = 6, max_preloads: int = 64
+    ):
+        self.max_per_origin = max_per_origin
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="fetcher"
+        )
+        self._lock = threading.Lock()
+        self._origins: Dict[str, threading.BoundedSemaphore] = {}
+        self.max_preloads = max_preloads
+        self.stats: Dict[str, int] = {
+            "preloaded": 0,
+            "preload_hits": 0,
+            "preload_discarded": 0,
+        }
+
+    def _origin_slot(self, url: str) -> threading.BoundedSemaphore:
+        try:
+            origin = url_origin(url)
+        except ValueError:
+            origin = url.split(":", 1)[0]
+        with self._lock:
+            if origin not in self._origins:
+                self._origins[origin] = threading.BoundedSemaphore(self.max_per_origin)
+            return self._origins[origin]
+
+    def _request(
+        self,
+        url: str,
+        top_level_url: Union[str, None],
+        payload: Union[str, None],
+        log: Union[NetworkLog, None],
+    ) -> Response:
+        with self._origin_slot(url):
+            return request(url, top_level_url, payload, log=log)
+
+    def fetch(
+        self,
+        url: str,
+        top_level_url: Union[str, None],
+        payload: Union[str, None] = None,
+        log: Union[NetworkLog, None] = None,
+        preloads: Union[Preloads, None] = None,
+    ) -> Future[Response]:
+        if payload is None and preloads is not None:
+            with self._lock:
+                future = preloads.pop(url, None)
+                if future is not None:
+                    self.stats["preload_hits"] += 1
+                    return future
+        return self._executor.submit(self._request, url, top_level_url, payload, log)
+
+    def preload(
+        self,
+        url: str,
+        top_level_url: Union[str, None],
+        preloads: Preloads,
+        log: Union[NetworkLog, None] = None,
+    ) -> None:
+        """同じ読み込みの中であとでfetchされる予定のURLを先に取得し始める"""
+        with self._lock:
+            if url in preloads or len(preloads) >= self.max_preloads:
+                return
+            preloads[url] = self._executor.submit(
+                self._request, url, top_level_url, None, log
+            )
+            self.stats["preloaded"] += 1
+
+    def discard(self, preloads: Preloads) -> None:
+        """使われなかったプリロードを捨てる。まだ始まっていなければ取り消す"""
+        with self._lock:
+            for future in preloads.values():
+                future.cancel()
+                self.stats["preload_discarded"] += 1
+            preloads.clear()
+
+    def fetch_all(
+        self,
+        urls: List[str],
+        top_level_url: Union[str, None],
+        log: Union[NetworkLog, None] = None,
+        preloads: Union[Preloads, None] = None,
+    ) -> List[Future[Response]]:
+        """全部のリクエストを始めてから、urlsと同じ順番でFutureを返す"""
+        return [
+            self.fetch(url, top_level_url, log=log, preloads=preloads) for url in urls
+        ]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+FETCHER = Fetcher()
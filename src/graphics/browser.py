@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import ctypes
 import math
+import os
 import sys
 from enum import Enum, auto
 from typing import List
@@ -10,8 +11,10 @@ import sdl2
 import skia
 
 from src.cssparser import CSSParser
+from src.dom_snapshot import enable_dom_snapshots
 from src.global_value import CHROME_PX, HEIGHT, HSTEP, VSTEP, WIDTH
 from src.graphics.tab import Tab
+from src.network import enable_disk_cache, flush_disk_cache
 from src.util.draw_skia import draw_line, draw_rect, draw_text, parse_color
 
 
@@ -319,11 +322,18 @@ class Browser:
         self.draw()
 
     def handle_quit(self):
+        flush_disk_cache()
         sdl2.SDL_DestroyWindow(self.sdl_window)
 
 
 if __name__ == "__main__":
     sdl2.SDL_Init(sdl2.SDL_INIT_EVENTS)
+    if "BROWSER_CACHE_DIR" in os.environ:
+        # 再起動後もレスポンスを使い回す
+        enable_disk_cache(os.environ["BROWSER_CACHE_DIR"])
+    if "BROWSER_DOM_CACHE_DIR" in os.environ:
+        # 同じ文書を開き直したときに解析を省く
+        enable_dom_snapshots(os.environ["BROWSER_DOM_CACHE_DIR"])
     browser = Browser()
     browser.load(sys.argv[1])
     event = sdl2.SDL_Event()
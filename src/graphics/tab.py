@@ -1,24 +1,31 @@
 from __future__ import annotations
 
 import urllib.parse
-from typing import List, Union
+from typing import List, Type, Union
 
 import dukpy
 
 from src.graphics.history import History
-from src.cssparser import CSSParser, style
+from src import dom_snapshot
+from src.cssparser import CSSParser, restyle, style
 from src.draw import Draw, DrawLine
+from src.fetcher import FETCHER, Fetcher, Preloads
 from src.jscontext import JSContext
 from src.layout import DocumentLayout, InputLayout, LayoutObject
-from src.network import request
+from src.netlog import NetworkLog
+from src.network import request_stream
+from src.preload import PreloadScanner
 from src.selector import cascade_priority
-from src.text import Element, HTMLParser, Text
-from src.util.node import tree_to_list
+from src.text import Element, HTMLNode, HTMLParser, Text
+from src.util.node import find_instance, find_last, walk
 from src.util.url import resolve_url, url_origin
 from src.global_value import CHROME_PX, FONT_RATIO, SCROLL_STEP
 
 
 class Tab:
+    # 巨大な文書ではColumnarParserに差し替えるとメモリとGCの負担が減る
+    parser_class: Type[HTMLParser] = HTMLParser
+
     def __init__(self, width: float, height: float):
         self.scroll = 0
         with open("src/browser.css", mode="r") as f:
@@ -30,10 +37,21 @@ class Tab:
         self.allowed_origins: Union[List[str], None] = None
         self.font_ratio = FONT_RATIO
         self.forcus: Union[Element, None] = None
+        self.fetcher: Fetcher = FETCHER
+        # 同じボディを読み直したときに解析を省くためのキャッシュ(無効ならNone)
+        self.snapshots = dom_snapshot.DOM_SNAPSHOTS
+        # 直近のloadで行ったリクエストの記録
+        self.network_log = NetworkLog()
+        # 最後にstyleしたときのself.rulesと、それを優先度順に並べたもの
+        self._styled_rules: Union[List, None] = None
+        self._sorted_rules: List = []
 
     def load(self, url: str, body: Union[str, None] = None):
         self.history.append(url)
-        headers, body, _ = request(url, self.url, payload=body)
+        self.network_log = NetworkLog(url)
+        headers, chunks, _ = request_stream(
+            url, self.url, payload=body, log=self.network_log
+        )
         print("header\n", headers)
         self.allowed_origins = None
         if "content-security-policy" in headers:
@@ -42,58 +60,115 @@ class Tab:
                 self.allowed_origins = csp[1:]
         self.scroll = 0
         self.url = url
-        self.nodes = HTMLParser(body).parse()
-        self.rules = self._rules()
+
+        # 受信しながらサブリソースの取得を始め、届いた分から解析しておく。
+        # プリロードはこの読み込みの中でだけ使い、使われなかったものは最後に捨てる
+        preloads: Preloads = {}
+        try:
+            self._load_document(url, chunks, preloads)
+        finally:
+            self.fetcher.discard(preloads)
+        self.render()
+
+    def _load_document(self, url: str, chunks, preloads: Preloads) -> None:
+        scanner = PreloadScanner(url, lambda kind, url: self._preload(url, preloads))
+        if self.snapshots is not None and self.parser_class is HTMLParser:
+            self.nodes = self._parse_with_snapshot(scanner, chunks)
+        else:
+            parser = self.parser_class()
+            for chunk in chunks:
+                scanner.feed(chunk)
+                parser.feed(chunk)
+            self.nodes = parser.close()
+        scanner.close()
 
         scripts = [
             node.attributes["src"]
-            for node in tree_to_list(self.nodes, [])
+            for node in walk(self.nodes)
             if isinstance(node, Element)
             and node.tag == "script"
             and "src" in node.attributes
         ]
-        self.js = JSContext(self)
+        script_urls = []
         for script in scripts:
             script_url = resolve_url(script, self.url)
             if not self.allowed_request(script_url):
                 print("Blocked script", script, "due to CSP")
                 continue
-            header, body, _ = request(resolve_url(script, self.url), self.url)
+            script_urls.append((script, script_url))
+        # スタイルシートを待つ間にスクリプトも取得しておく
+        script_fetches = self.fetcher.fetch_all(
+            [script_url for _, script_url in script_urls],
+            self.url,
+            self.network_log,
+            preloads,
+        )
+        self.rules = self._rules(preloads)
+
+        self.js = JSContext(self)
+        for (script, _), fetch in zip(script_urls, script_fetches):
+            header, body, _ = fetch.result()
             try:
                 self.js.run(body)
             except dukpy.JSRuntimeError as e:
                 print("Script", script, "crashed", e)
-        self.render()
 
-    def _rules(self):
+    def _parse_with_snapshot(self, scanner: PreloadScanner, chunks) -> HTMLNode:
+        """ボディのハッシュで前回の木を探し、なければ解析して保存する
+
+        キーが決まるまで解析を始められないので、受信と解析は重ならない
+        """
+        assert self.snapshots is not None
+        parts = []
+        for chunk in chunks:
+            scanner.feed(chunk)
+            parts.append(chunk)
+        key = dom_snapshot.body_key(parts)
+        nodes = self.snapshots.get(key)
+        if nodes is None:
+            nodes = HTMLParser("".join(parts)).parse()
+            self.snapshots.put(key, nodes)
+        return nodes
+
+    def _preload(self, url: str, preloads: Preloads) -> None:
+        if self.allowed_request(url):
+            self.fetcher.preload(url, self.url, preloads, self.network_log)
+
+    def _rules(self, preloads: Union[Preloads, None] = None):
         rules = self.default_style_sheet.copy()
-        node_list = tree_to_list(self.nodes, [])
 
-        links = [
-            node.attributes["href"]
-            for node in node_list
-            if isinstance(node, Element)
-            and node.tag == "link"
-            and "href" in node.attributes
-            and node.attributes.get("rel") == "stylesheet"
-        ]
+        links = []
+        inline_styles = []
+        for node in walk(self.nodes):
+            if not isinstance(node, Element):
+                continue
+            if (
+                node.tag == "link"
+                and "href" in node.attributes
+                and node.attributes.get("rel") == "stylesheet"
+            ):
+                links.append(node.attributes["href"])
+            elif node.tag == "style":
+                inline_styles.append(node)
+        link_urls = []
         for link in links:
             script_url = resolve_url(link, self.url)
             if not self.allowed_request(script_url):
                 print("Blocked script", link, "due to CSP")
                 continue
+            link_urls.append(script_url)
+        # 取得は並行して行い、適用は文書の順番で行う
+        fetches = self.fetcher.fetch_all(
+            link_urls, self.url, self.network_log, preloads
+        )
+        for fetch in fetches:
             try:
-                _, body, _ = request(script_url, self.url)
+                _, body, _ = fetch.result()
             except Exception as e:
                 print(e)
                 continue
             rules.extend(CSSParser(body).parse())
 
-        inline_styles = [
-            node
-            for node in node_list
-            if isinstance(node, Element) and node.tag == "style"
-        ]
         for inline_style_node in inline_styles:
             assert isinstance(inline_style_node.children[0], Text)
             body = inline_style_node.children[0].text
@@ -106,8 +181,14 @@ class Tab:
             cmd.execute(canvas)
 
     def render(self) -> None:
-        # layout -> paint
-        style(self.nodes, sorted(self.rules, key=cascade_priority))
+        # style -> layout -> paint
+        if self._styled_rules is not self.rules:
+            # 読み込み直後は全体を計算する
+            self._sorted_rules = sorted(self.rules, key=cascade_priority)
+            style(self.nodes, self._sorted_rules)
+            self._styled_rules = self.rules
+        else:
+            restyle(self.nodes, self._sorted_rules)
         self.document = DocumentLayout(
             self.nodes, width=self.width, font_ratio=self.font_ratio
         )
@@ -116,11 +197,10 @@ class Tab:
         self.document.paint(self.display_list)
 
         if self.forcus:
-            obj = [
-                obj
-                for obj in tree_to_list(self.document, [])
-                if isinstance(obj, InputLayout) and obj.node == self.forcus
-            ][0]
+            obj = find_instance(
+                self.document, InputLayout, lambda obj: obj.node == self.forcus
+            )
+            assert obj is not None
             text = self.forcus.attributes.get("value", "")
             x = obj.x + obj.font.measureText(text)
             y = obj.y - self.scroll + CHROME_PX
@@ -134,7 +214,7 @@ class Tab:
             return
         inputs: List[Element] = [
             node
-            for node in tree_to_list(elt, [])
+            for node in walk(elt)
             if isinstance(node, Element)
             and node.tag == "input"
             and "name" in node.attributes
@@ -151,14 +231,15 @@ class Tab:
     def click(self, x: float, y: float):
         self.forcus = None
         y += self.scroll
-        objs: List[LayoutObject] = [
-            obj
-            for obj in tree_to_list(self.document, [])
-            if obj.x <= x < obj.x + obj.width and obj.y <= y < obj.y + obj.height
-        ]
-        if not objs:
+        # 一番手前(前順で最後)のオブジェクトだけを探し、全体のリストは作らない
+        hit: Union[LayoutObject, None] = find_last(
+            self.document,
+            lambda obj: obj.x <= x < obj.x + obj.width
+            and obj.y <= y < obj.y + obj.height,
+        )
+        if hit is None:
             return None
-        elt = objs[-1].node
+        elt = hit.node
         while elt:
             if isinstance(elt, Text):
                 pass
@@ -172,7 +253,7 @@ class Tab:
                     if self.js.dispatch_event("click", elt):
                         return
                     self.forcus = elt
-                    elt.attributes["value"] = ""
+                    elt.set_attribute("value", "")
                     return self.render()
                 elif elt.tag == "button":
                     if self.js.dispatch_event("click", elt):
@@ -193,12 +274,14 @@ class Tab:
         if self.forcus:
             if self.js.dispatch_event("keydown", self.forcus):
                 return
-            self.forcus.attributes["value"] += char
+            value = self.forcus.get_attribute("value") or ""
+            self.forcus.set_attribute("value", value + char)
             self.render()
 
     def backspace(self):
         if self.forcus:
-            self.forcus.attributes["value"] = self.forcus.attributes["value"][:-1]
+            value = self.forcus.get_attribute("value") or ""
+            self.forcus.set_attribute("value", value[:-1])
             self.render()
 
     def go_back(self):
@@ -7,7 +7,7 @@ import dukpy
 from src.cssparser import CSSParser
 from src.network import request
 from src.text import Element, HTMLParser
-from src.util.node import tree_to_list
+from src.util.node import walk
 from src.util.url import resolve_url, url_origin
 
 if TYPE_CHECKING:
@@ -61,8 +61,11 @@ class JSContext:
 
     def querySelectorAll(self, selector_text: str) -> List[int]:
         selector = CSSParser(selector_text).selector()
+        assert selector is not None, "invalid selector: " + selector_text
         nodes: List[Element] = [
-            node for node in tree_to_list(self.tab.nodes, []) if selector.matches(node)
+            node
+            for node in walk(self.tab.nodes)
+            if isinstance(node, Element) and selector.matches(node)
         ]
         return [self.get_handle(node) for node in nodes]
 
@@ -71,11 +74,11 @@ class JSContext:
         return elt.attributes.get(attr, None)
 
     def XMLHttpRequest_send(self, method: str, url: str, body: Union[str, None]):
-        full_url = resolve_url(self.tab.url, url)
+        full_url = resolve_url(url, self.tab.url)
         assert full_url is not None
         if not self.tab.allowed_request(full_url):
             raise Exception("Cross-origin XHR blocked by CSP")
         if url_origin(full_url) != url_origin(self.tab.url):
             raise Exception("Cross-origin XHR request not allowed")
-        _, out, _ = request(full_url, self.tab.url, body)
+        _, out, _ = request(full_url, self.tab.url, body, log=self.tab.network_log)
         return out
@@ -4,7 +4,7 @@ from typing import Dict, Generic, List, Tuple, TypeVar, Union, TYPE_CHECKING
 from src.draw import ClipRRect, SaveLayer
 
 from src.global_value import FONT_RATIO
-from src.util.draw_skia import parse_blend_mode
+from src.cssparser import typed_style
 
 if TYPE_CHECKING:
     from src.draw import Draw
@@ -57,13 +57,14 @@ class LayoutObject(Generic[PN, PRN, CN]):
         self.font_ratio = font_ratio
 
     def get_font(self, node: HTMLNode) -> skia.Font:
-        weight = node.style["font-weight"]
-        style = node.style["font-style"]
-        family = node.style["font-family"]
+        typed = typed_style(node.style)
+        weight = typed.font_weight
+        style = typed.font_style
+        family = typed.font_family
 
         if style == "normal":
             style = "roman"
-        size = float(node.style["font-size"][:-2]) * self.font_ratio
+        size = typed.font_size * self.font_ratio
 
         try:
             font = get_font(family, size, weight, style)
@@ -74,26 +75,63 @@ class LayoutObject(Generic[PN, PRN, CN]):
         return font
 
     def layout(self):
-        """レイアウトツリーを作成する"""
+        """レイアウトツリーを作成する
+
+        深い文書でも再帰しないように、子孫はスタックを使って前順にたどる。
+        各オブジェクトの子孫のlayoutはbegin_layoutとend_layoutの間に行う
+        """
+        stack: List[Tuple[LayoutObject, bool]] = [(self, False)]
+        while stack:
+            obj, children_done = stack.pop()
+            if children_done:
+                obj.end_layout()
+                continue
+            obj.begin_layout()
+            stack.append((obj, True))
+            stack.extend((child, False) for child in reversed(obj.children))
+
+    def begin_layout(self) -> None:
+        """子のレイアウトオブジェクトを作り、自分の位置を決める"""
         raise NotImplementedError
 
+    def end_layout(self) -> None:
+        """子のlayoutが終わったあとで自分の大きさを決める"""
+
     def paint(self, display_list: List[Draw]):
-        """描画するdisplay_listを作成する"""
-        raise NotImplementedError
+        """描画するdisplay_listを作成する。layoutと同じく再帰しない"""
+        stack: List[Tuple[LayoutObject, List[Draw], Union[List[Draw], None]]] = [
+            (self, display_list, None)
+        ]
+        while stack:
+            obj, out, cmds = stack.pop()
+            if cmds is not None:
+                obj.end_paint(cmds, out)
+                continue
+            cmds = obj.begin_paint(out)
+            stack.append((obj, out, cmds))
+            stack.extend((child, cmds, None) for child in reversed(obj.children))
+
+    def begin_paint(self, display_list: List[Draw]) -> List[Draw]:
+        """自分の描画コマンドを加え、子が描画コマンドを加えるリストを返す"""
+        return display_list
+
+    def end_paint(self, cmds: List[Draw], display_list: List[Draw]) -> None:
+        """子の描画が終わったあとで、begin_paintが返したcmdsをdisplay_listに移す"""
 
     def paint_visual_effects(
         self, node: HTMLNode, cmds: List[Draw], rect
     ) -> List[Draw]:
-        opacity = float(node.style.get("opacity", "1.0"))
-        blend_mode = parse_blend_mode(node.style.get("mix-blend-mode", ""))
+        typed = typed_style(node.style)
+        opacity = typed.opacity
+        blend_mode = typed.blend_mode
 
-        border_radius = float(node.style.get("border-radius", "0px")[:-2])
-        if node.style.get("overflow", "visible") == "clip":
+        border_radius = typed.border_radius
+        if typed.clip:
             clip_radius = border_radius
         else:
             clip_radius = 0
 
-        needs_clip = node.style.get("overflow", "visible") == "clip"
+        needs_clip = typed.clip
         needs_blend_isolation = (
             blend_mode != skia.BlendMode.kSrcOver or needs_clip or opacity != 1.0
         )
@@ -27,7 +27,7 @@ class ChildLayoutObject(
         self.word: str
         self.font: skia.Font
 
-    def layout(self):
+    def begin_layout(self):
         self.font = self.get_font(self.node)
         # self.width = self.font.meatureText(self.word)
         if self.previous:
@@ -38,5 +38,5 @@ class ChildLayoutObject(
 
         self.height = linespace(self.font)
 
-    def paint(self, display_list: List[Draw]):
+    def begin_paint(self, display_list: List[Draw]) -> List[Draw]:
         raise NotImplementedError
@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING, List, Union
 
 import skia
 
+from src.cssparser import typed_style
 from src.draw import DrawRRect
 from src.global_value import FONT_RATIO
 from src.layout.abstract import LayoutObject
@@ -25,7 +26,7 @@ class BlockLayout(LayoutObject[LayoutObject, Union[LayoutObject, None], LayoutOb
     ):
         super().__init__(node, parent, previous, font_ratio)
 
-    def layout(self) -> None:
+    def begin_layout(self) -> None:
         previous: Union[InlineLayout, BlockLayout, None] = None
         # create child layout object
         for child in self.node.children:
@@ -48,28 +49,29 @@ class BlockLayout(LayoutObject[LayoutObject, Union[LayoutObject, None], LayoutOb
             self.y = self.previous.y + self.previous.height
         else:
             self.y = self.parent.y
-        # childrenで再帰的にlayoutを実行する
-        for child_layout in self.children:
-            child_layout.layout()
+
+    def end_layout(self) -> None:
         # childrenを全て読んでheightを計算
         self.height = sum([child.height for child in self.children])
 
-    def paint(self, display_list: List[Draw]) -> None:
-        cmds = []
+    def begin_paint(self, display_list: List[Draw]) -> List[Draw]:
+        cmds: List[Draw] = []
 
         rect = skia.Rect.MakeLTRB(
             self.x, self.y, self.x + self.width, self.y + self.height
         )
-        bgcolor = self.node.style.get("background-color", "transparent")
-        if bgcolor != "transparent":
-            radius = float(self.node.style.get("border-radius", "0px")[:-2])
+        typed = typed_style(self.node.style)
+        bgcolor = typed.background_color
+        if bgcolor is not None:
+            radius = typed.border_radius
             cmds.append(DrawRRect(rect, radius, bgcolor))
+        return cmds
 
-        for child in self.children:
-            child.paint(cmds)
-
-        cmds = self.paint_visual_effects(self.node, cmds, rect)
-        display_list.extend(cmds)
+    def end_paint(self, cmds: List[Draw], display_list: List[Draw]) -> None:
+        rect = skia.Rect.MakeLTRB(
+            self.x, self.y, self.x + self.width, self.y + self.height
+        )
+        display_list.extend(self.paint_visual_effects(self.node, cmds, rect))
 
     def __repr__(self):
         return "BlockLayout(x={}, y={}, width={}, height={}, node={})".format(
@@ -7,7 +7,6 @@ from src.layout.abstract import LayoutObject
 from src.layout.block import BlockLayout
 
 if TYPE_CHECKING:
-    from src.draw import Draw
     from src.text import HTMLNode
 
 
@@ -28,14 +27,12 @@ class DocumentLayout(LayoutObject):
         self.y = vstep
         self.font_ratio = font_ratio
 
-    def layout(self) -> None:
+    def begin_layout(self) -> None:
         child = BlockLayout(self.node, self, None, self.font_ratio)
         self.children.append(child)
-        child.layout()
-        self.height = child.height + 2 * VSTEP
 
-    def paint(self, display_list: List[Draw]) -> None:
-        self.children[0].paint(display_list)
+    def end_layout(self) -> None:
+        self.height = self.children[0].height + 2 * VSTEP
 
     def __repr__(self):
         return "DocumentLayout()"
@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING, List, Union
 
 import skia
 
+from src.cssparser import typed_style
 from src.draw import DrawRRect
 from src.global_value import FONT_RATIO, HSTEP, INPUT_WIDTH_PX
 from src.layout.abstract import LayoutObject
@@ -11,6 +12,7 @@ from src.layout.input import InputLayout
 from src.layout.line import LineLayout
 from src.layout.text import TextLayout
 from src.text import Element, Text
+from src.util.node import walk
 
 if TYPE_CHECKING:
     from src.draw import Draw
@@ -18,6 +20,11 @@ if TYPE_CHECKING:
     from src.text import HTMLNode
 
 
+def _is_atomic(node: HTMLNode) -> bool:
+    """中身をテキストとして並べない要素"""
+    return isinstance(node, Element) and node.tag in ["input", "button"]
+
+
 class InlineLayout(LayoutObject[LayoutObject, Union[LayoutObject, None], "LineLayout"]):
     def __init__(
         self,
@@ -29,7 +36,7 @@ class InlineLayout(LayoutObject[LayoutObject, Union[LayoutObject, None], "LineLa
         super().__init__(node, parent, previous, font_ratio)
         self.previous_word: Union[ChildLayoutObject, None] = None
 
-    def layout(self):
+    def begin_layout(self):
         self.width = self.parent.width
         self.x = self.parent.x
 
@@ -41,24 +48,21 @@ class InlineLayout(LayoutObject[LayoutObject, Union[LayoutObject, None], "LineLa
         self.new_line()
         self.recurse(self.node)
 
-        for line in self.children:
-            line.layout()
-
+    def end_layout(self):
         self.height = sum([line.height for line in self.children])
 
     def recurse(self, node: HTMLNode):
-        if isinstance(node, Text):
-            self.text(node)
-        elif isinstance(node, Element):
-            if node.tag == "br":
-                self.new_line()
-            elif node.tag == "input" or node.tag == "button":
-                self.input(node)
+        # 入れ子の深いインライン要素でも再帰しないようにwalkでたどる
+        for descendant in walk(node, prune=_is_atomic):
+            if isinstance(descendant, Text):
+                self.text(descendant)
+            elif isinstance(descendant, Element):
+                if descendant.tag == "br":
+                    self.new_line()
+                elif descendant.tag == "input" or descendant.tag == "button":
+                    self.input(descendant)
             else:
-                for child in node.children:
-                    self.recurse(child)
-        else:
-            raise ValueError("Unknown node type")
+                raise ValueError("Unknown node type")
 
     def text(self, node: Text) -> None:
         font = self.get_font(node)
@@ -92,36 +96,27 @@ class InlineLayout(LayoutObject[LayoutObject, Union[LayoutObject, None], "LineLa
         font = self.get_font(node)
         self.cursor_x += w + font.measureText(" ")
 
-    def paint(self, display_list: List[Draw]) -> None:
-        cmds = []
+    def begin_paint(self, display_list: List[Draw]) -> List[Draw]:
+        cmds: List[Draw] = []
 
-        rect = skia.Rect.MakeLTRB(
-            self.x, self.y, self.x + self.width, self.y + self.height
-        )
-
-        is_atomic = not isinstance(self.node, Text) and (
-            isinstance(self.node, Element)
-            and self.node.tag
-            in [
-                "input",
-                "button",
-            ]
-        )
-
-        if not is_atomic:
-            bgcolor = self.node.style.get("background-color", "transparent")
-            if bgcolor != "transparent":
-                radius = float(self.node.style.get("border-radius", "0px")[:-2])
-                cmds.append(DrawRRect(rect, radius, bgcolor))
-
-        for child in self.children:
-            child.paint(cmds)
-
-        if not is_atomic:
-            cmds = self.paint_visual_effects(self.node, cmds, rect)
+        if not _is_atomic(self.node):
+            typed = typed_style(self.node.style)
+            bgcolor = typed.background_color
+            if bgcolor is not None:
+                radius = typed.border_radius
+                cmds.append(DrawRRect(self._rect(), radius, bgcolor))
+        return cmds
 
+    def end_paint(self, cmds: List[Draw], display_list: List[Draw]) -> None:
+        if not _is_atomic(self.node):
+            cmds = self.paint_visual_effects(self.node, cmds, self._rect())
         display_list.extend(cmds)
 
+    def _rect(self) -> skia.Rect:
+        return skia.Rect.MakeLTRB(
+            self.x, self.y, self.x + self.width, self.y + self.height
+        )
+
     def __repr__(self) -> str:
         return "InlineLayout(x={}, y={}, width={}, height={}, node={})".format(
             self.x, self.y, self.width, self.height, self.node
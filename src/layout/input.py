@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, List, Union
 
 from src.layout.abstract_child import ChildLayoutObject
+from src.cssparser import typed_style
 from src.draw import DrawRRect, DrawText
 from src.global_value import FONT_RATIO, INPUT_WIDTH_PX
 from src.layout.line import LineLayout
@@ -26,19 +27,20 @@ class InputLayout(ChildLayoutObject):
         super().__init__(node, parent, previous, font_ratio)
         self.font: skia.Font
 
-    def layout(self):
-        super().layout()
+    def begin_layout(self):
+        super().begin_layout()
         self.width = INPUT_WIDTH_PX
 
-    def paint(self, display_list: List[Draw]) -> None:
+    def begin_paint(self, display_list: List[Draw]) -> List[Draw]:
         cmds: List[Draw] = []
 
         rect = skia.Rect.MakeLTRB(
             self.x, self.y, self.x + self.width, self.y + self.height
         )
-        bgcolor = self.node.style.get("background-color", "transparent")
-        if bgcolor != "transparent":
-            radius = float(self.node.style.get("border-radius", "0px")[:-2])
+        typed = typed_style(self.node.style)
+        bgcolor = typed.background_color
+        if bgcolor is not None:
+            radius = typed.border_radius
             cmds.append(DrawRRect(rect, radius, bgcolor))
 
         assert isinstance(self.node, Element)
@@ -51,12 +53,13 @@ class InputLayout(ChildLayoutObject):
         else:
             raise ValueError("Invalid tag for InputLayout")
 
-        color = self.node.style["color"]
+        color = typed.color
         cmds.append(DrawText(self.x, self.y, text, self.font, color))
 
         cmds = self.paint_visual_effects(self.node, cmds, rect)
 
         display_list.extend(cmds)
+        return display_list
 
     def __repr__(self) -> str:
         return ("InputLayout(x={}, y={}, width={}, height={}, node={})").format(
@@ -1,13 +1,12 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, List, Union
+from typing import TYPE_CHECKING, Union
 from src.layout.abstract_child import ChildLayoutObject
 
 from src.global_value import FONT_RATIO
 from src.layout.abstract import LayoutObject
 
 if TYPE_CHECKING:
-    from src.draw import Draw
     from src.text import HTMLNode
 
 
@@ -23,7 +22,7 @@ class LineLayout(
     ):
         super().__init__(node, parent, previous, font_ratio)
 
-    def layout(self):
+    def begin_layout(self):
         self.width = self.parent.width
         self.x = self.parent.x
 
@@ -32,9 +31,7 @@ class LineLayout(
         else:
             self.y = self.parent.y
 
-        for word in self.children:
-            word.layout()
-
+    def end_layout(self):
         if not self.children:
             self.height = 0
             return
@@ -49,10 +46,6 @@ class LineLayout(
 
         self.height = 1.25 * (max_ascent + max_descent)
 
-    def paint(self, display_list: List[Draw]) -> None:
-        for child in self.children:
-            child.paint(display_list)
-
     def __repr__(self):
         return "LineLayout(x={}, y={}, width={}, height={})".format(
             self.x, self.y, self.width, self.height
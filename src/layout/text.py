@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, List, Union
 from src.layout.abstract_child import ChildLayoutObject
 
+from src.cssparser import typed_style
 from src.draw import DrawText
 from src.global_value import FONT_RATIO
 
@@ -27,13 +28,14 @@ class TextLayout(ChildLayoutObject):
         self.word = word
         self.font: skia.Font
 
-    def layout(self):
-        super().layout()
+    def begin_layout(self):
+        super().begin_layout()
         self.width = self.font.measureText(self.word)
 
-    def paint(self, display_list: List[Draw]) -> None:
-        color = self.node.style["color"]
+    def begin_paint(self, display_list: List[Draw]) -> List[Draw]:
+        color = typed_style(self.node.style).color
         display_list.append(DrawText(self.x, self.y, self.word, self.font, color))
+        return display_list
 
     def __repr__(self) -> str:
         return ("TextLayout(x={}, y={}, width={}, height={}, node={}, word={})").format(
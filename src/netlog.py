@@ -0,0 +1,195 @@
+import datetime
+import json
+import threading
+import time
+from typing import Dict, List, Union
+
+HAR_VERSION = "1.2"
+
+
+def _ms(seconds: Union[float, None]) -> float:
+    # HARでは該当しない時間を-1で表す
+    if seconds is None:
+        return -1
+    return round(seconds * 1000, 3)
+
+
+def _har_headers(headers: Dict[str, str]) -> List[Dict[str, str]]:
+    return [{"name": name, "value": value} for name, value in headers.items()]
+
+
+class RequestTiming:
+    """1つのリクエストの時間の内訳とバイト数
+
+    時間は秒で持ち、使わなかった段階(使い回した接続のdnsなど)はNoneのままにする。
+    """
+
+    def __init__(self, method: str, url: str, log_start: float):
+        self.method = method
+        self.url = url
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.offset = self._start - log_start  # ページ読み込みの開始からの時間
+        self.blocked: Union[float, None] = None
+        self.dns: Union[float, None] = None
+        self.connect: Union[float, None] = None  # TCPだけ。TLSはsslに入れる
+        self.ssl: Union[float, None] = None
+        self.send: Union[float, None] = None
+        self.wait: Union[float, None] = None
+        self.receive = 0.0
+        self.decode = 0.0  # gzipの展開
+        self.total: Union[float, None] = None
+        self.status = 0
+        self.status_text = ""
+        self.http_version = ""
+        self.request_headers: Dict[str, str] = {}
+        self.request_size = 0
+        self.response_headers: Dict[str, str] = {}
+        self.transfer_size = 0  # 受信したボディのバイト数
+        self.body_size: Union[int, None] = None  # 展開したあとのバイト数
+        self.cache: Union[str, None] = None  # "hit", "revalidated"
+        self.redirect_url = ""
+        self.error: Union[str, None] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.total is not None
+
+    def count_body(self, size: int) -> None:
+        """展開したあとのボディのバイト数を足す"""
+        self.body_size = (self.body_size or 0) + size
+
+    def finish(self) -> None:
+        if self.total is None:
+            self.total = time.perf_counter() - self._start
+            if self.body_size is None:
+                self.body_size = self.transfer_size
+
+    def to_har(self) -> Dict:
+        content_type = self.response_headers.get("content-type", "")
+        body_size = self.body_size if self.body_size is not None else 0
+        entry = {
+            "startedDateTime": datetime.datetime.fromtimestamp(
+                self.started, datetime.timezone.utc
+            ).isoformat(),
+            "time": _ms(self.total),
+            "request": {
+                "method": self.method,
+                "url": self.url,
+                "httpVersion": "HTTP/1.1",
+                "headers": _har_headers(self.request_headers),
+                "queryString": [],
+                "cookies": [],
+                "headersSize": -1,
+                "bodySize": self.request_size,
+            },
+            "response": {
+                "status": self.status,
+                "statusText": self.status_text,
+                "httpVersion": self.http_version,
+                "headers": _har_headers(self.response_headers),
+                "cookies": [],
+                "content": {
+                    "size": body_size,
+                    "compression": body_size - self.transfer_size,
+                    "mimeType": content_type,
+                },
+                "redirectURL": self.redirect_url,
+                "headersSize": -1,
+                "bodySize": self.transfer_size,
+            },
+            "cache": {},
+            "timings": {
+                "blocked": _ms(self.blocked),
+                "dns": _ms(self.dns),
+                # HARのconnectはTLSのハンドシェイクを含む
+                "connect": _ms(
+                    None if self.connect is None else self.connect + (self.ssl or 0.0)
+                ),
+                "ssl": _ms(self.ssl),
+                "send": _ms(self.send),
+                "wait": _ms(self.wait),
+                "receive": _ms(self.receive),
+            },
+            "_offset": _ms(self.offset),
+            "_decode": _ms(self.decode),
+        }
+        if self.cache is not None:
+            entry["_cache"] = self.cache
+        if self.error is not None:
+            entry["_error"] = self.error
+        return entry
+
+
+class NetworkLog:
+    """1回のページ読み込みで行ったリクエストを開始した順に記録する"""
+
+    def __init__(self, page_url: Union[str, None] = None):
+        self.page_url = page_url
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.entries: List[RequestTiming] = []
+        self._lock = threading.Lock()
+
+    def start(self, method: str, url: str) -> RequestTiming:
+        entry = RequestTiming(method, url, self._start)
+        with self._lock:
+            self.entries.append(entry)
+        return entry
+
+    def to_har(self) -> Dict:
+        with self._lock:
+            entries = list(self.entries)
+        page_id = "page_1"
+        har_entries = []
+        for entry in entries:
+            har = entry.to_har()
+            har["pageref"] = page_id
+            har_entries.append(har)
+        return {
+            "log": {
+                "version": HAR_VERSION,
+                "creator": {"name": "toy-browser", "version": "0.1"},
+                "pages": [
+                    {
+                        "startedDateTime": datetime.datetime.fromtimestamp(
+                            self.started, datetime.timezone.utc
+                        ).isoformat(),
+                        "id": page_id,
+                        "title": self.page_url or "",
+                        "pageTimings": {},
+                    }
+                ],
+                "entries": har_entries,
+            }
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_har(), f, indent=2)
+
+    def waterfall(self, width: int = 60) -> str:
+        """リクエストごとの開始位置と長さを横棒で表す"""
+        with self._lock:
+            entries = list(self.entries)
+        if not entries:
+            return ""
+        end = max(e.offset + (e.total or 0.0) for e in entries) or 1.0
+        lines = []
+        for e in entries:
+            start = int(e.offset / end * width)
+            length = max(1, int((e.total or 0.0) / end * width))
+            lines.append(
+                "{:<{w}} {:>8.1f}ms {} {}".format(
+                    " " * start + "#" * length,
+                    (e.total or 0.0) * 1000,
+                    e.status or "-",
+                    e.url,
+                    w=width,
+                )
+            )
+        return "\n".join(lines)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self.entries)
@@ -1,9 +1,696 @@
-import gzip
+import codecs
+import datetime
+import email.utils
+import io
+import ipaddress
+import re
 import socket
 import ssl
-from typing import Dict, List, Tuple, Union
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from src.disk_cache import DiskCache, MappedBody
+from src.entities import decode_entities
+from src.netlog import NetworkLog, RequestTiming
 
 COOKIE_JAR: Dict[str, Tuple[str, Dict]] = {}
+READ_SIZE = 64 * 1024
+
+
+class TLSSessionCache:
+    """プロセスで共有するSSLContextとホストごとのTLSセッション
+
+    create_default_contextはCAバンドルを毎回読み込むので、最初に使うときに1度だけ作る。
+    セッションは同じSSLContextでしか再開できないので、contextを差し替えたら捨てる。
+    """
+
+    def __init__(self, max_sessions: int = 256):
+        self.max_sessions = max_sessions
+        self._context: Union[ssl.SSLContext, None] = None
+        self._sessions: OrderedDict[Tuple[str, int], ssl.SSLSession] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"handshakes": 0, "resumed": 0, "contexts": 0}
+        self._handshake_time = 0.0
+        self._resumed_time = 0.0
+
+    def context(self) -> ssl.SSLContext:
+        with self._lock:
+            if self._context is None:
+                self._context = ssl.create_default_context()
+                self._sessions.clear()
+                self._stats["contexts"] += 1
+            return self._context
+
+    def set_context(self, context: Union[ssl.SSLContext, None]) -> None:
+        """独自のCAを使うときなどにcontextを差し替える。Noneで既定に戻す"""
+        with self._lock:
+            self._context = context
+            self._sessions.clear()
+
+    def session(self, host: str, port: int) -> Union[ssl.SSLSession, None]:
+        with self._lock:
+            return self._sessions.get((host, port))
+
+    def save(self, host: str, port: int, sock) -> None:
+        # TLS 1.3のチケットはハンドシェイク後に届くので、レスポンスを読んでから保存する
+        session = getattr(sock, "session", None)
+        if session is None:
+            return
+        with self._lock:
+            self._sessions[(host, port)] = session
+            self._sessions.move_to_end((host, port))
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def record(self, elapsed: float, resumed: bool) -> None:
+        with self._lock:
+            self._stats["handshakes"] += 1
+            self._handshake_time += elapsed
+            if resumed:
+                self._stats["resumed"] += 1
+                self._resumed_time += elapsed
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            handshakes = self._stats["handshakes"]
+            resumed = self._stats["resumed"]
+            full = handshakes - resumed
+            return {
+                **self._stats,
+                "sessions": len(self._sessions),
+                "resumption_rate": resumed / handshakes if handshakes else 0.0,
+                "handshake_ms": self._handshake_time * 1000,
+                "avg_full_ms": (
+                    (self._handshake_time - self._resumed_time) * 1000 / full
+                    if full
+                    else 0.0
+                ),
+                "avg_resumed_ms": (
+                    self._resumed_time * 1000 / resumed if resumed else 0.0
+                ),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self._stats = {"handshakes": 0, "resumed": 0, "contexts": 0}
+            self._handshake_time = 0.0
+            self._resumed_time = 0.0
+
+
+TLS = TLSSessionCache()
+
+# (family, sockaddr)のリスト
+Addresses = List[Tuple[int, Tuple]]
+
+
+def system_resolve(host: str, port: int) -> Addresses:
+    infos = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)
+    return [(family, sockaddr) for family, _, _, _, sockaddr in infos]
+
+
+def hosts_resolver(hosts: Dict[str, str]) -> Callable[[str, int], Addresses]:
+    """hostsファイルの代わりにホスト名 -> IPアドレスの辞書で名前解決する"""
+
+    def resolve(host: str, port: int) -> Addresses:
+        if host not in hosts:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [(socket.AF_INET, (hosts[host], port))]
+
+    return resolve
+
+
+def _is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class _Lookup:
+    """同じホストを同時に引こうとしたスレッドは最初のスレッドの結果を待つ"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.addresses: Union[Addresses, None] = None
+        self.error: Union[BaseException, None] = None
+
+
+class Resolver:
+    """名前解決の結果をTTLつきでキャッシュする
+
+    失敗した結果もnegative_ttlの間は覚えておき、同じエラーをすぐに返す。
+    resolveを差し替えればネットワークなしでテストやベンチマークを動かせる。
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        negative_ttl: float = 5.0,
+        resolve: Callable[[str, int], Addresses] = system_resolve,
+        max_entries: int = 512,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._resolve = resolve
+        # (host, port) -> (期限, アドレス, エラー)
+        self._cache: OrderedDict[
+            Tuple[str, int],
+            Tuple[float, Union[Addresses, None], Union[OSError, None]],
+        ] = OrderedDict()
+        self._inflight: Dict[Tuple[str, int], _Lookup] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "lookups": 0,
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "failures": 0,
+        }
+        self._resolve_time = 0.0
+
+    def resolve(self, host: str, port: int) -> Tuple[Addresses, float]:
+        """アドレスのリストと名前解決にかかった秒数を返す"""
+        start = time.perf_counter()
+        if _is_ip_address(host):
+            return [(socket.AF_INET, (host, port))], 0.0
+        key = (host, port)
+        with self._lock:
+            self._stats["lookups"] += 1
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                _, addresses, error = cached
+                if error is not None:
+                    self._stats["negative_hits"] += 1
+                    raise error
+                self._stats["hits"] += 1
+                assert addresses is not None
+                return addresses, time.perf_counter() - start
+            lookup = self._inflight.get(key)
+            leader = lookup is None
+            if lookup is None:
+                lookup = self._inflight[key] = _Lookup()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if leader:
+            self._lookup(key, lookup)
+        else:
+            lookup.done.wait()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._resolve_time += elapsed
+        if lookup.error is not None:
+            raise lookup.error
+        assert lookup.addresses is not None
+        return lookup.addresses, elapsed
+
+    def _lookup(self, key: Tuple[str, int], lookup: _Lookup) -> None:
+        cached: Union[Tuple[float, Union[Addresses, None], Union[OSError, None]], None]
+        cached = None
+        try:
+            try:
+                lookup.addresses = self._resolve(*key)
+                cached = (time.monotonic() + self.ttl, lookup.addresses, None)
+            except OSError as e:
+                lookup.error = e
+                cached = (time.monotonic() + self.negative_ttl, None, e)
+            except BaseException as e:
+                # OSError以外はキャッシュしないが、待っているスレッドにも同じ例外を返す
+                lookup.error = e
+                raise
+        finally:
+            # 例外が何であっても、待っているスレッドと次のresolveを止めない
+            with self._lock:
+                if lookup.error is not None:
+                    self._stats["failures"] += 1
+                if cached is not None:
+                    self._cache[key] = cached
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+                del self._inflight[key]
+            lookup.done.set()
+
+    def invalidate(self, host: str, port: int) -> None:
+        with self._lock:
+            self._cache.pop((host, port), None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._cache),
+                "resolve_ms": self._resolve_time * 1000,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+RESOLVER = Resolver()
+
+
+class Connection:
+    """keep-aliveで使い回すHTTP(S)接続"""
+
+    def __init__(self, scheme: str, host: str, port: int):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        addresses, self.dns_time = RESOLVER.resolve(host, port)
+        start = time.perf_counter()
+        self.sock = self._connect(addresses)
+        self.connect_time = time.perf_counter() - start
+        self.tls_time: Union[float, None] = None
+        if scheme == "https":
+            ctx = TLS.context()
+            session = TLS.session(host, port)
+            start = time.perf_counter()
+            if session is not None:
+                self.sock = ctx.wrap_socket(
+                    self.sock, server_hostname=host, session=session
+                )
+            else:
+                self.sock = ctx.wrap_socket(self.sock, server_hostname=host)
+            self.tls_time = time.perf_counter() - start
+            TLS.record(self.tls_time, getattr(self.sock, "session_reused", False))
+        # makefileはレスポンスを読むときに1度だけ作る(先読みしたバッファを次のレスポンスで使う)
+        self.response: Union[io.BufferedReader, None] = None
+        self.requests = 0
+        self.last_used = time.monotonic()
+        self.sent_at = 0.0
+
+    def _connect(self, addresses: Addresses):
+        """解決したアドレスを順番に試す"""
+        error: Union[OSError, None] = None
+        for family, sockaddr in addresses:
+            sock = socket.socket(
+                family=family, type=socket.SOCK_STREAM, proto=socket.IPPROTO_TCP
+            )
+            try:
+                sock.connect(sockaddr)
+                return sock
+            except OSError as e:
+                sock.close()
+                error = e
+        if error is None:
+            error = OSError("No addresses for {}".format(self.host))
+        # 古いアドレスで繋がらなかったかもしれないので次は引き直す
+        RESOLVER.invalidate(self.host, self.port)
+        raise error
+
+    @property
+    def key(self) -> Tuple[str, str, int]:
+        return (self.scheme, self.host, self.port)
+
+    def send(self, data: bytes) -> None:
+        self.requests += 1
+        self.sock.sendall(data)
+        self.sent_at = time.perf_counter()
+
+    def reader(self) -> io.BufferedReader:
+        if self.response is None:
+            self.response = self.sock.makefile("rb", newline="\r\n")
+        return self.response
+
+    def save_session(self) -> None:
+        if self.scheme == "https":
+            TLS.save(self.host, self.port, self.sock)
+
+    def close(self) -> None:
+        self.save_session()
+        if self.response is not None:
+            self.response.close()
+        self.sock.close()
+
+
+class ConnectionPool:
+    """(scheme, host, port)ごとにアイドル状態の接続を保持する"""
+
+    def __init__(
+        self,
+        max_idle_per_host: int = 6,
+        max_idle: int = 32,
+        idle_timeout: float = 30.0,
+    ):
+        self.max_idle_per_host = max_idle_per_host
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._idle: List[Connection] = []  # 古い順
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "created": 0,
+            "reused": 0,
+            "released": 0,
+            "evicted": 0,
+            "expired": 0,
+            "discarded": 0,
+        }
+
+    def acquire(
+        self, scheme: str, host: str, port: int, fresh: bool = False
+    ) -> Tuple[Connection, bool]:
+        """接続を取り出す。2つ目の戻り値は使い回した接続かどうか"""
+        key = (scheme, host, port)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            for i in range(len(self._idle) - 1, -1, -1):
+                if not fresh and self._idle[i].key == key:
+                    conn = self._idle.pop(i)
+                    self._stats["reused"] += 1
+                    return conn, True
+            self._stats["created"] += 1
+        return Connection(scheme, host, port), False
+
+    def release(self, conn: Connection) -> None:
+        conn.last_used = time.monotonic()
+        conn.save_session()
+        evicted: List[Connection] = []
+        with self._lock:
+            self._stats["released"] += 1
+            self._idle.append(conn)
+            same_host = [c for c in self._idle if c.key == conn.key]
+            if len(same_host) > self.max_idle_per_host:
+                evicted.append(same_host[0])
+                self._idle.remove(same_host[0])
+            while len(self._idle) > self.max_idle:
+                evicted.append(self._idle.pop(0))
+            self._stats["evicted"] += len(evicted)
+        for c in evicted:
+            c.close()
+
+    def discard(self, conn: Connection) -> None:
+        with self._lock:
+            self._stats["discarded"] += 1
+        conn.close()
+
+    def _expire(self, now: float) -> None:
+        alive = []
+        for conn in self._idle:
+            if now - conn.last_used > self.idle_timeout:
+                self._stats["expired"] += 1
+                conn.close()
+            else:
+                alive.append(conn)
+        self._idle = alive
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+CONNECTION_POOL = ConnectionPool()
+
+
+class CacheEntry:
+    def __init__(
+        self,
+        headers: Dict[str, str],
+        body: Union[str, MappedBody],
+        stored_at: float,
+        lifetime: float,
+    ):
+        self.headers = headers
+        self._body = body
+        self.stored_at = stored_at
+        self.lifetime = lifetime
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers.items())
+
+    @property
+    def body(self) -> str:
+        # ディスクから読んだボディは使うときに初めてデコードする
+        if isinstance(self._body, MappedBody):
+            self._body = self._body.text()
+        return self._body
+
+    def is_fresh(self, now: float) -> bool:
+        return now - self.stored_at < self.lifetime
+
+    def chunks(self) -> Iterator[str]:
+        if isinstance(self._body, MappedBody):
+            return self._stream_mapped(self._body)
+        return iter([self._body])
+
+    def _stream_mapped(self, mapped: MappedBody) -> Iterator[str]:
+        # 流し終えたらデコードした文字列に置き換えてmmapを閉じる
+        parts = []
+        for part in decode_utf8(mapped.chunks()):
+            parts.append(part)
+            yield part
+        if self._body is mapped:
+            self._body = "".join(parts)
+            mapped.close()
+
+    def validators(self) -> Dict[str, str]:
+        """条件付きリクエストに付けるヘッダー"""
+        out: Dict[str, str] = {}
+        if "etag" in self.headers:
+            out["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            out["If-Modified-Since"] = self.headers["last-modified"]
+        return out
+
+
+def parse_cache_control(value: str) -> Dict[str, str]:
+    directives: Dict[str, str] = {}
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "=" in part:
+            name, arg = part.split("=", 1)
+            directives[name.strip().lower()] = arg.strip().strip('"')
+        else:
+            directives[part.lower()] = ""
+    return directives
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> Union[float, None]:
+    """レスポンスがキャッシュできる秒数。保存してはいけなければNoneを返す"""
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        lifetime = 0.0
+    elif "max-age" in directives:
+        try:
+            lifetime = float(directives["max-age"])
+        except ValueError:
+            lifetime = 0.0
+    elif "expires" in headers:
+        try:
+            expires = email.utils.parsedate_to_datetime(headers["expires"])
+            if "date" in headers:
+                date = email.utils.parsedate_to_datetime(headers["date"])
+            else:
+                date = datetime.datetime.now(datetime.timezone.utc)
+            lifetime = (expires - date).total_seconds()
+        except (TypeError, ValueError):
+            # 不正なExpiresは期限切れとして扱う
+            lifetime = 0.0
+    else:
+        lifetime = 0.0
+    if "age" in headers:
+        try:
+            lifetime -= float(headers["age"])
+        except ValueError:
+            pass
+    lifetime = max(lifetime, 0.0)
+    if lifetime == 0.0 and "etag" not in headers and "last-modified" not in headers:
+        # 再検証もできないので保存しても意味がない
+        return None
+    return lifetime
+
+
+class HTTPCache:
+    """URLをキーにしたメモリ上のLRUレスポンスキャッシュ
+
+    diskを設定するとメモリにないエントリをディスクキャッシュから探す
+    """
+
+    def __init__(
+        self, max_bytes: int = 32 * 1024 * 1024, disk: Union[DiskCache, None] = None
+    ):
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self.size = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "revalidations": 0,
+            "not_modified": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    def get_fresh(self, url: str, use_disk: bool = True) -> Union[CacheEntry, None]:
+        """ネットワークに問い合わせずに使えるエントリを返す"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and entry.is_fresh(now):
+                self._entries.move_to_end(url)
+                self._stats["hits"] += 1
+                return entry
+        entry = self._from_disk(url) if use_disk else None
+        with self._lock:
+            if entry is not None and entry.is_fresh(now):
+                self._insert(url, entry)
+                self._stats["hits"] += 1
+                self._stats["disk_hits"] += 1
+                return entry
+            self._stats["misses"] += 1
+            return None
+
+    def lookup(self, url: str, use_disk: bool = True) -> Union[CacheEntry, None]:
+        """期限切れでも再検証に使えるエントリを返す"""
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is None and use_disk:
+            entry = self._from_disk(url)
+        return entry
+
+    def _from_disk(self, url: str) -> Union[CacheEntry, None]:
+        if self.disk is None:
+            return None
+        disk_entry = self.disk.get(url)
+        if disk_entry is None:
+            return None
+        body = self.disk.open_body(disk_entry)
+        if body is None:
+            return None
+        return CacheEntry(
+            dict(disk_entry.headers), body, disk_entry.stored_at, disk_entry.lifetime
+        )
+
+    def store(
+        self, url: str, headers: Dict[str, str], body: str, use_disk: bool = True
+    ) -> bool:
+        if "set-cookie" in headers:
+            return False
+        lifetime = freshness_lifetime(headers)
+        if lifetime is None:
+            self.invalidate(url)
+            return False
+        entry = CacheEntry(dict(headers), body, time.time(), lifetime)
+        if self.disk is not None and use_disk:
+            self.disk.put(url, entry.headers, body, entry.stored_at, lifetime)
+        if entry.size > self.max_bytes:
+            return False
+        with self._lock:
+            self._insert(url, entry)
+            self._stats["stores"] += 1
+        return True
+
+    def _insert(self, url: str, entry: CacheEntry) -> None:
+        self._remove(url)
+        self._entries[url] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            self._stats["evictions"] += 1
+
+    def revalidated(
+        self, url: str, entry: CacheEntry, headers: Dict[str, str]
+    ) -> CacheEntry:
+        """304を受け取ったエントリのヘッダーと鮮度を更新する"""
+        merged = dict(entry.headers)
+        merged.update(headers)
+        lifetime = freshness_lifetime(merged) or 0.0
+        entry = CacheEntry(merged, entry._body, time.time(), lifetime)
+        if self.disk is not None:
+            self.disk.update(url, merged, entry.stored_at, lifetime)
+        with self._lock:
+            self._stats["not_modified"] += 1
+            self._insert(url, entry)
+        return entry
+
+    def count_revalidation(self) -> None:
+        with self._lock:
+            self._stats["revalidations"] += 1
+
+    def invalidate(self, url: str) -> None:
+        with self._lock:
+            self._remove(url)
+        if self.disk is not None:
+            self.disk.invalidate(url)
+
+    def _remove(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return url in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self.size
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+HTTP_CACHE = HTTPCache()
+
+
+def enable_disk_cache(directory: str, max_bytes: int = 256 * 1024 * 1024) -> DiskCache:
+    """再起動しても残るディスクキャッシュをHTTP_CACHEの下に置く"""
+    HTTP_CACHE.disk = DiskCache(directory, max_bytes)
+    return HTTP_CACHE.disk
+
+
+def flush_disk_cache() -> None:
+    """ディスクキャッシュのまだ書いていないインデックスを書き出す。終了時に呼ぶ"""
+    if HTTP_CACHE.disk is not None:
+        HTTP_CACHE.disk.flush()
 
 
 def request(
@@ -11,7 +698,25 @@ def request(
     top_level_url: Union[str, None],
     payload: Union[str, None] = None,
     max_redirs: int = 50,
+    log: Union[NetworkLog, None] = None,
 ) -> Tuple[Dict[str, str], str, List[str]]:
+    headers, chunks, option = request_stream(
+        url, top_level_url, payload, max_redirs, log
+    )
+    return headers, "".join(chunks), option
+
+
+def request_stream(
+    url: str,
+    top_level_url: Union[str, None],
+    payload: Union[str, None] = None,
+    max_redirs: int = 50,
+    log: Union[NetworkLog, None] = None,
+) -> Tuple[Dict[str, str], Iterator[str], List[str]]:
+    """requestと同じだが、ボディを届いた順にデコードした文字列のイテレータで返す
+
+    logを渡すとHTTP(S)のリクエストごとに時間の内訳を記録する
+    """
     if max_redirs == 0:
         raise Exception("Too many redirects")
 
@@ -29,11 +734,10 @@ def request(
 
     if scheme == "data":
         content_type, body = url.split(r",", 1)
-        return {"content-type": content_type}, body, option
+        return {"content-type": content_type}, iter([body]), option
 
     if scheme == "file":
-        with open(url[2:], "r") as f:
-            return {}, f.read(), option
+        return {}, _read_file(open(url[2:], "r")), option
 
     if scheme == "view-source":
         scheme, url = url.split(":", 1)
@@ -55,32 +759,85 @@ def request(
         host, port_str = host.split(":", 1)
         port = int(port_str)
 
-    with socket.socket(
-        family=socket.AF_INET, type=socket.SOCK_STREAM, proto=socket.IPPROTO_TCP
-    ) as sock:
-        if scheme == "https":
-            ctx = ssl.create_default_context()
-            with ctx.wrap_socket(sock, server_hostname=host) as ssock:
-                headers, body = _get_headers_and_body(
-                    ssock,
-                    method,
-                    host,
-                    port,
-                    path,
-                    scheme,
-                    top_level_url,
-                    payload,
-                    max_redirs,
-                )
-                return headers, body, option
-        headers, body = _get_headers_and_body(
-            sock, method, host, port, path, scheme, top_level_url, payload, max_redirs
+    if method == "GET":
+        # Cookieを使うホストのレスポンスはディスクに残さない
+        use_disk = host not in COOKIE_JAR
+        cached = HTTP_CACHE.get_fresh(cache_key(scheme, host, port, path), use_disk)
+        if cached is not None:
+            chunks = cached.chunks()
+            if log is not None:
+                entry = log.start(method, scheme + ":" + url)
+                entry.cache = "hit"
+                entry.status, entry.status_text = 200, "OK"
+                entry.response_headers = dict(cached.headers)
+                chunks = _finish_after(entry, _count_body(entry, chunks))
+            return dict(cached.headers), chunks, option
+
+    headers, chunks = _get_headers_and_stream(
+        method, host, port, path, scheme, top_level_url, payload, max_redirs, log
+    )
+    return headers, iter(chunks), option
+
+
+def _read_file(f: TextIO) -> Iterator[str]:
+    with f:
+        while True:
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def cache_key(scheme: str, host: str, port: int, path: str) -> str:
+    return "{}://{}:{}{}".format(scheme, host, port, path)
+
+
+def _get_headers_and_stream(
+    method: str,
+    host: str,
+    port: int,
+    path: str,
+    scheme: str,
+    top_level_url: Union[str, None],
+    payload: Union[str, None],
+    max_redirs: int,
+    log: Union[NetworkLog, None] = None,
+) -> Tuple[Dict[str, str], Iterator[str]]:
+    url = cache_key(scheme, host, port, path)
+    entry: Union[RequestTiming, None] = None
+    if log is not None:
+        default_port = 80 if scheme == "http" else 443
+        entry = log.start(
+            method,
+            "{}://{}{}{}".format(
+                scheme, host, "" if port == default_port else ":" + str(port), path
+            ),
         )
-        return headers, body, option
+    try:
+        headers, chunks = _fetch(
+            method,
+            host,
+            port,
+            path,
+            scheme,
+            top_level_url,
+            payload,
+            max_redirs,
+            url,
+            log,
+            entry,
+        )
+    except Exception as e:
+        if entry is not None:
+            entry.error = str(e)
+            entry.finish()
+        raise
+    if entry is not None:
+        chunks = _finish_after(entry, chunks)
+    return headers, chunks
 
 
-def _get_headers_and_body(
-    sock: socket.socket,
+def _fetch(
     method: str,
     host: str,
     port: int,
@@ -89,23 +846,305 @@ def _get_headers_and_body(
     top_level_url: Union[str, None],
     payload: Union[str, None],
     max_redirs: int,
-):
-    sock.connect((host, port))
+    url: str,
+    log: Union[NetworkLog, None],
+    entry: Union[RequestTiming, None],
+) -> Tuple[Dict[str, str], Iterator[str]]:
+    cached: Union[CacheEntry, None] = None
+    conditional: Dict[str, str] = {}
+    use_disk = host not in COOKIE_JAR
+    if method == "GET":
+        cached = HTTP_CACHE.lookup(url, use_disk)
+        if cached is not None:
+            conditional = cached.validators()
+            if conditional:
+                HTTP_CACHE.count_revalidation()
+    else:
+        HTTP_CACHE.invalidate(url)
+    data = _build_request(method, host, path, top_level_url, payload, conditional)
+
+    start = time.perf_counter()
+    conn, reused = CONNECTION_POOL.acquire(scheme, host, port)
+    acquired = time.perf_counter()
+    response, statusline = _send(conn, data, reused)
+    if not statusline and reused:
+        # アイドル中にサーバーが閉じた接続だったので新しい接続でやり直す
+        CONNECTION_POOL.discard(conn)
+        conn, reused = CONNECTION_POOL.acquire(scheme, host, port, fresh=True)
+        acquired = time.perf_counter()
+        response, statusline = _send(conn, data, False)
+    if entry is not None:
+        _record_connection(entry, conn, reused, start, acquired, data)
+
+    try:
+        version, status, explanation = statusline.split(" ", 2)
+        assert status in (
+            "200",
+            "301",
+            "302",
+            "304",
+        ), "Unsupported status: {}\n{}".format(status, explanation)
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = response.readline().decode("utf-8")
+            if line in ("\r\n", "\n", ""):
+                break
+            header, value = line.split(":", 1)
+            headers[header.lower()] = value.strip()
+
+        framed = _is_framed(status, headers)
+    except Exception:
+        CONNECTION_POOL.discard(conn)
+        raise
+    body: Iterator[bytes] = _iter_body(response, status, headers)
+    if entry is not None:
+        entry.status, entry.status_text = int(status), explanation.strip()
+        entry.http_version = version
+        entry.response_headers = headers
+        body = _time_body(entry, body)
+    raw = _release_after(conn, body, framed and _keep_alive(version, headers))
+
+    if status == "304":
+        assert cached is not None, "304 for a request without validators"
+        return _revalidate(url, cached, headers, raw, entry)
+
+    if "location" in headers:
+        return _follow_redirect(headers["location"], raw, max_redirs, log, entry)
+
+    if "set-cookie" in headers:
+        _store_cookie(host, headers["set-cookie"])
+
+    if "content-encoding" in headers:
+        assert headers["content-encoding"] == "gzip"
+        # gzip形式のデータをTransfer-Encodingのチャンクで受信する
+        print("gziped file!")
+        raw = _gunzip(raw, entry)
+
+    chunks = decode_utf8(raw)
+    if (
+        method == "GET"
+        and status == "200"
+        and "set-cookie" not in headers
+        and freshness_lifetime(headers) is not None
+    ):
+        chunks = _store_after(url, headers, chunks, use_disk and host not in COOKIE_JAR)
+    return headers, chunks
+
+
+def _revalidate(
+    url: str,
+    cached: CacheEntry,
+    headers: Dict[str, str],
+    raw: Iterator[bytes],
+    entry: Union[RequestTiming, None],
+) -> Tuple[Dict[str, str], Iterator[str]]:
+    """304を受け取ったのでキャッシュのボディを返す"""
+    for _ in raw:
+        pass
+    revalidated = HTTP_CACHE.revalidated(url, cached, headers)
+    chunks = revalidated.chunks()
+    if entry is not None:
+        entry.cache = "revalidated"
+        entry.body_size = 0
+        chunks = _count_body(entry, chunks)
+    return dict(revalidated.headers), chunks
+
+
+def _follow_redirect(
+    location: str,
+    raw: Iterator[bytes],
+    max_redirs: int,
+    log: Union[NetworkLog, None],
+    entry: Union[RequestTiming, None],
+) -> Tuple[Dict[str, str], Iterator[str]]:
+    # リダイレクトのボディは読み捨てて接続を返す
+    for _ in raw:
+        pass
+    if entry is not None:
+        entry.redirect_url = location
+        entry.finish()
+    headers, chunks, option = request_stream(
+        location,
+        location,
+        max_redirs=max_redirs - 1,
+        log=log,
+    )
+    return headers, chunks
+
+
+def _store_cookie(host: str, set_cookie: str) -> None:
+    params = {}
+    if ";" in set_cookie:
+        cookie, rest = set_cookie.split(";", 1)
+        for param_pair in rest.split(";"):
+            if "=" in param_pair:
+                name, value = param_pair.split("=", 1)
+                params[name.lower()] = value.lower()
+    else:
+        cookie = set_cookie
+    COOKIE_JAR[host] = (cookie, params)
+
+
+def _release_after(
+    conn: Connection, raw: Iterator[bytes], keep_alive: bool
+) -> Iterator[bytes]:
+    """ボディを最後まで読んだら接続をプールに返す。途中で止めた場合は閉じる"""
+    done = False
+    try:
+        yield from raw
+        done = True
+    finally:
+        if done and keep_alive:
+            CONNECTION_POOL.release(conn)
+        else:
+            CONNECTION_POOL.discard(conn)
+
+
+def _record_connection(
+    entry: RequestTiming,
+    conn: Connection,
+    reused: bool,
+    start: float,
+    acquired: float,
+    data: bytes,
+) -> None:
+    """接続の取得からステータス行を受け取るまでの内訳を記録する"""
+    received = time.perf_counter()
+    if reused:
+        entry.blocked = acquired - start
+    else:
+        entry.dns = conn.dns_time
+        entry.connect = conn.connect_time
+        entry.ssl = conn.tls_time
+        setup = conn.dns_time + conn.connect_time + (conn.tls_time or 0.0)
+        entry.blocked = max(acquired - start - setup, 0.0)
+    entry.send = conn.sent_at - acquired
+    entry.wait = received - conn.sent_at
+    head, _, body = data.partition(b"\r\n\r\n")
+    for line in head.decode("utf-8").split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        entry.request_headers[name] = value.strip()
+    entry.request_size = len(body)
+
+
+def _time_body(entry: RequestTiming, raw: Iterator[bytes]) -> Iterator[bytes]:
+    """ボディの受信を待っていた時間だけを数える(呼び出し側の処理時間は含めない)"""
+    while True:
+        start = time.perf_counter()
+        data = next(raw, None)
+        entry.receive += time.perf_counter() - start
+        if data is None:
+            return
+        entry.transfer_size += len(data)
+        yield data
+
+
+def _count_body(entry: RequestTiming, chunks: Iterator[str]) -> Iterator[str]:
+    # キャッシュから返すボディは展開後のバイト数だけ数える
+    entry.count_body(0)
+    for chunk in chunks:
+        entry.count_body(len(chunk.encode("utf-8")))
+        yield chunk
+
+
+def _finish_after(entry: RequestTiming, chunks: Iterator[str]) -> Iterator[str]:
+    try:
+        yield from chunks
+    finally:
+        entry.finish()
+
+
+def _store_after(
+    url: str, headers: Dict[str, str], chunks: Iterator[str], use_disk: bool
+) -> Iterator[str]:
+    """最後まで読めたボディをキャッシュに入れる"""
+    parts: List[str] = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    HTTP_CACHE.store(url, headers, "".join(parts), use_disk)
 
+
+def _gunzip(
+    raw: Iterator[bytes], entry: Union[RequestTiming, None] = None
+) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if entry is not None:
+        entry.body_size = 0
+    for data in raw:
+        while data:
+            start = time.perf_counter()
+            out = decompressor.decompress(data)
+            if entry is not None:
+                entry.decode += time.perf_counter() - start
+                entry.count_body(len(out))
+            if out:
+                yield out
+            if decompressor.eof:
+                # 複数のgzipメンバーが続いている
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = b""
+    tail = decompressor.flush()
+    if entry is not None:
+        entry.count_body(len(tail))
+    if tail:
+        yield tail
+
+
+def decode_utf8(raw: Iterable[Union[bytes, memoryview]]) -> Iterator[str]:
+    """チャンクの境界で分かれたUTF-8の文字も正しくデコードする"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for data in raw:
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _send(conn: Connection, data: bytes, reused: bool) -> Tuple[io.BufferedReader, str]:
+    """リクエストを送ってステータス行を読む。使い回した接続が切れていたら空文字を返す"""
+    try:
+        conn.send(data)
+        response = conn.reader()
+        statusline = response.readline().decode("utf-8")
+    except OSError:
+        if not reused:
+            CONNECTION_POOL.discard(conn)
+            raise
+        return conn.reader(), ""
+    if not statusline and not reused:
+        CONNECTION_POOL.discard(conn)
+        raise Exception("Connection closed without response")
+    return response, statusline
+
+
+def _build_request(
+    method: str,
+    host: str,
+    path: str,
+    top_level_url: Union[str, None],
+    payload: Union[str, None],
+    extra_headers: Union[Dict[str, str], None] = None,
+) -> bytes:
     headers: Dict[str, str] = {}
     headers["Host"] = host
-    headers[
-        "User-Agent"
-    ] = "Mozilla/5.0 (X11; Linux x86_64; rv:78.0) Gecko/20100101 Firefox/78.0"
-    headers["Connection"] = "close"
+    headers["User-Agent"] = (
+        "Mozilla/5.0 (X11; Linux x86_64; rv:78.0) Gecko/20100101 Firefox/78.0"
+    )
+    headers["Connection"] = "keep-alive"
     headers["Accept-Encoding"] = "gzip"
     if method == "POST":
         assert payload is not None
         headers["Content-Length"] = str(len(payload.encode("utf-8")))
+    if extra_headers:
+        headers.update(extra_headers)
 
-    version = "HTTP/1.1" if scheme == "https" else "HTTP/1.0"
-
-    body = "{} {} {}\r\n".format(method, path, version)
+    body = "{} {} HTTP/1.1\r\n".format(method, path)
     body += "\r\n".join("{}: {}".format(k, v) for k, v in headers.items()) + "\r\n"
     if host in COOKIE_JAR:
         cookie, params = COOKIE_JAR[host]
@@ -118,137 +1157,296 @@ def _get_headers_and_body(
         if allow_cookie:
             body += "Cookie: {}\r\n".format(cookie)
     body += "\r\n" + (payload or "")
+    return body.encode("utf-8")
 
-    sock.send(body.encode("utf-8"))
 
-    response = sock.makefile("rb", newline="\r\n")
-    statusline = response.readline().decode("utf-8")
-    version, status, explanation = statusline.split(" ", 2)
-    assert status in ("200", "301", "302"), "Unsupported status: {}\n{}".format(
-        status, explanation
-    )
-
-    headers = {}
-    while True:
-        line = response.readline().decode("utf-8")
-        if line == "\r\n":
-            break
-        header, value = line.split(":", 1)
-        headers[header.lower()] = value.strip()
+def _is_framed(status: str, headers: Dict[str, str]) -> bool:
+    """ボディの終わりが接続の切断に依存しないかどうか"""
+    if status in ("204", "304") or status.startswith("1"):
+        return True
+    return "transfer-encoding" in headers or "content-length" in headers
 
-    if "location" in headers:
-        headers, body, option = request(
-            headers["location"], headers["location"], max_redirs=max_redirs - 1
-        )
-        return headers, body
-
-    if "set-cookie" in headers:
-        params = {}
-        if ";" in headers["set-cookie"]:
-            cookie, rest = headers["set-cookie"].split(";", 1)
-            for param_pair in rest.split(";"):
-                if "=" in param_pair:
-                    name, value = param_pair.split("=", 1)
-                    params[name.lower()] = value.lower()
-        else:
-            cookie = headers["set-cookie"]
-        COOKIE_JAR[host] = (cookie, params)
 
+def _iter_body(
+    response: io.BufferedReader, status: str, headers: Dict[str, str]
+) -> Iterator[bytes]:
+    """レスポンスボディを届いた順に返す"""
+    if status in ("204", "304") or status.startswith("1"):
+        return
     if "transfer-encoding" in headers:
         if headers["transfer-encoding"] == "chunked":
             print("transfer-encoding: chunked!")
-            body_b = unchunked(response)
+            decoder = ChunkedDecoder(response)
+            # bytearrayはコピーせずにbytesとして使う
+            yield from decoder  # type: ignore[misc]
+            for name, value in decoder.trailers.items():
+                headers.setdefault(name, value)
+            return
         else:
             raise Exception(
                 "Unsupported transfer-encoding: {}".format(headers["transfer-encoding"])
             )
-    else:
-        body_b = response.read()
+    if "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining > 0:
+            data = response.read1(min(remaining, READ_SIZE))
+            if not data:
+                raise Exception("Connection closed before the end of the body")
+            remaining -= len(data)
+            yield data
+        return
+    while True:
+        data = response.read1(READ_SIZE)
+        if not data:
+            return
+        yield data
 
-    if "content-encoding" in headers:
-        assert headers["content-encoding"] == "gzip"
-        # gzip形式のデータをTransfer-Encodingのチャンクで受信する
-        print("gziped file!")
-        body_b = gzip.decompress(body_b)
 
-    body = body_b.decode("utf-8")
-    sock.close()
-    return headers, body
+def _keep_alive(version: str, headers: Dict[str, str]) -> bool:
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.1":
+        return connection != "close"
+    return connection == "keep-alive"
 
 
-def unchunked(response):
-    body = b""
+class ChunkedDecoder:
+    """Transfer-Encoding: chunkedのボディを読む
 
-    def get_chunk_size():
-        chunk_size = response.readline().rstrip()
-        return int(chunk_size, 16)
+    チャンクはreadintoで1つのbytearrayに直接読み込むので、チャンクの数が
+    増えてもコピー量はボディの大きさに比例する。bytes_copiedにコピーした
+    バイト数を数える。
+    """
 
-    while True:
-        chunk_size = get_chunk_size()
-        if chunk_size == 0:
-            break
+    def __init__(self, response: io.BufferedReader):
+        self.response = response
+        self.chunks = 0
+        self.bytes_copied = 0
+        self.extensions: Dict[str, str] = {}
+        self.trailers: Dict[str, str] = {}
+        self._remaining = 0  # 読みかけのチャンクの残り
+        self._done = False
+
+    def _next_chunk_size(self) -> int:
+        line = self.response.readline()
+        if not line:
+            raise Exception("Connection closed in the middle of a chunked body")
+        size, _, extensions = line.partition(b";")
+        # chunk-extの意味は解釈しないが、最後に見た値を残しておく
+        for extension in extensions.split(b";"):
+            name, _, value = extension.strip().partition(b"=")
+            if name:
+                self.extensions[name.decode("latin1").lower()] = value.strip(
+                    b'"'
+                ).decode("latin1")
+        return int(size.strip(), 16)
+
+    def _read_trailers(self) -> None:
+        # trailerの終わりの空行まで読んで次のレスポンスの先頭に合わせる
+        while True:
+            line = self.response.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin1").partition(":")
+            self.trailers[name.strip().lower()] = value.strip()
+
+    def _end_of_chunk(self) -> None:
+        # サイズの行と同じくLFだけの改行も受け付ける。次の行まで読まないようにreadlineで読む
+        if self.response.readline(3) not in (b"\r\n", b"\n"):
+            raise Exception("Malformed chunked body")
+
+    def _readinto(self, view: memoryview) -> None:
+        filled = 0
+        while filled < len(view):
+            n = self.response.readinto(view[filled:])
+            if not n:
+                raise Exception("Connection closed in the middle of a chunked body")
+            filled += n
+        self.bytes_copied += filled
+
+    def readinto(self, buf: Union[bytearray, memoryview]) -> int:
+        """チャンクを1つ読み終えるか、bufが一杯になるまで読み、読んだバイト数を返す
+
+        次のチャンクを待つと届いた分を渡すのが遅れるので、チャンクの終わりで返す。
+        """
+        filled = 0
+        with memoryview(buf) as view:
+            while filled < len(buf) and not self._done:
+                if self._remaining == 0:
+                    size = self._next_chunk_size()
+                    if size == 0:
+                        self._read_trailers()
+                        self._done = True
+                        break
+                    self.chunks += 1
+                    self._remaining = size
+                n = min(self._remaining, len(buf) - filled)
+                self._readinto(view[filled : filled + n])
+                filled += n
+                self._remaining -= n
+                if self._remaining == 0:
+                    self._end_of_chunk()
+                    break
+        return filled
+
+    def __iter__(self) -> Iterator[bytearray]:
+        """届いたチャンクをそのまま返す。大きいチャンクはREAD_SIZEずつに分ける"""
+        while True:
+            # 読み込んだバッファをコピーせずに渡すので、毎回新しく作る
+            buf = bytearray(READ_SIZE)
+            n = self.readinto(buf)
+            if n == 0:
+                return
+            del buf[n:]
+            yield buf
+
+    def read_all(self) -> bytearray:
+        buf = bytearray(READ_SIZE)
+        length = 0
+        while True:
+            if length == len(buf):
+                # 倍々に伸ばすのでコピー量は全体で線形に収まる
+                self.bytes_copied += length
+                buf.extend(bytes(len(buf)))
+            with memoryview(buf) as view:
+                n = self.readinto(view[length:])
+            if n == 0:
+                break
+            length += n
+        del buf[length:]
+        return buf
+
+
+def unchunked(response: io.BufferedReader) -> bytearray:
+    return ChunkedDecoder(response).read_all()
+
+
+class TextExtractor:
+    """HTMLの<body>の中のテキストだけを取り出してoutに書き出す
+
+    チャンクを受け取るたびに書き出し、次に持ち越すのはタグ名の先頭と
+    チャンクの境目で切れた文字参照だけなので、入力の大きさによらずメモリは一定。
+    """
+
+    # タグ名を調べるのに残しておくタグの先頭の長さ
+    MAX_TAG_HEAD = 64
+    # チャンクの境目で持ち越す文字参照の最大の長さ
+    MAX_ENTITY = 40
+
+    def __init__(self, out: TextIO):
+        self.out = out
+        self.in_body = False
+        self._in_tag = False
+        self._tag_head = ""
+        self._text: List[str] = []
+
+    def feed(self, data: str) -> None:
+        out: List[str] = []
+        start = 0
+        for m in _TAG_DELIMITER.finditer(data):
+            piece = data[start : m.start()]
+            start = m.end()
+            if self._in_tag:
+                if m.group() == ">":
+                    self._add_tag_head(piece)
+                    self._end_tag()
+                else:
+                    self._add_tag_head(piece + "<")
+            elif m.group() == "<":
+                self._text.append(piece)
+                self._flush(out, final=True)
+                self._in_tag = True
+            else:
+                # タグの外の">"はただの文字
+                self._text.append(piece + ">")
+        if self._in_tag:
+            self._add_tag_head(data[start:])
         else:
-            body += response.read(chunk_size)
-            response.read(2)
-    return body
+            self._text.append(data[start:])
+            self._flush(out, final=False)
+        if out:
+            self.out.write("".join(out))
+
+    def close(self) -> None:
+        out: List[str] = []
+        if not self._in_tag:
+            self._flush(out, final=True)
+        self._text.clear()
+        self._in_tag = False
+        self._tag_head = ""
+        if out:
+            self.out.write("".join(out))
+
+    def _add_tag_head(self, piece: str) -> None:
+        if len(self._tag_head) < self.MAX_TAG_HEAD:
+            self._tag_head += piece[: self.MAX_TAG_HEAD]
+
+    def _end_tag(self) -> None:
+        parts = self._tag_head.split(None, 1)
+        if parts and parts[0].lower() == "body":
+            self.in_body = True
+        elif parts and parts[0].lower() == "/body":
+            self.in_body = False
+        self._in_tag = False
+        self._tag_head = ""
 
+    def _flush(self, out: List[str], final: bool) -> None:
+        text = "".join(self._text)
+        self._text.clear()
+        if not self.in_body:
+            return
+        if not final:
+            # 文字参照の途中で切れているかもしれない部分は次のチャンクと合わせる
+            amp = text.rfind("&")
+            if (
+                amp != -1
+                and len(text) - amp <= self.MAX_ENTITY
+                and _PARTIAL_ENTITY.fullmatch(text, amp)
+            ):
+                self._text.append(text[amp:])
+                text = text[:amp]
+        if text:
+            out.append(decode_entities(text))
 
-def show(body: str, option: List[str]) -> None:
+
+_TAG_DELIMITER = re.compile("[<>]")
+_PARTIAL_ENTITY = re.compile(r"&#?[0-9A-Za-z]*")
+
+
+def extract_text(chunks: Iterable[str], out: TextIO) -> None:
+    extractor = TextExtractor(out)
+    for chunk in chunks:
+        extractor.feed(chunk)
+    extractor.close()
+
+
+def show(
+    body: Union[str, Iterable[str]],
+    option: List[str],
+    out: Union[TextIO, None] = None,
+) -> None:
+    """ボディ(文字列かチャンクのイテレータ)を表示する"""
+    if out is None:
+        out = sys.stdout
+    if isinstance(body, str):
+        body = [body]
     if "view-source" in option:
-        print(body)
+        for chunk in body:
+            out.write(chunk)
     else:
-        print(lex(body))
+        extract_text(body, out)
+    out.write("\n")
 
 
 def lex(body: str) -> str:
-    in_angle = False
-    out_angle = False
-    in_entity = False
-    entity = ""
-    out = ""
-    tags = []
-
-    ENTRY_DICT = {
-        "lt": "<",
-        "gt": ">",
-    }
-
-    for c in body:
-        if c == "<":
-            in_angle = True
-            tags.append("")
-        elif c == ">":
-            if not out_angle:
-                # TODO: classやidも保存する
-                tags[len(tags) - 1] = tags[len(tags) - 1].split()[0]
-            in_angle = False
-            out_angle = False
-        elif in_angle and c == "/":
-            out_angle = True
-            tags.pop()
-        elif in_angle and (not out_angle):
-            tags[len(tags) - 1] += c
-        elif c == "&":
-            in_entity = True
-            entity = ""
-        elif in_entity:
-            if c == ";":
-                if "body" in tags:
-                    out += ENTRY_DICT[entity]
-                in_entity = False
-            else:
-                entity += c
-        elif not in_angle and "body" in tags:
-            out += c
-    return out
+    out = io.StringIO()
+    extract_text([body], out)
+    return out.getvalue()
 
 
 def load(url: str) -> None:
-    headers, body, option = request(url, url)
-    show(body, option)
+    headers, chunks, option = request_stream(url, url)
+    show(chunks, option)
 
 
 if __name__ == "__main__":
-    import sys
-
     load(sys.argv[1])
@@ -0,0 +1,72 @@
+import re
+from typing import Callable, Dict, Set, Union
+
+from src.util.url import resolve_url
+
+# タグ名の終わり("<"と">"は取り除いてある)
+TAG_NAME_END = re.compile(r"[\s/]")
+ATTRIBUTE = re.compile(r"""([^\s=]+)(?:=("[^"]*"|'[^']*'|\S*))?""")
+
+
+class PreloadScanner:
+    """HTMLをパースする前に生のテキストからサブリソースのURLを拾う
+
+    チャンクを渡していくと、見つけた<link rel=stylesheet>と<script src>の
+    URLをon_urlに渡す。タグの途中で切れたチャンクは次のチャンクとつなげて読む。
+    """
+
+    def __init__(self, base_url: str, on_url: Callable[[str, str], None]):
+        self.base_url = base_url
+        self.on_url = on_url
+        self._pending = ""
+        self._seen: Set[str] = set()
+
+    def feed(self, chunk: str) -> None:
+        data = self._pending + chunk if self._pending else chunk
+        pos = 0
+        while True:
+            lt = data.find("<", pos)
+            if lt == -1:
+                self._pending = ""
+                return
+            gt = data.find(">", lt)
+            if gt == -1:
+                self._pending = data[lt:]
+                return
+            self._tag(data[lt + 1 : gt])
+            pos = gt + 1
+
+    def close(self) -> None:
+        self._pending = ""
+
+    def _tag(self, text: str) -> None:
+        tag = TAG_NAME_END.split(text, 1)[0].lower()
+        if tag not in ("link", "script"):
+            return
+        attributes = parse_attributes(text)
+        if tag == "link" and attributes.get("rel") == "stylesheet":
+            self._found("stylesheet", attributes.get("href"))
+        elif tag == "script":
+            self._found("script", attributes.get("src"))
+
+    def _found(self, kind: str, href: Union[str, None]) -> None:
+        if not href:
+            return
+        url = resolve_url(href, self.base_url)
+        if url in self._seen:
+            return
+        self._seen.add(url)
+        self.on_url(kind, url)
+
+
+def parse_attributes(text: str) -> Dict[str, str]:
+    """HTMLParser.get_attributesと同じ規則で属性を読む"""
+    attributes: Dict[str, str] = {}
+    matches = ATTRIBUTE.findall(text)
+    if not matches:
+        return attributes
+    for key, value in matches[1:]:
+        if len(value) > 2 and value[0] in ["'", '"']:
+            value = value[1:-1]
+        attributes[key.lower()] = value
+    return attributes
@@ -10,6 +10,10 @@ class Selector(ABC):
     def matches(self, node: HTMLNode) -> bool:
         raise NotImplementedError
 
+    def ancestor_selectors(self) -> List["Selector"]:
+        """判定に使う、祖先に当てるセレクタ(子孫セレクタの左側)"""
+        return []
+
 
 Declaration = Dict[str, str]
 CSSRule = Tuple[Selector, Declaration]
@@ -35,7 +39,7 @@ class ClassSelector(Selector):
     def matches(self, node: HTMLNode) -> bool:
         return (
             isinstance(node, Element)
-            and self.class_name in node.attributes.get("class", "").split()
+            and self.class_name in (node.get_attribute("class") or "").split()
         )
 
     def __repr__(self) -> str:
@@ -50,7 +54,7 @@ class IdSelector(Selector):
     def matches(self, node: HTMLNode) -> bool:
         return (
             isinstance(node, Element)
-            and self.id_name in node.attributes.get("id", "").split()
+            and self.id_name in (node.get_attribute("id") or "").split()
         )
 
     def __repr__(self) -> str:
@@ -66,6 +70,9 @@ class SequenceSelector(Selector):
     def matches(self, node: HTMLNode) -> bool:
         return self.tag.matches(node) and self.annotation.matches(node)
 
+    def ancestor_selectors(self) -> List[Selector]:
+        return self.tag.ancestor_selectors() + self.annotation.ancestor_selectors()
+
     def __repr__(self) -> str:
         return f"SequenceSelector(tag={self.tag}, annotation={self.annotation}, priority={self.priority})"
 
@@ -85,6 +92,9 @@ class DesendantSelector(Selector):
             node = node.parent
         return False
 
+    def ancestor_selectors(self) -> List[Selector]:
+        return [self.ancestor] + self.descendant.ancestor_selectors()
+
     def __repr__(self) -> str:
         return f"DesendantSelector(ancestor={self.ancestor}, descendant={self.descendant}, priority={self.priority})"
 
@@ -100,6 +110,11 @@ class GroupSelector(Selector):
                 return True
         return False
 
+    def ancestor_selectors(self) -> List[Selector]:
+        return [
+            selector for elem in self.groups for selector in elem.ancestor_selectors()
+        ]
+
     def __repr__(self) -> str:
         return f"GrouptSelector(groups={self.groups}, priority={self.priority})"
 
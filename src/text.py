@@ -1,9 +1,13 @@
 from __future__ import annotations
+import re
+import sys
 from abc import ABC
 from enum import Enum, auto
-from typing import Dict, Tuple, Union, List
+from types import MappingProxyType
+from typing import Dict, Mapping, Sequence, Tuple, Union, List
 
-from src.entities import ENTITIES_DICT
+from src.entities import decode_entities
+from src.util.node import walk_with_depth
 
 
 class LAYOUT_MODE(Enum):
@@ -11,52 +15,85 @@ class LAYOUT_MODE(Enum):
     BLOCK = auto()
 
 
-BLOCK_ELEMENTS = [
-    "html",
-    "body",
-    "article",
-    "section",
-    "nav",
-    "aside",
-    "h1",
-    "h2",
-    "h3",
-    "h4",
-    "h5",
-    "h6",
-    "hgroup",
-    "header",
-    "footer",
-    "address",
-    "p",
-    "hr",
-    "pre",
-    "blockquote",
-    "ol",
-    "ul",
-    "menu",
-    "li",
-    "dl",
-    "dt",
-    "dd",
-    "figure",
-    "figcaption",
-    "main",
-    "div",
-    "table",
-    "form",
-    "fieldset",
-    "legend",
-    "details",
-    "summary",
-]
+class INSERTION_MODE(Enum):
+    """暗黙のhtml/head/bodyを補うために見る、開いている要素の状態"""
+
+    INITIAL = auto()  # 何も開いていない
+    IN_HTML = auto()  # htmlだけが開いている
+    IN_HEAD = auto()  # htmlとheadが開いている
+    IN_BODY = auto()  # それ以外(bodyの中など)。何も補わない
+
+
+BLOCK_ELEMENTS = frozenset(
+    [
+        "html",
+        "body",
+        "article",
+        "section",
+        "nav",
+        "aside",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "hgroup",
+        "header",
+        "footer",
+        "address",
+        "p",
+        "hr",
+        "pre",
+        "blockquote",
+        "ol",
+        "ul",
+        "menu",
+        "li",
+        "dl",
+        "dt",
+        "dd",
+        "figure",
+        "figcaption",
+        "main",
+        "div",
+        "table",
+        "form",
+        "fieldset",
+        "legend",
+        "details",
+        "summary",
+    ]
+)
+
+
+# 子を持たないノードが共有する空の子リストとスタイル
+NO_CHILDREN: Tuple[()] = ()
+EMPTY_STYLE: Mapping[str, str] = MappingProxyType({})
+
+
+# Element.displayを計算し直した回数と、子が変わってキャッシュを捨てた回数
+DISPLAY_STATS: Dict[str, int] = {"recomputed": 0, "invalidated": 0}
+
+# スタイルを計算し直す必要があることを表すHTMLNode._dirtyのビット
+STYLE_DIRTY_SELF = 1  # 要素自身
+STYLE_DIRTY_SUBTREE = 2  # 要素と子孫すべて
+STYLE_DIRTY_DESCENDANT = 4  # 子孫のどこかにSELFかSUBTREEの要素がある
 
 
 class HTMLNode(ABC):
+    # 大きなページでは数十万個作られるので__dict__を持たせない
+    __slots__ = ("parent", "style", "_dirty")
+
+    # テキストと空の要素は共有の空のタプルを持つ
+    children: Sequence["HTMLNode"]
+
     def __init__(self, parent: Union["HTMLNode", None]):
         self.parent: Union[HTMLNode, None] = parent
-        self.children: List[HTMLNode] = []
-        self.style: Dict[str, str] = {}
+        # styleを計算するまでは空のスタイルを共有する
+        self.style: Mapping[str, str] = EMPTY_STYLE
+        # テキストには印をつけず、親が計算し直すときに一緒に計算する
+        self._dirty = 0
 
     @property
     def display(self) -> LAYOUT_MODE:
@@ -64,11 +101,12 @@ class HTMLNode(ABC):
 
 
 class Text(HTMLNode):
+    __slots__ = ("text", "children")
+
     def __init__(self, text: str, parent: Union[HTMLNode, None]):
         super().__init__(parent)
-        for c in ENTITIES_DICT:
-            text = text.replace(c, ENTITIES_DICT[c])
-        self.text = text
+        self.children = NO_CHILDREN
+        self.text = decode_entities(text)
 
     @property
     def display(self) -> LAYOUT_MODE:
@@ -79,20 +117,92 @@ class Text(HTMLNode):
 
 
 class Element(HTMLNode):
+    __slots__ = ("tag", "_attributes", "_children", "_display")
+
     def __init__(
         self, tag: str, attributes: Dict[str, str], parent: Union[HTMLNode, None]
     ):
         super().__init__(parent)
-        self.tag = tag
-        self.attributes = attributes
+        self.tag = sys.intern(tag)
+        # 空の要素は子を持てないので空のタプルを共有する
+        self._children: List[HTMLNode] = (
+            NO_CHILDREN if tag in SELF_CLOSING_TAGS else []  # type: ignore
+        )
+        self._display: Union[LAYOUT_MODE, None] = None
+        # 属性のない要素は辞書を作らない
+        self._attributes: Union[Dict[str, str], None] = attributes or None
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        if self._attributes is None:
+            # 書き込まれるかもしれないので、参照された時点で辞書を作る
+            self._attributes = {}
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, attributes: Dict[str, str]) -> None:
+        self._attributes = attributes
+        self.mark_style_dirty(subtree=True)
+
+    def get_attribute(
+        self, name: str, default: Union[str, None] = None
+    ) -> Union[str, None]:
+        """属性の辞書を作らずに値を読む"""
+        if self._attributes is None:
+            return default
+        return self._attributes.get(name, default)
+
+    def set_attribute(self, name: str, value: str) -> None:
+        """属性を書き換える。attributes[name]への代入と違いスタイルの再計算を予約する"""
+        if self.get_attribute(name) == value:
+            return
+        self.attributes[name] = value
+        # classとidは子孫セレクタを通して子孫のスタイルも変える
+        self.mark_style_dirty(subtree=name in ("class", "id"))
+
+    def mark_style_dirty(self, subtree: bool = False) -> None:
+        """次のrestyleでスタイルを計算し直すようにする"""
+        self._dirty |= STYLE_DIRTY_SUBTREE if subtree else STYLE_DIRTY_SELF
+        # restyleがたどれるように祖先に印をつける。印のある祖先から上は付いている
+        node = self.parent
+        while isinstance(node, Element) and not node._dirty & STYLE_DIRTY_DESCENDANT:
+            node._dirty |= STYLE_DIRTY_DESCENDANT
+            node = node.parent
+
+    @property
+    def children(self) -> List[HTMLNode]:
+        return self._children
+
+    @children.setter
+    def children(self, children: Sequence[HTMLNode]) -> None:
+        self._children = list(children)
+        self._invalidate_display()
+        self.mark_style_dirty(subtree=True)
+
+    def append_child(self, node: HTMLNode) -> None:
+        """子を追加する。children.appendと違いdisplayのキャッシュを捨て、スタイルの再計算を予約する"""
+        self._children.append(node)
+        self._invalidate_display()
+        if not self._dirty & STYLE_DIRTY_SUBTREE:
+            self.mark_style_dirty(subtree=True)
+
+    def _invalidate_display(self) -> None:
+        if self._display is not None:
+            self._display = None
+            DISPLAY_STATS["invalidated"] += 1
 
     @property
     def display(self) -> LAYOUT_MODE:
-        if self.children:
-            for child in self.children:
-                if isinstance(child, Text):
-                    continue
-                elif isinstance(child, Element) and child.tag in BLOCK_ELEMENTS:
+        # 子のタグだけで決まるので、子が変わるまで使い回す
+        if self._display is None:
+            self._display = self._compute_display()
+            DISPLAY_STATS["recomputed"] += 1
+        return self._display
+
+    def _compute_display(self) -> LAYOUT_MODE:
+        if self._children:
+            for child in self._children:
+                if isinstance(child, Element) and child.tag in BLOCK_ELEMENTS:
                     return LAYOUT_MODE.BLOCK
             return LAYOUT_MODE.INLINE
         elif self.tag == "input":
@@ -104,53 +214,97 @@ class Element(HTMLNode):
         return "<" + self.tag + ">"
 
 
-SELF_CLOSING_TAGS = [
-    "area",
-    "base",
-    "br",
-    "col",
-    "embed",
-    "hr",
-    "img",
-    "input",
-    "link",
-    "meta",
-    "param",
-    "source",
-    "track",
-    "wbr",
-]
-
-
-class HTMLParser:
-    HEAD_TAGS = [
+SELF_CLOSING_TAGS = frozenset(
+    [
+        "area",
         "base",
-        "basefont",
-        "bgsound",
-        "noscript",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
         "link",
         "meta",
-        "title",
-        "style",
-        "script",
+        "param",
+        "source",
+        "track",
+        "wbr",
     ]
+)
+
+
+# タグの始まりと終わり。この2文字の間をまとめてテキストかタグとして扱う
+TAG_DELIMITER = re.compile("[<>]")
 
-    def __init__(self, body: str):
+
+class HTMLParser:
+    HEAD_TAGS = frozenset(
+        [
+            "base",
+            "basefont",
+            "bgsound",
+            "noscript",
+            "link",
+            "meta",
+            "title",
+            "style",
+            "script",
+        ]
+    )
+
+    def __init__(self, body: str = ""):
         self.body = body
         self.unfinished: List[Element] = []
+        # feedで受け取った、まだ区切り文字が来ていないテキストかタグ
+        self._pending: List[str] = []
+        self._in_tag = False
+        self._root: Union[Element, None] = None
+        self.mode = INSERTION_MODE.INITIAL
+
+    def _push(self, node: Element) -> None:
+        self.unfinished.append(node)
+        self._update_mode()
+
+    def _pop(self) -> Element:
+        node = self.unfinished.pop()
+        self._update_mode()
+        return node
+
+    def _update_mode(self) -> None:
+        # 見るのは根元の2つだけなので、深さによらず定数時間で済む
+        depth = len(self.unfinished)
+        if depth == 0:
+            self.mode = INSERTION_MODE.INITIAL
+        elif self.unfinished[0].tag != "html" or depth > 2:
+            self.mode = INSERTION_MODE.IN_BODY
+        elif depth == 1:
+            self.mode = INSERTION_MODE.IN_HTML
+        elif self.unfinished[1].tag == "head":
+            self.mode = INSERTION_MODE.IN_HEAD
+        else:
+            self.mode = INSERTION_MODE.IN_BODY
 
     def implicit_tags(self, tag: Union[str, None]) -> None:
         while True:
-            open_tags = [node.tag for node in self.unfinished]
-            if open_tags == [] and tag != "html":
+            mode = self.mode
+            if mode == INSERTION_MODE.IN_BODY:
+                break
+            elif mode == INSERTION_MODE.INITIAL and tag != "html":
                 self.add_tag("html")
-            elif open_tags == ["html"] and tag not in ["head", "body", "/html"]:
+            elif mode == INSERTION_MODE.IN_HTML and tag not in (
+                "head",
+                "body",
+                "/html",
+            ):
                 if tag in self.HEAD_TAGS:
                     self.add_tag("head")
                 else:
                     self.add_tag("body")
             elif (
-                open_tags == ["html", "head"] and tag not in ["/head"] + self.HEAD_TAGS
+                mode == INSERTION_MODE.IN_HEAD
+                and tag != "/head"
+                and tag not in self.HEAD_TAGS
             ):
                 self.add_tag("/head")
             else:
@@ -161,8 +315,8 @@ class HTMLParser:
             return
         self.implicit_tags(None)
         parent = self.unfinished[-1]
-        node = Text(text, parent)
-        parent.children.append(node)
+        node = self.create_text(text, parent)
+        parent.append_child(node)
 
     def add_tag(self, tag: str) -> None:
         tag, attributes = self.get_attributes(tag)
@@ -170,74 +324,100 @@ class HTMLParser:
             return  # doctype
         self.implicit_tags(tag)
         parent: Union[Element, None]
+        # 開いた時点で親につなぐので、途中の木もrootからたどれる
         if tag.startswith("/"):
             if len(self.unfinished) == 1:
                 return
-            node = self.unfinished.pop()
-            parent = self.unfinished[-1]
-            parent.children.append(node)
+            self._pop()
         elif tag in SELF_CLOSING_TAGS:
             parent = self.unfinished[-1]
-            node = Element(tag, attributes, parent)
-            parent.children.append(node)
+            node = self.create_element(tag, attributes, parent)
+            parent.append_child(node)
         else:
             parent = self.unfinished[-1] if self.unfinished else None
-            node = Element(tag, attributes, parent)
-            self.unfinished.append(node)
+            node = self.create_element(tag, attributes, parent)
+            if parent is None:
+                self._root = node
+            else:
+                parent.append_child(node)
+            self._push(node)
+
+    # サブクラスで別の表現のノードを作れるようにする
+    def create_element(
+        self, tag: str, attributes: Dict[str, str], parent: Union[Element, None]
+    ) -> Element:
+        return Element(tag, attributes, parent)
+
+    def create_text(self, text: str, parent: Element) -> Text:
+        return Text(text, parent)
+
+    @property
+    def root(self) -> Union[Element, None]:
+        """ここまでに作った木。feedの途中でも読める"""
+        return self._root
 
     def finish(self) -> HTMLNode:
         if len(self.unfinished) == 0:
             self.add_tag("html")
-        while len(self.unfinished) > 1:
-            node = self.unfinished.pop()
-            parent = self.unfinished[-1]
-            parent.children.append(node)
-        return self.unfinished.pop()
-
-    def parse(self) -> HTMLNode:
-        text = ""
-        in_tag = False
-        for c in self.body:
-            if c == "<":
-                in_tag = True
+        root = self.unfinished[0]
+        self.unfinished.clear()
+        self._update_mode()
+        return root
+
+    def feed(self, data: str) -> None:
+        """届いた分だけ解析する。区切り文字で終わっていない部分は次に持ち越す"""
+        start = 0
+        for m in TAG_DELIMITER.finditer(data):
+            text = data[start : m.start()]
+            start = m.end()
+            if self._pending:
+                self._pending.append(text)
+                text = "".join(self._pending)
+                self._pending.clear()
+            if m.group() == "<":
+                self._in_tag = True
                 if text:
                     self.add_text(text)
-                text = ""
-            elif c == ">":
-                in_tag = False
-                self.add_tag(text)
-                text = ""
             else:
-                text += c
-        if not in_tag and text:
+                self._in_tag = False
+                self.add_tag(text)
+        if start < len(data):
+            self._pending.append(data[start:])
+
+    def close(self) -> HTMLNode:
+        text = "".join(self._pending)
+        self._pending.clear()
+        if not self._in_tag and text:
             self.add_text(text)
         return self.finish()
 
+    def parse(self) -> HTMLNode:
+        self.feed(self.body)
+        return self.close()
+
     def get_attributes(self, text: str) -> Tuple[str, dict]:
         parts = text.split()
-        tag = parts[0].lower()
+        # タグ名と属性名はページ中で何度も出てくるので同じ文字列を使い回す
+        tag = sys.intern(parts[0].lower())
         attributes = {}
         for attrpair in parts[1:]:
             if "=" in attrpair:
                 key, value = attrpair.split("=", 1)
                 if len(value) > 2 and value[0] in ["'", '"']:
                     value = value[1:-1]
-                attributes[key.lower()] = value
+                attributes[sys.intern(key.lower())] = value
             else:
-                attributes[attrpair.lower()] = ""
+                attributes[sys.intern(attrpair.lower())] = ""
         return tag, attributes
 
 
 def print_tree(node, indent: int = 0):
-    print(" " * indent, node)
-    if hasattr(node, "children"):
-        for child in node.children:
-            print_tree(child, indent + 2)
+    for descendant, depth in walk_with_depth(node):
+        print(" " * (indent + depth * 2), descendant)
 
 
 if __name__ == "__main__":
     from src.network import request
-    import sys
 
     headers, body, _ = request(sys.argv[1], sys.argv[1])
     print(body)
@@ -1,7 +1,16 @@
+from typing import Dict
+
 import skia
 
+# スタイルの文字列を解析した回数。描画のたびに解析していないかを確かめる
+PARSE_STATS: Dict[str, int] = {"length": 0, "number": 0, "color": 0, "blend_mode": 0}
+
 
 def parse_color(color):
+    if isinstance(color, int):
+        # 解析済みの色
+        return color
+    PARSE_STATS["color"] += 1
     if color == "white":
         return skia.ColorWHITE
     elif color == "black":
@@ -37,6 +46,7 @@ def parse_color(color):
 
 
 def parse_blend_mode(blend_mode_str: str):
+    PARSE_STATS["blend_mode"] += 1
     if blend_mode_str == "multiply":
         return skia.BlendMode.kMultiply
     elif blend_mode_str == "difference":
@@ -1,8 +1,88 @@
-from typing import List
+from typing import Callable, Iterator, List, Tuple, Type, TypeVar, Union
+
+# childrenを持つ木のノード(HTMLNode、LayoutObject、Drawなど)
+N = TypeVar("N")
+T = TypeVar("T")
+
+
+def walk(tree: N, prune: Union[Callable[[N], bool], None] = None) -> Iterator[N]:
+    """前順(親が先)に木をたどる。再帰しないので深い木でもよい
+
+    pruneがTrueを返したノードは返すが、その子孫には入らない
+    """
+    yield tree
+    if prune is not None and prune(tree):
+        return
+    stack = [iter(tree.children)]  # type: ignore
+    while stack:
+        for node in stack[-1]:
+            yield node
+            children = getattr(node, "children", None)
+            if children and (prune is None or not prune(node)):
+                stack.append(iter(children))
+                break
+        else:
+            stack.pop()
+
+
+def walk_with_depth(tree: N) -> Iterator[Tuple[N, int]]:
+    """walkと同じ順で、treeからの深さと一緒に返す"""
+    yield tree, 0
+    stack = [iter(getattr(tree, "children", ()))]
+    while stack:
+        for node in stack[-1]:
+            yield node, len(stack)
+            children = getattr(node, "children", None)
+            if children:
+                stack.append(iter(children))
+                break
+        else:
+            stack.pop()
+
+
+def walk_post(tree: N) -> Iterator[N]:
+    """後順(子が先)に木をたどる"""
+    stack = [(tree, iter(tree.children))]  # type: ignore
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            grandchildren = getattr(child, "children", None)
+            if grandchildren:
+                stack.append((child, iter(grandchildren)))
+                break
+            yield child
+        else:
+            stack.pop()
+            yield node
+
+
+def find(tree: N, predicate: Callable[[N], bool]) -> Union[N, None]:
+    """前順で最初にpredicateを満たすノード。見つかった時点でたどるのをやめる"""
+    for node in walk(tree):
+        if predicate(node):
+            return node
+    return None
+
+
+def find_instance(
+    tree: object, cls: Type[T], predicate: Callable[[T], bool]
+) -> Union[T, None]:
+    """findと同じだが、clsのインスタンスだけを調べてその型で返す"""
+    for node in walk(tree):
+        if isinstance(node, cls) and predicate(node):
+            return node
+    return None
+
+
+def find_last(tree: N, predicate: Callable[[N], bool]) -> Union[N, None]:
+    """前順で最後にpredicateを満たすノード。リストを作らずに探す"""
+    found = None
+    for node in walk(tree):
+        if predicate(node):
+            found = node
+    return found
 
 
 def tree_to_list(tree, list: List) -> List:
-    list.append(tree)
-    for child in tree.children:
-        tree_to_list(child, list)
+    list.extend(walk(tree))
     return list
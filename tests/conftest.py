@@ -15,3 +15,24 @@ def sorted_default_rules():
     with open("src/browser.css") as f:
         default_style_sheet = CSSParser(f.read()).parse()
     return default_style_sheet
+
+
+@pytest.fixture
+def pool(mocker):
+    """テストごとに新しいCONNECTION_POOLを使い、終わったら接続を閉じる"""
+    from src.network import ConnectionPool
+
+    pool = ConnectionPool()
+    mocker.patch("src.network.CONNECTION_POOL", pool)
+    yield pool
+    pool.clear()
+
+
+@pytest.fixture
+def http_cache(mocker, pool):
+    """前のテストのレスポンスが残っていない空のHTTP_CACHE"""
+    from src.network import HTTPCache
+
+    cache = HTTPCache()
+    mocker.patch("src.network.HTTP_CACHE", cache)
+    return cache
@@ -0,0 +1,111 @@
+from tests.test_html_parser import shape
+
+HTML = (
+    "<!doctype html><head><title>t</title><style>p { color: red; }</style></head>"
+    + "<body><div class=a id=x>hello &amp; <b>bold</b></div>"
+    + "<p>1 < 2</p><ul><li>one<li>two</ul><input name=q>tail</body>"
+)
+
+
+def test_same_tree_as_object_dom():
+    from src.columnar import ColumnarParser
+    from src.text import HTMLParser
+
+    assert shape(ColumnarParser(HTML).parse()) == shape(HTMLParser(HTML).parse())
+
+
+def test_arrays():
+    from src.columnar import NONE, TEXT, ColumnarParser, ElementView, TextView
+
+    parser = ColumnarParser("<div><p>a</p>b</div>")
+    root = parser.parse()
+    doc = parser.document
+    assert isinstance(root, ElementView) and root.index == 0
+    # html, body, div, p, "a", "b"
+    assert len(doc) == 6
+    assert [doc.tag_names[t] if t != TEXT else None for t in doc.tag] == [
+        "html",
+        "body",
+        "div",
+        "p",
+        None,
+        None,
+    ]
+    assert list(doc.parent) == [NONE, 0, 1, 2, 3, 2]
+    assert doc.first_child[2] == 3 and doc.next_sibling[3] == 5
+    assert doc.text(4) == "a" and doc.text(5) == "b"
+
+    div = root.children[0].children[0]
+    p, b = div.children
+    assert isinstance(b, TextView) and b.text == "b"
+    assert p.parent == div and hash(p.parent) == hash(div)
+    assert b.children == ()
+
+
+def test_views_behave_like_nodes():
+    from src.columnar import ColumnarParser
+    from src.cssparser import CSSParser, style
+    from src.selector import cascade_priority
+    from src.text import Element, Text, LAYOUT_MODE
+    from src.util.node import tree_to_list
+
+    root = ColumnarParser(HTML).parse()
+    rules = CSSParser("div.a p { color: blue } #x { font-size: 200% }").parse()
+    style(root, sorted(rules, key=cascade_priority))
+    body = root.children[1]
+    div = body.children[0]
+    assert isinstance(div, Element) and isinstance(div.children[0], Text)
+    assert div.style["font-size"] == "32.0px"
+    assert div.children[1].style["font-size"] == "32.0px"
+    assert div.display == LAYOUT_MODE.INLINE
+    assert body.display == LAYOUT_MODE.BLOCK
+    assert div.get_attribute("class") == "a"
+    field = [n for n in tree_to_list(root, []) if getattr(n, "tag", "") == "input"][0]
+    field.attributes["value"] = "typed"
+    assert field.parent.children[-2].attributes["value"] == "typed"
+
+
+def test_tab_with_columnar_dom(mocker):
+    from src.columnar import ColumnarParser, ElementView
+    from src.graphics.tab import Tab
+    from src.layout import DocumentLayout
+
+    mocker.patch("src.network._get_headers_and_stream", return_value=({}, [HTML]))
+    tab = Tab(800, 600)
+    tab.parser_class = ColumnarParser
+    tab.load("http://test.test/")
+    assert isinstance(tab.nodes, ElementView)
+    assert isinstance(tab.document, DocumentLayout)
+    assert len(tab.display_list) > 0
+
+
+def test_replace_children():
+    from src.columnar import ColumnarParser
+    from src.text import HTMLParser
+
+    root = ColumnarParser("<div><p>a</p>b</div><span>c</span>").parse()
+    div = root.children[0].children[0]
+    body = HTMLParser("<html><body><b class=x>new</b> &lt;tail</body></html>").parse()
+    div.children = body.children[0].children
+    for child in div.children:
+        child.parent = div
+    expected = HTMLParser("<div><b class=x>new</b> &lt;tail</div><span>c</span>")
+    assert shape(root) == shape(expected.parse())
+    assert div.children[0].attributes == {"class": "x"}
+    assert div.children[0].parent == div
+
+
+def test_inner_html_with_columnar_dom(mocker):
+    from src.columnar import ColumnarParser
+    from src.graphics.tab import Tab
+    from src.util.node import walk
+
+    mocker.patch("src.network._get_headers_and_stream", return_value=({}, [HTML]))
+    tab = Tab(800, 600)
+    tab.parser_class = ColumnarParser
+    tab.load("http://test.test/")
+    div = tab.nodes.children[1].children[0]
+    tab.js.innerHTML_set(tab.js.get_handle(div), "<i>replaced</i>")
+    assert shape(div)[2] == [("i", {}, ["replaced"])]
+    words = [getattr(obj, "word", None) for obj in walk(tab.document)]
+    assert "replaced" in words
@@ -0,0 +1,75 @@
+import pytest
+
+HTML = (
+    "<div class=box><p>one</p><p>two <b>bold</b></p>"
+    + "<p style='color:red'>three</p></div>"
+)
+CSS = ".box { background-color: gray; font-size: 200%; } b { font-weight: bold; }"
+
+
+def styled():
+    from src.cssparser import CSSParser, style
+    from src.selector import cascade_priority
+    from src.text import HTMLParser
+
+    nodes = HTMLParser(HTML).parse()
+    style(nodes, sorted(CSSParser(CSS).parse(), key=cascade_priority))
+    return nodes
+
+
+def test_shared_styles():
+    from src.cssparser import ROOT_STYLE, distinct_styles
+
+    html = styled()
+    body = html.children[0]
+    div = body.children[0]
+    p1, p2, p3 = div.children
+    assert html.style is ROOT_STYLE and body.style is ROOT_STYLE
+    assert div.style["background-color"] == "gray"
+    assert div.style["font-size"] == "32.0px"
+    # 規則が当たらなければ、親から引き継ぐプロパティだけのスタイルを使い回す
+    assert "background-color" not in p1.style
+    assert p1.style is p2.style is p1.children[0].style
+    assert p1.style is div.style.inherited()
+    assert p3.style["color"] == "red" and p3.style is p3.children[0].style
+    b = p2.children[1]
+    assert b.style["font-weight"] == "bold" and b.style is b.children[0].style
+    assert distinct_styles(html) == 5
+
+
+def test_interned_and_immutable():
+    from src.cssparser import ComputedStyle, intern_style
+
+    a = intern_style({"color": "red", "font-size": "16px"})
+    b = intern_style({"font-size": "16px", "color": "red"})
+    assert a is b and isinstance(a, ComputedStyle)
+    assert a == {"color": "red", "font-size": "16px"}
+    assert hash(a) == hash(b) and a != intern_style({"color": "blue"})
+    with pytest.raises(TypeError):
+        a["color"] = "blue"  # type: ignore
+
+
+def test_typed_values_parsed_once():
+    from src.cssparser import typed_style
+    from src.layout import DocumentLayout
+    from src.util.draw_skia import PARSE_STATS, parse_color
+
+    html = styled()
+    div = html.children[0].children[0]
+    typed = typed_style(div.style)
+    assert typed.font_size == 32.0 and typed.border_radius == 0.0
+    assert typed.background_color == parse_color("gray")
+    assert typed_style(div.children[0].style).background_color is None
+    assert parse_color(typed.color) == typed.color
+
+    def frame():
+        document = DocumentLayout(html)
+        document.layout()
+        display_list = []
+        document.paint(display_list)
+
+    frame()
+    before = dict(PARSE_STATS)
+    # スタイルが変わらなければ、2回目からは何も解析しない
+    frame()
+    assert PARSE_STATS == before
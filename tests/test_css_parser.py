@@ -0,0 +1,72 @@
+def test_tokenize():
+    from src.cssparser import tokenize
+
+    tokens = tokenize("div.a > p { color : #fff; } /* x */")
+    # 入力の終わりは空文字列
+    assert tokens == ["div.a", ">", "p", "{", "color", ":", "#fff", ";", "}", ""]
+    # 文字列は引用符ごと1つのトークンにする
+    assert tokenize("a: 'b c' \"d") == ["a", ":", "'b c'", '"d', ""]
+
+
+def test_comments_are_skipped():
+    from src.cssparser import CSSParser
+
+    rules = CSSParser(
+        "/* a { color: red } */ b /* x */ { /* c: d; */ color: blue; } /* open"
+    ).parse()
+    assert len(rules) == 1
+    assert rules[0][0].tag == "b" and rules[0][1] == {"color": "blue"}
+
+
+def test_quoted_strings():
+    from src.cssparser import CSSParser
+
+    rules = CSSParser(
+        "p { font-family: \"Times New Roman\"; content: 'a;}b'; color: red }"
+    ).parse()
+    assert rules[0][1] == {
+        "font-family": "Times New Roman",
+        "content": "a;}b",
+        "color": "red",
+    }
+    body = CSSParser("content: 'it\\'s \\41'; color: blue").body()
+    assert body == {"content": "it's A", "color": "blue"}
+
+
+def test_unclosed_string_drops_declaration():
+    from src.cssparser import CSSParser
+
+    rules = CSSParser('a { content: "open\n; color: red } b { c: "x').parse()
+    assert len(rules) == 1 and rules[0][1] == {"color": "red"}
+
+
+def test_error_recovery():
+    from src.cssparser import CSSParser
+
+    rules = CSSParser(
+        "a, b { color: red } "
+        "p { margin: 0 auto; color: rgb(1, 2, 3); : x; font-size: 12px } "
+        "@media print { div { color: red } } "
+        "span { color: blue }"
+    ).parse()
+    # 値の最初の単語だけを使い、読めない宣言と規則は読み飛ばす
+    assert [(repr(selector), body) for selector, body in rules] == [
+        (
+            "TagSelector(p, priority=1)",
+            {"margin": "0", "color": "rgb", "font-size": "12px"},
+        ),
+        ("TagSelector(span, priority=1)", {"color": "blue"}),
+    ]
+
+
+def test_selector_and_body():
+    from src.cssparser import CSSParser
+    from src.selector import DesendantSelector
+
+    selector = CSSParser("div p.x").selector()
+    assert isinstance(selector, DesendantSelector)
+    assert CSSParser("div > p").selector() is None
+    assert CSSParser("color:red;background-color:blue").body() == {
+        "color": "red",
+        "background-color": "blue",
+    }
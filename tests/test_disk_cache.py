@@ -0,0 +1,141 @@
+import json
+import os
+
+
+def test_persist(tmp_path):
+    from src.disk_cache import DiskCache, MappedBody
+
+    cache = DiskCache(str(tmp_path))
+    assert cache.put("http://a/", {"etag": "x"}, "こんにちは", 100.0, 60.0)
+    assert cache.put("http://a/empty", {}, "", 100.0, 60.0)
+    cache.flush()
+
+    reopened = DiskCache(str(tmp_path))
+    entry = reopened.get("http://a/")
+    assert entry is not None
+    assert entry.headers == {"etag": "x"}
+    body = reopened.open_body(entry)
+    assert isinstance(body, MappedBody)
+    assert len(body) == len("こんにちは".encode("utf-8"))
+    assert body.text() == "こんにちは"
+    empty = reopened.get("http://a/empty")
+    assert empty is not None
+    assert reopened.open_body(empty).text() == ""
+
+
+def test_lru_budget(tmp_path):
+    from src.disk_cache import DiskCache
+
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    cache.put("a", {}, "a" * 40, 0.0, 60.0)
+    cache.put("b", {}, "b" * 40, 0.0, 60.0)
+    cache.get("a")
+    cache.put("c", {}, "c" * 40, 0.0, 60.0)
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.size == 80
+    assert len([f for f in os.listdir(tmp_path) if f.endswith(".body")]) == 2
+    assert not cache.put("d", {}, "d" * 101, 0.0, 60.0)
+
+
+def test_recover_from_crash(tmp_path):
+    """書き込み途中で落ちたファイルや壊れたエントリは読み込み時に捨てる"""
+    from src.disk_cache import DiskCache
+
+    cache = DiskCache(str(tmp_path))
+    cache.put("a", {}, "aaaa", 0.0, 60.0)
+    cache.put("b", {}, "bbbb", 0.0, 60.0)
+    cache.flush()
+    (tmp_path / "orphan.tmp").write_bytes(b"partial")
+    os.remove(cache._path(cache.get("b").name))
+
+    reopened = DiskCache(str(tmp_path))
+    assert "a" in reopened
+    assert "b" not in reopened
+    assert not (tmp_path / "orphan.tmp").exists()
+
+    (tmp_path / "index.json").write_text("{broken")
+    assert len(DiskCache(str(tmp_path))) == 0
+
+
+def test_index_writes_are_batched(tmp_path, mocker):
+    from src.disk_cache import DiskCache
+
+    cache = DiskCache(str(tmp_path), index_interval=60.0)
+    write_index = mocker.spy(cache, "_write_index")
+    for i in range(10):
+        cache.put("http://a/%d" % i, {}, "x", 0.0, 60.0)
+    assert write_index.call_count == 1
+
+    # flushするまでインデックスには最初の1件しかない
+    assert len(json.loads((tmp_path / "index.json").read_text())["entries"]) == 1
+    cache.get("http://a/0")
+    cache.flush()
+    reopened = DiskCache(str(tmp_path))
+    assert len(reopened) == 10
+    assert list(reopened._entries)[-1] == "http://a/0"
+    cache.flush()
+    assert write_index.call_count == 2
+
+
+def test_mapped_body_closes(tmp_path):
+    from src.disk_cache import SMALL_BODY, DiskCache
+    from src.network import CacheEntry
+
+    cache = DiskCache(str(tmp_path))
+    cache.put("small", {}, "s", 0.0, 60.0)
+    cache.put("large", {}, "é" * SMALL_BODY, 0.0, 60.0)
+
+    small = cache.open_body(cache.get("small"))
+    assert small._map is None
+    assert small.text() == "s"
+
+    large = cache.open_body(cache.get("large"))
+    assert large._map is not None
+    entry = CacheEntry({}, large, 0.0, 60.0)
+    assert "".join(entry.chunks()) == "é" * SMALL_BODY
+    # 流し終えたら文字列に置き換わり、mmapは閉じている
+    assert large._map is None
+    assert entry._body == "é" * SMALL_BODY
+    assert "".join(entry.chunks()) == "é" * SMALL_BODY
+
+
+def test_disk_hit_after_restart(tmp_path, mocker, pool):
+    from src.disk_cache import DiskCache
+    from src.network import HTTPCache, request
+    from tests.util.server import LocalServer
+
+    routes = {"/": (200, {"Cache-Control": "max-age=60"}, b"<p>kiosk</p>")}
+    with LocalServer(routes) as server:
+        mocker.patch("src.network.HTTP_CACHE", HTTPCache(disk=DiskCache(str(tmp_path))))
+        request(server.url("/"), None)
+
+        # 再起動してメモリキャッシュが空になった状態
+        cache = HTTPCache(disk=DiskCache(str(tmp_path)))
+        mocker.patch("src.network.HTTP_CACHE", cache)
+        _, body, _ = request(server.url("/"), None)
+        assert body == "<p>kiosk</p>"
+        assert len(server.requests) == 1
+        assert cache.stats()["disk_hits"] == 1
+
+
+def test_cookies_skip_disk(tmp_path, mocker, pool):
+    from src.disk_cache import DiskCache
+    from src.network import COOKIE_JAR, HTTPCache, request
+    from tests.util.server import LocalServer
+
+    routes = {
+        "/login": (200, {"Cache-Control": "max-age=60", "Set-Cookie": "id=1"}, b"hi"),
+        "/page": (200, {"Cache-Control": "max-age=60"}, b"page"),
+    }
+    disk = DiskCache(str(tmp_path))
+    mocker.patch("src.network.HTTP_CACHE", HTTPCache(disk=disk))
+    with LocalServer(routes) as server:
+        try:
+            request(server.url("/login"), None)
+            assert len(disk) == 0
+            assert "127.0.0.1" in COOKIE_JAR
+            request(server.url("/page"), None)
+            assert len(disk) == 0
+        finally:
+            COOKIE_JAR.pop("127.0.0.1", None)
@@ -0,0 +1,90 @@
+import os
+
+from tests.test_html_parser import shape
+
+HTML = (
+    "<!doctype html><head><title>t</title><link rel=stylesheet href=a.css></head>"
+    + "<body><div class=a id=x>Tom &amp;amp; Jerry <b>bold</b><br>next</div>"
+    + "<ul><li>one<li>two</ul><input name=q></body>"
+)
+
+
+def test_round_trip():
+    from src.dom_snapshot import deserialize, serialize
+    from src.text import NO_CHILDREN, HTMLParser
+
+    tree = HTMLParser(HTML).parse()
+    restored = deserialize(serialize(tree))
+    assert shape(restored) == shape(tree)
+    # デコード済みのテキストをもう一度デコードしない
+    div = restored.children[1].children[0]
+    assert div.children[0].text == "Tom &amp; Jerry "
+    assert div.children[0].parent is div
+    assert div.children[2].children is NO_CHILDREN
+    assert div.tag is tree.children[1].children[0].tag
+
+
+def test_memory_lru():
+    from src.dom_snapshot import DOMSnapshotCache, body_key, serialize
+    from src.text import HTMLParser
+
+    pages = ["<p>page {}</p>".format(i) for i in range(3)]
+    size = len(serialize(HTMLParser(pages[0]).parse()))
+    cache = DOMSnapshotCache(max_bytes=size * 2)
+    for page in pages:
+        cache.put(body_key(page), HTMLParser(page).parse())
+    assert body_key(pages[0]) not in cache
+    assert cache.get(body_key(pages[0])) is None
+    first = cache.get(body_key(pages[2]))
+    second = cache.get(body_key(pages[2]))
+    # 取り出すたびに別の木を作る
+    assert first is not second and shape(first) == shape(second)
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["evictions"] == 1
+
+
+def test_disk_cache(tmp_path):
+    from src.dom_snapshot import DOMSnapshotCache, body_key, serialize
+    from src.text import HTMLParser
+
+    directory = str(tmp_path)
+    pages = ["<p>page {}</p>".format(i) for i in range(3)]
+    size = len(serialize(HTMLParser(pages[0]).parse()))
+    cache = DOMSnapshotCache(directory=directory, max_disk_bytes=size * 2)
+    for page in pages:
+        cache.put(body_key(page), HTMLParser(page).parse())
+    assert cache.stats()["disk_entries"] == 2
+    assert len(os.listdir(directory)) == 2
+
+    # 再起動してもディスクから読める
+    cache = DOMSnapshotCache(directory=directory)
+    tree = cache.get(body_key(pages[2]))
+    assert shape(tree) == shape(HTMLParser(pages[2]).parse())
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get(body_key(pages[0])) is None
+
+    # 壊れたファイルは捨てる
+    key = body_key(pages[1])
+    with open(os.path.join(directory, key + ".dom"), "wb") as f:
+        f.write(b"broken")
+    cache = DOMSnapshotCache(directory=directory)
+    assert cache.get(key) is None
+    assert key not in cache
+
+
+def test_tab_fast_path(mocker):
+    from src.dom_snapshot import DOMSnapshotCache
+    from src.graphics.tab import Tab
+
+    mocker.patch("src.network._get_headers_and_stream", return_value=({}, [HTML]))
+    tab = Tab(800, 600)
+    tab.snapshots = DOMSnapshotCache()
+    tab.load("http://test.test/")
+    first = tab.nodes
+    # JSなどで書き換えても次に読み込んだ木には影響しない
+    first.children[1].children[0].attributes["class"] = "changed"
+    mocker.patch("src.graphics.tab.HTMLParser.parse", side_effect=AssertionError)
+    tab.load("http://test.test/")
+    assert tab.nodes is not first
+    assert tab.nodes.children[1].children[0].attributes["class"] == "a"
+    assert tab.snapshots.stats()["hits"] == 1
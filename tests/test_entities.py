@@ -0,0 +1,36 @@
+def test_named_and_numeric():
+    from src.entities import decode_entities
+
+    assert decode_entities("a &lt;b&gt; &amp; c") == "a <b> & c"
+    assert decode_entities("&copy; &#169; &#xA9; &#XA9;") == "© © © ©"
+    assert decode_entities("&#x1F600;") == "\U0001f600"
+
+
+def test_no_double_decoding():
+    """&amp;lt;は&lt;のまま残す"""
+    from src.entities import decode_entities
+
+    assert decode_entities("&amp;lt;") == "&lt;"
+
+
+def test_invalid_references():
+    from src.entities import decode_entities
+
+    assert decode_entities("&unknown; & &amp &#; &#xZZ;") == (
+        "&unknown; & &amp &#; &#xZZ;"
+    )
+    assert decode_entities("&#0;&#xD800;&#x110000;") == "�" * 3
+
+
+def test_entity_free_text_is_returned_as_is():
+    from src.entities import decode_entities
+
+    text = "plain text " * 10
+    assert decode_entities(text) is text
+
+
+def test_text_node():
+    from src.text import HTMLParser
+
+    tree = HTMLParser("<p>Tom &amp; Jerry &#8212; &hearts;</p>").parse()
+    assert tree.children[0].children[0].children[0].text == "Tom & Jerry — ♥"
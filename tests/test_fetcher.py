@@ -0,0 +1,74 @@
+import time
+
+
+def test_fetch_all_in_parallel(http_cache):
+    """全体の時間は合計ではなく一番遅いリソースに近くなる"""
+    from src.fetcher import Fetcher
+    from tests.util.server import LocalServer
+
+    routes = {"/{}.css".format(i): (200, {}, str(i).encode()) for i in range(4)}
+    with LocalServer(routes) as server:
+        for path in routes:
+            server.delays[path] = 0.2
+        fetcher = Fetcher()
+        start = time.perf_counter()
+        fetches = fetcher.fetch_all([server.url(path) for path in routes], None)
+        bodies = [fetch.result()[1] for fetch in fetches]
+        elapsed = time.perf_counter() - start
+        fetcher.shutdown()
+    assert bodies == ["0", "1", "2", "3"]
+    assert elapsed < 0.6
+
+
+def test_max_per_origin(http_cache):
+    from src.fetcher import Fetcher
+    from tests.util.server import LocalServer
+
+    routes = {"/{}.css".format(i): (200, {}, b"") for i in range(3)}
+    with LocalServer(routes) as server:
+        for path in routes:
+            server.delays[path] = 0.1
+        fetcher = Fetcher(max_per_origin=1)
+        start = time.perf_counter()
+        for fetch in fetcher.fetch_all([server.url(path) for path in routes], None):
+            fetch.result()
+        elapsed = time.perf_counter() - start
+        fetcher.shutdown()
+        assert elapsed >= 0.3
+        assert server.connections == 1
+
+
+def test_tab_subresources(http_cache):
+    """スタイルシートは文書の順番で適用し、CSPで拒否したものは取得しない"""
+    from src.graphics.tab import Tab
+    from src.selector import TagSelector
+    from tests.util.server import LocalServer
+
+    with LocalServer({}) as server:
+        origin = "http://127.0.0.1:{}".format(server.port)
+        server.routes.update(
+            {
+                "/": (
+                    200,
+                    {"Content-Security-Policy": "default-src " + origin},
+                    b"<link rel=stylesheet href=/slow.css>"
+                    + b"<link rel=stylesheet href=/fast.css>"
+                    + b"<link rel=stylesheet href=http://localhost:1/evil.css>"
+                    + b"<p>text</p>",
+                ),
+                "/slow.css": (200, {}, b"p { color: red; }"),
+                "/fast.css": (200, {}, b"p { color: blue; }"),
+            }
+        )
+        server.delays["/slow.css"] = 0.2
+        tab = Tab(800, 600)
+        tab.load(server.url("/"))
+        paths = [path for path, _ in server.requests]
+        assert sorted(paths) == ["/", "/fast.css", "/slow.css"]
+
+    colors = [
+        body["color"]
+        for selector, body in tab.rules
+        if isinstance(selector, TagSelector) and selector.tag == "p"
+    ]
+    assert colors == ["red", "blue"]
@@ -0,0 +1,228 @@
+import sys
+
+
+def shape(node):
+    """比較しやすいように木を入れ子のタプルにする"""
+    from src.text import Element
+
+    if isinstance(node, Element):
+        return (node.tag, node.attributes, [shape(child) for child in node.children])
+    return node.text
+
+
+def test_tree_shape():
+    from src.text import HTMLParser
+
+    tree = HTMLParser(
+        "<!doctype html><title>t</title><div class=a id='b'>x<br>y</div>tail"
+    ).parse()
+    assert shape(tree) == (
+        "html",
+        {},
+        [
+            ("head", {}, [("title", {}, ["t"])]),
+            (
+                "body",
+                {},
+                [
+                    ("div", {"class": "a", "id": "b"}, ["x", ("br", {}, []), "y"]),
+                    "tail",
+                ],
+            ),
+        ],
+    )
+
+
+def test_angle_brackets_in_text():
+    """以前の1文字ずつのパーサーと同じく<と>の間をタグとして扱う"""
+    from src.text import HTMLParser
+
+    tree = HTMLParser("<p>1 < 2</p><p>a > b</p>").parse()
+    body = tree.children[0]
+    assert shape(body) == (
+        "body",
+        {},
+        [("p", {}, ["1 ", " 2"]), ("p", {}, [("a", {}, [" b"])])],
+    )
+
+
+def test_unterminated_tag_and_whitespace():
+    from src.text import HTMLParser
+
+    tree = HTMLParser("  <div>\n  <span>text</span>  \n</div><p class=x").parse()
+    assert shape(tree) == (
+        "html",
+        {},
+        [("body", {}, [("div", {}, [("span", {}, ["text"])])])],
+    )
+
+
+def test_feed_matches_parse():
+    """どこでチャンクが切れても一度に解析したのと同じ木になる"""
+    from src.text import HTMLParser
+
+    html = (
+        "<!doctype html><head><title>t</title><link rel=stylesheet href=a.css>"
+        + "</head><body><div class='a b' id=x>hello <b>bold</b> &amp; more</div>"
+        + "<p>1 < 2</p><ul><li>one<li>two</ul>tail text"
+    )
+    expected = shape(HTMLParser(html).parse())
+    for size in (1, 2, 3, 7, 64):
+        parser = HTMLParser()
+        for i in range(0, len(html), size):
+            parser.feed(html[i : i + size])
+        assert shape(parser.close()) == expected, size
+
+
+def test_partial_tree():
+    """feedの途中でも開いている要素は木につながっている"""
+    from src.text import HTMLParser
+
+    parser = HTMLParser()
+    assert parser.root is None
+    parser.feed("<div><p>first</p><p>seco")
+    root = parser.root
+    assert root is not None
+    assert shape(root) == (
+        "html",
+        {},
+        [("body", {}, [("div", {}, [("p", {}, ["first"]), ("p", {}, [])])])],
+    )
+    parser.feed("nd</p><img src=a")
+    assert shape(root)[2][0][2][0][2][1] == ("p", {}, ["second"])
+    parser.feed(".png></div>")
+    assert parser.close() is root
+    assert shape(root)[2][0][2][0][2][2] == ("img", {"src": "a.png"}, [])
+
+
+def test_tab_parses_stream(mocker):
+    from src.graphics.tab import Tab
+
+    chunks = ["<p>hel", "lo</p><p", " class=x>wor", "ld</p>"]
+    mocker.patch("src.network._get_headers_and_stream", return_value=({}, chunks))
+    tab = Tab(800, 600)
+    tab.load("http://test.test/")
+    body = tab.nodes.children[0]
+    assert shape(body) == (
+        "body",
+        {},
+        [("p", {}, ["hello"]), ("p", {"class": "x"}, ["world"])],
+    )
+
+
+def test_deep_nesting_scales_linearly():
+    """1万段の入れ子でも、タグ1つあたりに見る開いた要素の数は深さによらない"""
+    from src.text import HTMLParser, INSERTION_MODE
+
+    class CountingList(list):
+        """読まれた要素の数を数えるunfinished"""
+
+        reads = 0
+
+        def __getitem__(self, i):
+            item = super().__getitem__(i)
+            self.reads += len(item) if isinstance(i, slice) else 1
+            return item
+
+        def __iter__(self):
+            for item in super().__iter__():
+                self.reads += 1
+                yield item
+
+        def __reversed__(self):
+            for item in super().__reversed__():
+                self.reads += 1
+                yield item
+
+        def __contains__(self, item):
+            self.reads += len(self)
+            return super().__contains__(item)
+
+    def parse(html):
+        parser = HTMLParser(html)
+        parser.unfinished = CountingList()
+        tree = parser.parse()
+        return tree, parser.unfinished.reads
+
+    n = 10_000
+    tree, deep_reads = parse("<div>" * n + "x" + "</div>" * n)
+    _, flat_reads = parse("<div></div>" * n + "x")
+    assert deep_reads <= flat_reads * 2
+    assert deep_reads < 10 * 2 * n
+
+    depth = 0
+    node = tree
+    while node.children:
+        node = node.children[0]
+        depth += 1
+    assert depth == n + 2  # body, n個のdiv, テキスト
+
+    parser = HTMLParser()
+    parser.feed("<div>" * n)
+    assert parser.mode == INSERTION_MODE.IN_BODY
+    parser.feed("</div>" * n)
+    assert len(parser.unfinished) == 2
+
+
+def test_compact_nodes():
+    from src.text import NO_CHILDREN, HTMLParser
+
+    tree = HTMLParser("<div class=a>one<br>two</div><div>three</div>").parse()
+    body = tree.children[0]
+    first, second = body.children
+    text, br, _ = first.children
+    for node in (tree, first, text, br):
+        assert not hasattr(node, "__dict__")
+    # タグ名と属性名は同じ文字列を使い回す
+    assert first.tag is second.tag
+    assert next(iter(first.attributes)) is sys.intern("class")
+    assert text.children is NO_CHILDREN and br.children is NO_CHILDREN
+
+
+def test_lazy_attributes():
+    from src.text import HTMLParser
+
+    tree = HTMLParser("<input><p id=x>text</p>").parse()
+    input, p = tree.children[0].children
+    assert input._attributes is None
+    assert input.get_attribute("value", "") == ""
+    assert input._attributes is None
+    # 書き込みはこれまでどおり辞書に対して行える
+    input.attributes["value"] = "abc"
+    input.attributes["value"] += "d"
+    assert input.get_attribute("value") == "abcd"
+    assert p.attributes == {"id": "x"}
+    assert p.get_attribute("id") == "x"
+
+
+def test_display_is_cached():
+    from src.text import DISPLAY_STATS, HTMLParser, LAYOUT_MODE, Element
+
+    tree = HTMLParser("<div><span>a</span></div>").parse()
+    div = tree.children[0].children[0]
+    before = dict(DISPLAY_STATS)
+    assert div.display == LAYOUT_MODE.INLINE
+    assert div.display == LAYOUT_MODE.INLINE
+    assert DISPLAY_STATS["recomputed"] == before["recomputed"] + 1
+
+    # 子が変わったときだけ計算し直す
+    div.append_child(Element("p", {}, div))
+    assert div.display == LAYOUT_MODE.BLOCK
+    div.children = []
+    assert div.display == LAYOUT_MODE.BLOCK  # 子のない要素
+    assert DISPLAY_STATS["recomputed"] == before["recomputed"] + 3
+    assert DISPLAY_STATS["invalidated"] == before["invalidated"] + 2
+
+
+def test_inner_html_invalidates_display(mocker):
+    from src.graphics.tab import Tab
+    from src.text import LAYOUT_MODE
+
+    html = "<div id=box><span>inline</span></div>"
+    mocker.patch("src.network._get_headers_and_stream", return_value=({}, [html]))
+    tab = Tab(800, 600)
+    tab.load("http://test.test/")
+    box = tab.nodes.children[0].children[0]
+    assert box.display == LAYOUT_MODE.INLINE
+    tab.js.run("document.querySelectorAll('#box')[0].innerHTML = '<p>block</p>';")
+    assert box.display == LAYOUT_MODE.BLOCK
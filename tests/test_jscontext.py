@@ -0,0 +1,22 @@
+def test_xhr_fetches_its_own_url(http_cache):
+    """相対URLのXHRはページのURLを基準に解決する"""
+    from src.graphics.tab import Tab
+    from tests.util.server import LocalServer
+
+    routes = {
+        "/dir/": (200, {}, b"<p>empty</p><script src=b.js></script>"),
+        "/dir/b.js": (
+            200,
+            {},
+            b"var x = new XMLHttpRequest(); x.open('GET', 'data', false); x.send();"
+            + b"document.querySelectorAll('p')[0].innerHTML = x.responseText;",
+        ),
+        "/dir/data": (200, {}, b"42"),
+    }
+    with LocalServer(routes) as server:
+        tab = Tab(800, 600)
+        tab.load(server.url("/dir/"))
+        paths = [path for path, _ in server.requests]
+    assert paths.count("/dir/data") == 1
+    p = tab.nodes.children[0].children[0]
+    assert [child.text for child in p.children] == ["42"]
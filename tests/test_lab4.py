@@ -53,7 +53,7 @@ def test_layout(mocker):
     from src.text import print_tree
 
     with mocker.patch(
-        "src.network._get_headers_and_body", return_value=("", "<p>text</p>")
+        "src.network._get_headers_and_stream", return_value=("", ["<p>text</p>"])
     ):
         browser = Browser()
         browser.load("http://test.test/example1")
@@ -146,8 +146,8 @@ def test_priority(mocker):
     from src.graphics.browser import Browser
 
     with mocker.patch(
-        "src.network._get_headers_and_body",
-        return_value=("", '<div style="color:blue">Test</div>'),
+        "src.network._get_headers_and_stream",
+        return_value=("", ['<div style="color:blue">Test</div>']),
     ):
         browser = Browser()
         browser.load("http://bar.com/")
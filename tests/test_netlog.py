@@ -0,0 +1,133 @@
+import gzip
+import json
+
+import pytest
+
+
+def test_timing_breakdown(http_cache):
+    from src.netlog import NetworkLog
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    body = ("<p>hello</p>" * 1000).encode("utf-8")
+    routes = {
+        "/": (200, {"Content-Encoding": "gzip"}, gzip.compress(body)),
+        "/a.css": (200, {}, b"p { color: red; }"),
+    }
+    log = NetworkLog()
+    with LocalServer(routes) as server:
+        request(server.url("/"), None, log=log)
+        request(server.url("/a.css"), server.url("/"), log=log)
+
+    first, second = log.entries
+    assert first.complete and second.complete
+    assert first.status == 200
+    assert first.dns == 0.0  # IPアドレスなので名前解決しない
+    assert first.connect is not None and first.connect > 0
+    assert first.ssl is None
+    assert first.wait is not None and first.wait > 0
+    assert first.decode > 0
+    assert first.transfer_size == len(gzip.compress(body))
+    assert first.body_size == len(body)
+    # 2つ目は使い回した接続なので接続の時間はない
+    assert second.dns is None and second.connect is None
+    assert second.transfer_size == second.body_size == len(b"p { color: red; }")
+
+
+def test_redirect_and_cache(http_cache):
+    from src.netlog import NetworkLog
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {
+        "/old": (301, {"Location": "/new"}, b""),
+        "/new": (200, {"Cache-Control": "max-age=60"}, b"moved"),
+    }
+    log = NetworkLog()
+    with LocalServer(routes) as server:
+        routes["/old"] = (301, {"Location": server.url("/new")}, b"")
+        _, body, _ = request(server.url("/old"), None, log=log)
+        assert body == "moved"
+        request(server.url("/new"), None, log=log)
+
+    redirect, moved, cached = log.entries
+    assert redirect.status == 301
+    assert redirect.redirect_url == moved.url
+    assert redirect.complete
+    assert moved.status == 200 and moved.cache is None
+    assert cached.cache == "hit"
+    assert cached.body_size == len(b"moved")
+    assert cached.transfer_size == 0
+
+
+def test_har_export(http_cache, tmp_path):
+    from src.netlog import NetworkLog
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    log = NetworkLog("http://page.test/")
+    with LocalServer({"/": (200, {"Content-Type": "text/html"}, b"hi")}) as server:
+        request(server.url("/"), None, log=log)
+        with pytest.raises(Exception):
+            request(server.url("/missing"), None, log=log)
+
+    path = tmp_path / "page.har"
+    log.dump(str(path))
+    har = json.loads(path.read_text())["log"]
+    assert har["version"] == "1.2"
+    assert har["pages"][0]["title"] == "http://page.test/"
+    ok, missing = har["entries"]
+    assert ok["request"]["url"] == server.url("/")
+    assert ok["request"]["headers"]
+    assert ok["response"]["status"] == 200
+    assert ok["response"]["content"] == {
+        "size": 2,
+        "compression": 0,
+        "mimeType": "text/html",
+    }
+    assert set(ok["timings"]) == {
+        "blocked",
+        "dns",
+        "connect",
+        "ssl",
+        "send",
+        "wait",
+        "receive",
+    }
+    assert ok["timings"]["ssl"] == -1
+    assert ok["time"] >= ok["timings"]["wait"]
+    assert missing["response"]["status"] == 0
+    assert "_error" in missing
+    assert len(log.waterfall().splitlines()) == 2
+
+
+def test_tab_load_log(http_cache):
+    """1回のloadで文書、スタイルシート、スクリプト、XHRを記録する"""
+    from src.fetcher import Fetcher
+    from src.graphics.tab import Tab
+    from tests.util.server import LocalServer
+
+    routes = {
+        "/": (
+            200,
+            {},
+            b"<link rel=stylesheet href=/a.css><p>text</p><script src=/b.js></script>",
+        ),
+        "/a.css": (200, {}, b"p { color: red; }"),
+        "/b.js": (
+            200,
+            {},
+            b"var x = new XMLHttpRequest(); x.open('GET', '/data', false); x.send();",
+        ),
+        "/data": (200, {}, b"42"),
+    }
+    with LocalServer(routes) as server:
+        tab = Tab(800, 600)
+        tab.fetcher = Fetcher()
+        tab.load(server.url("/"))
+        tab.fetcher.shutdown()
+
+    urls = sorted(entry.url for entry in tab.network_log.entries)
+    assert urls == sorted(server.url(p) for p in ["/", "/a.css", "/b.js", "/data"])
+    assert tab.network_log.entries[0].url == server.url("/")
+    assert all(entry.complete for entry in tab.network_log.entries)
@@ -0,0 +1,112 @@
+def test_max_age_hit(http_cache):
+    """max-ageの間はネットワークに問い合わせない"""
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {"/a.css": (200, {"Cache-Control": "max-age=60"}, b"p { color: red; }")}
+    with LocalServer(routes) as server:
+        for _ in range(3):
+            _, body, _ = request(server.url("/a.css"), None)
+            assert body == "p { color: red; }"
+        assert len(server.requests) == 1
+
+    stats = http_cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["stores"] == 1
+
+
+def test_no_store(http_cache):
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {"/": (200, {"Cache-Control": "no-store", "ETag": '"v1"'}, b"secret")}
+    with LocalServer(routes) as server:
+        request(server.url("/"), None)
+        request(server.url("/"), None)
+        assert len(server.requests) == 2
+        assert "if-none-match" not in server.requests[1][1]
+    assert len(http_cache) == 0
+
+
+def test_etag_revalidation(http_cache):
+    """期限切れのエントリはIf-None-Matchで再検証して304ならキャッシュを返す"""
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    def page(handler):
+        if handler.headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, b""
+        return 200, {"ETag": '"v1"', "Cache-Control": "no-cache"}, b"<p>hello</p>"
+
+    with LocalServer({"/": page}) as server:
+        _, body, _ = request(server.url("/"), None)
+        assert body == "<p>hello</p>"
+        headers, body, _ = request(server.url("/"), None)
+        assert body == "<p>hello</p>"
+        assert headers["etag"] == '"v1"'
+        assert server.requests[1][1]["if-none-match"] == '"v1"'
+        # 304のあとも同じ接続が使える
+        assert server.connections == 1
+
+    stats = http_cache.stats()
+    assert stats["revalidations"] == 1
+    assert stats["not_modified"] == 1
+
+
+def test_last_modified_and_expires(http_cache):
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+    routes = {
+        "/": (
+            200,
+            {
+                "Expires": "Thu, 01 Jan 1970 00:00:00 GMT",
+                "Last-Modified": last_modified,
+            },
+            b"old",
+        )
+    }
+    with LocalServer(routes) as server:
+        request(server.url("/"), None)
+        request(server.url("/"), None)
+        assert server.requests[1][1]["if-modified-since"] == last_modified
+
+
+def test_post_invalidates(http_cache):
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {"/": (200, {"Cache-Control": "max-age=60"}, b"form")}
+    with LocalServer(routes) as server:
+        request(server.url("/"), None)
+        request(server.url("/"), None, payload="a=1")
+        request(server.url("/"), None)
+        assert len(server.requests) == 3
+
+
+def test_lru_budget():
+    from src.network import HTTPCache
+
+    cache = HTTPCache(max_bytes=200)
+    headers = {"cache-control": "max-age=60"}
+    cache.store("a", headers, "a" * 60)
+    cache.store("b", headers, "b" * 60)
+    assert cache.get_fresh("a") is not None
+    cache.store("c", headers, "c" * 60)
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.size <= 200
+    assert cache.stats()["evictions"] == 1
+    assert not cache.store("d", headers, "d" * 200)
+
+
+def test_set_cookie_is_not_cached():
+    from src.network import HTTPCache
+
+    cache = HTTPCache()
+    assert not cache.store(
+        "a", {"cache-control": "max-age=60", "set-cookie": "x=1"}, ""
+    )
@@ -0,0 +1,112 @@
+import io
+
+
+def encode_chunks(chunks, trailer=b""):
+    out = [b"%x\r\n" % len(chunk) + chunk + b"\r\n" for chunk in chunks]
+    return b"".join(out) + b"0\r\n" + trailer + b"\r\n"
+
+
+def test_unchunked():
+    from src.network import unchunked
+
+    response = io.BufferedReader(
+        io.BytesIO(encode_chunks([b"Hello", b" ", b"world"]) + b"NEXT")
+    )
+    assert unchunked(response) == b"Hello world"
+    # 次のレスポンスの先頭まで読んでいる
+    assert response.read() == b"NEXT"
+
+
+def test_extensions_and_trailers():
+    from src.network import ChunkedDecoder
+
+    body = (
+        b'5;name="value"\r\nHello\r\n'
+        + b"6 ; sig=abc\r\n world\r\n"
+        + b"0\r\nExpires: Thu, 01 Jan 1970 00:00:00 GMT\r\nX-Check: 1\r\n\r\n"
+    )
+    decoder = ChunkedDecoder(io.BufferedReader(io.BytesIO(body)))
+    assert decoder.read_all() == b"Hello world"
+    assert decoder.chunks == 2
+    assert decoder.extensions == {"name": "value", "sig": "abc"}
+    assert decoder.trailers == {
+        "expires": "Thu, 01 Jan 1970 00:00:00 GMT",
+        "x-check": "1",
+    }
+
+
+def test_bare_lf_line_endings():
+    """改行がLFだけでも次のサイズの行を読み込まない"""
+    from src.network import unchunked
+
+    response = io.BufferedReader(io.BytesIO(b"5\nHello\n1\r\n \r\n5\nworld\n0\n\nNEXT"))
+    assert unchunked(response) == b"Hello world"
+    assert response.read() == b"NEXT"
+
+
+def test_malformed_chunk_end():
+    import pytest
+
+    from src.network import unchunked
+
+    response = io.BufferedReader(io.BytesIO(b"5\r\nHelloXY\r\n0\r\n\r\n"))
+    with pytest.raises(Exception, match="Malformed chunked body"):
+        unchunked(response)
+
+
+def test_linear_copies():
+    """チャンクが多くてもコピー量はボディの大きさに比例する"""
+    from src.network import ChunkedDecoder
+
+    n = 100_000
+    body = encode_chunks([b"abcdefgh"] * n)
+    decoder = ChunkedDecoder(io.BufferedReader(io.BytesIO(body)))
+    out = decoder.read_all()
+    assert len(out) == 8 * n
+    assert decoder.chunks == n
+    assert decoder.bytes_copied < 3 * len(out)
+
+
+def test_iter_splits_large_chunks():
+    from src.network import READ_SIZE, ChunkedDecoder
+
+    body = encode_chunks([b"a" * 10, b"b" * (READ_SIZE + 1)])
+    blocks = list(ChunkedDecoder(io.BufferedReader(io.BytesIO(body))))
+    assert blocks == [b"a" * 10, b"b" * READ_SIZE, b"b"]
+
+
+def test_iter_does_not_wait_for_next_chunk():
+    """次のチャンクが遅れても、届いたチャンクはすぐに返す"""
+    import socket
+    import threading
+    import time
+
+    from src.network import ChunkedDecoder
+
+    server, client = socket.socketpair()
+
+    def send():
+        server.sendall(b"5\r\nHello\r\n")
+        time.sleep(1.0)
+        server.sendall(b"6\r\n world\r\n0\r\n\r\n")
+
+    sender = threading.Thread(target=send)
+    start = time.perf_counter()
+    sender.start()
+    with client.makefile("rb") as response:
+        blocks = iter(ChunkedDecoder(response))
+        assert next(blocks) == b"Hello"
+        assert time.perf_counter() - start < 0.5
+        assert list(blocks) == [b" world"]
+    sender.join()
+    server.close()
+    client.close()
+
+
+def test_truncated():
+    import pytest
+
+    from src.network import unchunked
+
+    with pytest.raises(Exception):
+        unchunked(io.BufferedReader(io.BytesIO(b"10\r\nshort")))
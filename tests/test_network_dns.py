@@ -0,0 +1,174 @@
+import socket
+import threading
+import time
+
+import pytest
+
+
+class CountingResolver:
+    def __init__(self, hosts):
+        from src.network import hosts_resolver
+
+        self.resolve = hosts_resolver(hosts)
+        self.calls = []
+
+    def __call__(self, host, port):
+        self.calls.append(host)
+        return self.resolve(host, port)
+
+
+def test_ttl_cache():
+    from src.network import Resolver
+
+    backend = CountingResolver({"example.test": "127.0.0.1"})
+    resolver = Resolver(resolve=backend)
+    for _ in range(3):
+        addresses, _ = resolver.resolve("example.test", 80)
+        assert addresses == [(socket.AF_INET, ("127.0.0.1", 80))]
+    assert backend.calls == ["example.test"]
+    stats = resolver.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+
+    # TTLが切れたら引き直す
+    resolver = Resolver(ttl=0.0, resolve=backend)
+    resolver.resolve("example.test", 80)
+    resolver.resolve("example.test", 80)
+    assert len(backend.calls) == 3
+
+
+def test_negative_cache():
+    from src.network import Resolver
+
+    backend = CountingResolver({})
+    resolver = Resolver(resolve=backend)
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            resolver.resolve("missing.test", 80)
+    assert backend.calls == ["missing.test"]
+    assert resolver.stats()["negative_hits"] == 1
+
+    resolver = Resolver(negative_ttl=0.0, resolve=backend)
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            resolver.resolve("missing.test", 80)
+    assert len(backend.calls) == 3
+
+
+def test_ip_address_is_not_resolved():
+    from src.network import Resolver
+
+    backend = CountingResolver({})
+    resolver = Resolver(resolve=backend)
+    addresses, elapsed = resolver.resolve("127.0.0.1", 8080)
+    assert addresses == [(socket.AF_INET, ("127.0.0.1", 8080))]
+    assert elapsed == 0.0
+    assert backend.calls == []
+
+
+def test_concurrent_lookups_are_coalesced():
+    """同じホストを同時に引いても問い合わせは1回だけ"""
+    from src.network import Resolver, hosts_resolver
+
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    resolve = hosts_resolver({"example.test": "127.0.0.1"})
+
+    def slow(host, port):
+        calls.append(host)
+        started.set()
+        release.wait(5)
+        return resolve(host, port)
+
+    resolver = Resolver(resolve=slow)
+    results = []
+
+    def worker():
+        results.append(resolver.resolve("example.test", 80)[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    threads[0].start()
+    assert started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    while resolver.stats()["coalesced"] < 7:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls == ["example.test"]
+    assert len(results) == 8
+    assert all(r == [(socket.AF_INET, ("127.0.0.1", 80))] for r in results)
+
+
+def test_unexpected_error_does_not_block_waiters():
+    """OSError以外の例外でも待っているスレッドに伝わり、次のresolveも止まらない"""
+    from src.network import Resolver
+
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def broken(host, port):
+        calls.append(host)
+        started.set()
+        release.wait(5)
+        raise UnicodeError("label empty or too long")
+
+    resolver = Resolver(resolve=broken)
+    errors = []
+
+    def worker():
+        try:
+            resolver.resolve("example.test", 80)
+        except UnicodeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    threads[0].start()
+    assert started.wait(5)
+    threads[1].start()
+    while resolver.stats()["coalesced"] < 1:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+        assert not t.is_alive()
+    assert len(errors) == 2
+
+    # キャッシュしていないので、もう一度問い合わせる
+    with pytest.raises(UnicodeError):
+        resolver.resolve("example.test", 80)
+    assert calls == ["example.test", "example.test"]
+
+
+def test_hosts_resolver_request(pool, mocker):
+    """hostsの代わりの辞書で名前解決してローカルサーバーに繋ぐ"""
+    from src.network import Resolver, request
+    from tests.util.server import LocalServer
+
+    backend = CountingResolver({"example.test": "127.0.0.1"})
+    resolver = Resolver(resolve=backend)
+    mocker.patch("src.network.RESOLVER", resolver)
+    routes = {
+        "/": (200, {"Connection": "close"}, b"hello"),
+        "/a.css": (200, {"Connection": "close"}, b"p {}"),
+    }
+    with LocalServer(routes) as server:
+        _, body, _ = request("http://example.test:{}/".format(server.port), None)
+        assert body == "hello"
+        _, body, _ = request("http://example.test:{}/a.css".format(server.port), None)
+        assert body == "p {}"
+        assert server.requests[0][1]["host"] == "example.test"
+    assert backend.calls == ["example.test"]
+    assert resolver.stats()["hits"] == 1
+
+
+def test_unknown_host(pool, mocker):
+    from src.network import Resolver, hosts_resolver, request
+
+    mocker.patch("src.network.RESOLVER", Resolver(resolve=hosts_resolver({})))
+    with pytest.raises(socket.gaierror):
+        request("http://missing.test/", None)
@@ -0,0 +1,86 @@
+def test_keep_alive_reuse(pool):
+    """同じオリジンへのリクエストは1つの接続を使い回す"""
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {
+        "/": (200, {}, b"<link rel=stylesheet href=a.css>"),
+        "/a.css": (200, {"Content-Type": "text/css"}, b"p { color: red; }"),
+    }
+    with LocalServer(routes) as server:
+        _, body, _ = request(server.url("/"), None)
+        assert body == "<link rel=stylesheet href=a.css>"
+        for _ in range(3):
+            _, body, _ = request(server.url("/a.css"), server.url("/"))
+            assert body == "p { color: red; }"
+        assert server.connections == 1
+
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert stats["reused"] == 3
+
+
+def test_keep_alive_chunked(pool):
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {
+        "/chunked": (
+            200,
+            {"Transfer-Encoding": "chunked"},
+            b"5\r\nHello\r\n6\r\n world\r\n0\r\n\r\n",
+        ),
+        "/next": (200, {}, b"next"),
+    }
+    with LocalServer(routes) as server:
+        _, body, _ = request(server.url("/chunked"), None)
+        assert body == "Hello world"
+        _, body, _ = request(server.url("/next"), None)
+        assert body == "next"
+        assert server.connections == 1
+
+
+def test_connection_close_is_not_pooled(pool):
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {"/": (200, {"Connection": "close"}, b"bye")}
+    with LocalServer(routes) as server:
+        request(server.url("/"), None)
+        request(server.url("/"), None)
+        assert server.connections == 2
+
+    assert pool.stats()["reused"] == 0
+    assert pool.idle_count() == 0
+
+
+def test_stale_connection_is_retried(pool):
+    """サーバーが閉じたアイドル接続は新しい接続でやり直す"""
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {"/": (200, {}, b"ok")}
+    with LocalServer(routes) as server:
+        request(server.url("/"), None)
+        for conn in pool._idle:
+            conn.sock.shutdown(2)
+        _, body, _ = request(server.url("/"), None)
+        assert body == "ok"
+        assert server.connections == 2
+
+
+def test_idle_cap(mocker):
+    from src.network import ConnectionPool
+    from tests.util.server import LocalServer
+
+    pool = ConnectionPool(max_idle_per_host=1, max_idle=2)
+    with LocalServer({}) as server:
+        conns = [pool.acquire("http", "127.0.0.1", server.port)[0] for _ in range(3)]
+        for conn in conns:
+            pool.release(conn)
+        assert pool.idle_count() == 1
+        assert pool.stats()["evicted"] == 2
+        conn, reused = pool.acquire("http", "127.0.0.1", server.port)
+        assert reused and conn is conns[-1]
+        pool.release(conn)
+    pool.clear()
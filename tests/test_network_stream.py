@@ -0,0 +1,78 @@
+import gzip
+import random
+
+
+def chunked(data: bytes, size: int) -> bytes:
+    out = b""
+    for i in range(0, len(data), size):
+        piece = data[i : i + size]
+        out += b"%x\r\n" % len(piece) + piece + b"\r\n"
+    return out + b"0\r\n\r\n"
+
+
+def test_decode_utf8_split():
+    """チャンクの境界で分かれたマルチバイト文字"""
+    from src.network import decode_utf8
+
+    data = "あいうえお😀".encode("utf-8")
+    pieces = [data[i : i + 1] for i in range(len(data))]
+    assert "".join(decode_utf8(pieces)) == "あいうえお😀"
+
+
+def test_stream_gzip_chunked(pool, http_cache):
+    from src.network import request, request_stream
+    from tests.util.server import LocalServer
+
+    rand = random.Random(0)
+    text = "".join(rand.choice("<p>こんにちは😀</p>") for _ in range(300_000))
+    routes = {
+        "/": (
+            200,
+            {"Transfer-Encoding": "chunked", "Content-Encoding": "gzip"},
+            chunked(gzip.compress(text.encode("utf-8")), 7),
+        )
+    }
+    with LocalServer(routes) as server:
+        headers, chunks, _ = request_stream(server.url("/"), None)
+        assert headers["content-encoding"] == "gzip"
+        parts = list(chunks)
+        assert len(parts) > 1
+        assert "".join(parts) == text
+
+        _, body, _ = request(server.url("/"), None)
+        assert body == text
+        assert server.connections == 1
+
+
+def test_stream_content_length(pool, http_cache):
+    from src.network import request_stream
+    from tests.util.server import LocalServer
+
+    text = "x" * 300_000
+    with LocalServer({"/": (200, {}, text.encode())}) as server:
+        _, chunks, _ = request_stream(server.url("/"), None)
+        parts = list(chunks)
+        assert len(parts) > 1
+        assert "".join(parts) == text
+    assert pool.idle_count() == 1
+
+
+def test_stream_closed_early(pool, http_cache):
+    """途中で読むのをやめた接続はプールに戻さない"""
+    from src.network import request_stream
+    from tests.util.server import LocalServer
+
+    with LocalServer({"/": (200, {}, b"x" * 300_000)}) as server:
+        _, chunks, _ = request_stream(server.url("/"), None)
+        next(chunks)
+        chunks.close()
+    assert pool.idle_count() == 0
+    assert pool.stats()["discarded"] == 1
+
+
+def test_stream_data_url():
+    from src.network import request_stream
+
+    headers, chunks, _ = request_stream("data:text/html,Hello world", None)
+    assert headers["content-type"] == "text/html"
+    assert "".join(chunks) == "Hello world"
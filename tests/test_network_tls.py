@@ -0,0 +1,148 @@
+import shutil
+import ssl
+import subprocess
+
+import pytest
+
+
+def _openssl(*args, cwd):
+    subprocess.run(
+        ["openssl", *args],
+        cwd=cwd,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+@pytest.fixture(scope="module")
+def certs(tmp_path_factory):
+    """自己署名のCAと、それで署名した127.0.0.1用のサーバー証明書を作る"""
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not available")
+    d = tmp_path_factory.mktemp("certs")
+    _openssl(
+        "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+        "-keyout", "ca.key", "-out", "ca.pem", "-subj", "/CN=toy-browser test CA",
+        cwd=d,
+    )  # fmt: skip
+    _openssl(
+        "req", "-newkey", "rsa:2048", "-nodes",
+        "-keyout", "server.key", "-out", "server.csr", "-subj", "/CN=127.0.0.1",
+        cwd=d,
+    )  # fmt: skip
+    (d / "san.ext").write_text("subjectAltName=IP:127.0.0.1\n")
+    _openssl(
+        "x509", "-req", "-in", "server.csr", "-CA", "ca.pem", "-CAkey", "ca.key",
+        "-CAcreateserial", "-days", "1", "-extfile", "san.ext", "-out", "server.pem",
+        cwd=d,
+    )  # fmt: skip
+    return d
+
+
+@pytest.fixture
+def tls(mocker, certs, pool):
+    from src.network import TLSSessionCache
+
+    tls = TLSSessionCache()
+    client = ssl.create_default_context(cafile=str(certs / "ca.pem"))
+    tls.set_context(client)
+    mocker.patch("src.network.TLS", tls)
+    return tls
+
+
+def _server_context(certs):
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(str(certs / "server.pem"), str(certs / "server.key"))
+    return ctx
+
+
+def test_shared_context(tls, certs):
+    """HTTPSの接続ごとにcontextを作り直さず、set_contextしたものを使い続ける"""
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    client = tls.context()
+    routes = {"/": (200, {"Connection": "close"}, b"hello")}
+    with LocalServer(routes, _server_context(certs)) as server:
+        for _ in range(3):
+            _, body, _ = request(server.url("/"), None)
+            assert body == "hello"
+        assert server.connections == 3
+    assert tls.context() is client
+    assert tls.stats()["contexts"] == 0
+    assert tls.stats()["handshakes"] == 3
+
+
+def test_default_context_built_once():
+    """既定のcontextは最初に使うときに1度だけ作る"""
+    from src.network import TLSSessionCache
+
+    tls = TLSSessionCache()
+    context = tls.context()
+    assert tls.context() is context
+    assert tls.stats()["contexts"] == 1
+    # Noneを渡すと次に使うときに作り直す
+    tls.set_context(None)
+    assert tls.context() is not context
+    assert tls.stats()["contexts"] == 2
+
+
+def test_session_resumption(tls, certs):
+    """2回目以降の接続は保存したセッションで再開する"""
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {"/": (200, {"Connection": "close"}, b"hello")}
+    with LocalServer(routes, _server_context(certs)) as server:
+        for _ in range(4):
+            _, body, _ = request(server.url("/"), None)
+            assert body == "hello"
+
+    stats = tls.stats()
+    assert stats["handshakes"] == 4
+    assert stats["resumed"] == 3
+    assert stats["resumption_rate"] == 0.75
+    assert stats["sessions"] == 1
+    assert stats["avg_full_ms"] > 0
+    assert stats["avg_resumed_ms"] > 0
+
+
+def test_keep_alive_skips_handshake(tls, certs):
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {"/": (200, {}, b"hello")}
+    with LocalServer(routes, _server_context(certs)) as server:
+        for _ in range(3):
+            request(server.url("/"), None)
+        assert server.connections == 1
+    assert tls.stats()["handshakes"] == 1
+
+
+def test_untrusted_certificate(mocker, certs, pool):
+    """テスト用のCAを信頼していなければ検証に失敗する"""
+    from src.network import TLSSessionCache, request
+    from tests.util.server import LocalServer
+
+    tls = TLSSessionCache()
+    mocker.patch("src.network.TLS", tls)
+    with LocalServer({"/": (200, {}, b"hello")}, _server_context(certs)) as server:
+        with pytest.raises(ssl.SSLCertVerificationError):
+            request(server.url("/"), None)
+    assert tls.stats()["contexts"] == 1
+
+
+def test_context_reset_drops_sessions(tls, certs):
+    from src.network import request
+    from tests.util.server import LocalServer
+
+    routes = {"/": (200, {"Connection": "close"}, b"hello")}
+    with LocalServer(routes, _server_context(certs)) as server:
+        request(server.url("/"), None)
+        assert tls.stats()["sessions"] == 1
+        # 別のcontextで作ったセッションは再開できない
+        tls.set_context(ssl.create_default_context(cafile=str(certs / "ca.pem")))
+        assert tls.stats()["sessions"] == 0
+        request(server.url("/"), None)
+    assert tls.stats()["resumed"] == 0
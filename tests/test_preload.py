@@ -0,0 +1,101 @@
+def test_scanner_split_chunks():
+    """タグの途中で切れたチャンクでもURLを拾う"""
+    from src.preload import PreloadScanner
+
+    html = (
+        "<!doctype html><head><link rel=stylesheet href='a.css'>"
+        + "<link rel=icon href=icon.png>"
+        + '<script src="/js/b.js"></script></head>'
+        + "<body><p>1 < 2</p><script src=a.css></script>"
+        + "<LINK REL=stylesheet HREF=http://other.test/c.css></body>"
+    )
+    found = []
+    scanner = PreloadScanner(
+        "http://test.test/dir/page", lambda *args: found.append(args)
+    )
+    for c in html:
+        scanner.feed(c)
+    scanner.close()
+    assert found == [
+        ("stylesheet", "http://test.test/dir/a.css"),
+        ("script", "http://test.test/js/b.js"),
+        ("stylesheet", "http://other.test/c.css"),
+    ]
+
+
+def test_scanner_tag_names():
+    """タグ名がlinkやscriptで始まるだけのタグは読まない"""
+    from src.preload import PreloadScanner
+
+    html = (
+        "<linkfoo rel=stylesheet href=a.css><scripts src=a.js></scripts>"
+        + "<script-x src=b.js><links rel=stylesheet href=b.css>"
+        + "<LINK\nrel=stylesheet href=c.css><script\tsrc=c.js></script>"
+    )
+    found = []
+    scanner = PreloadScanner("http://test.test/", lambda *args: found.append(args))
+    scanner.feed(html)
+    scanner.close()
+    assert found == [
+        ("stylesheet", "http://test.test/c.css"),
+        ("script", "http://test.test/c.js"),
+    ]
+
+
+def test_tab_uses_preloads(http_cache):
+    from src.fetcher import Fetcher
+    from src.graphics.tab import Tab
+    from tests.util.server import LocalServer
+
+    with LocalServer({}) as server:
+        origin = "http://127.0.0.1:{}".format(server.port)
+        server.routes.update(
+            {
+                "/": (
+                    200,
+                    {"Content-Security-Policy": "default-src " + origin},
+                    b"<link rel=stylesheet href=/a.css>"
+                    + b"<link rel=stylesheet href=http://localhost:1/evil.css>"
+                    + b"<p>text</p><script src=/b.js></script>",
+                ),
+                "/a.css": (200, {}, b"p { color: red; }"),
+                "/b.js": (200, {}, b"var x = 1;"),
+            }
+        )
+        tab = Tab(800, 600)
+        tab.fetcher = Fetcher()
+        tab.load(server.url("/"))
+        tab.fetcher.shutdown()
+        assert sorted(path for path, _ in server.requests) == ["/", "/a.css", "/b.js"]
+
+    assert tab.fetcher.stats == {
+        "preloaded": 2,
+        "preload_hits": 2,
+        "preload_discarded": 0,
+    }
+
+
+def test_unclaimed_preloads_are_not_reused(http_cache):
+    """使われなかったプリロードは読み込みの終わりに捨て、次の読み込みでは使わない"""
+    from src.fetcher import Fetcher
+    from tests.util.server import LocalServer
+
+    with LocalServer({"/a.css": (200, {}, b"p { color: red; }")}) as server:
+        fetcher = Fetcher()
+        url = server.url("/a.css")
+        first: dict = {}
+        fetcher.preload(url, None, first)
+        first[url].result()
+        fetcher.discard(first)
+        assert first == {}
+
+        second: dict = {}
+        _, body, _ = fetcher.fetch(url, None, preloads=second).result()
+        fetcher.shutdown()
+        assert body == "p { color: red; }"
+        assert [path for path, _ in server.requests] == ["/a.css", "/a.css"]
+    assert fetcher.stats == {
+        "preloaded": 1,
+        "preload_hits": 0,
+        "preload_discarded": 1,
+    }
@@ -0,0 +1,150 @@
+import random
+
+
+def prepare(html, css):
+    from src.cssparser import CSSParser, style
+    from src.selector import cascade_priority
+    from src.text import HTMLParser
+
+    nodes = HTMLParser(html).parse()
+    rules = sorted(CSSParser(css).parse(), key=cascade_priority)
+    style(nodes, rules)
+    return nodes, rules
+
+
+def find_tag(nodes, tag, index=0):
+    from src.text import Element
+    from src.util.node import walk
+
+    return [
+        node for node in walk(nodes) if isinstance(node, Element) and node.tag == tag
+    ][index]
+
+
+def test_keystroke_cost_does_not_depend_on_document_size():
+    from src.cssparser import restyle
+
+    counts = []
+    for rows in [10, 1000]:
+        html = "<div><input value=a></div>" + "<p>text <b>bold</b></p>" * rows
+        nodes, rules = prepare(html, "p { color: gray; } input { color: red; }")
+        input = find_tag(nodes, "input")
+        input.set_attribute("value", "ab")
+        counts.append(restyle(nodes, rules))
+        # 変わっていなければ何も計算しない
+        assert restyle(nodes, rules) == 0
+    assert counts[0] == counts[1] == 1
+
+
+def test_unchanged_attribute_is_not_dirty():
+    from src.cssparser import restyle
+
+    nodes, rules = prepare("<input value=a>", "")
+    find_tag(nodes, "input").set_attribute("value", "a")
+    assert restyle(nodes, rules) == 0
+
+
+def test_class_change_restyles_descendants():
+    from src.cssparser import restyle
+
+    nodes, rules = prepare(
+        "<div><p>a</p><p>b</p></div><div><p>c</p></div>",
+        ".on p { color: red; }",
+    )
+    find_tag(nodes, "div").set_attribute("class", "on")
+    restyle(nodes, rules)
+    assert [find_tag(nodes, "p", i).style["color"] for i in range(3)] == [
+        "red",
+        "red",
+        "black",
+    ]
+
+
+def test_inherited_change_propagates_to_children():
+    from src.cssparser import restyle
+
+    nodes, rules = prepare("<div><p>a<b>b</b></p></div><p>c</p>", "")
+    div = find_tag(nodes, "div")
+    div.set_attribute("style", "color:blue")
+    # div、p、テキスト、b、テキスト
+    assert restyle(nodes, rules) == 5
+    b = find_tag(nodes, "b")
+    assert b.style["color"] == "blue" and b.children[0].style["color"] == "blue"
+    assert find_tag(nodes, "p", 1).style["color"] == "black"
+
+
+def test_non_inherited_change_stays_on_element():
+    from src.cssparser import restyle
+
+    nodes, rules = prepare("<div><p>a</p></div>", "")
+    find_tag(nodes, "div").set_attribute("style", "background-color:red")
+    assert restyle(nodes, rules) == 1
+    assert find_tag(nodes, "div").style["background-color"] == "red"
+
+
+def test_new_children_are_styled():
+    from src.cssparser import restyle
+    from src.text import HTMLParser
+
+    nodes, rules = prepare("<div><p>a</p></div>", "b { color: red; }")
+    div = find_tag(nodes, "div")
+    new_nodes = HTMLParser("<p><b>new</b></p>").parse().children[0].children
+    div.children = new_nodes
+    for child in new_nodes:
+        child.parent = div
+    restyle(nodes, rules)
+    b = find_tag(nodes, "b")
+    assert b.style["color"] == "red" and b.children[0].style["color"] == "red"
+
+
+def test_same_result_as_full_style():
+    from src.cssparser import restyle, style
+    from src.text import Element
+    from src.util.node import walk
+
+    rng = random.Random(0)
+    tags = ["div", "p", "span", "b"]
+    classes = ["a", "b", "c"]
+    css = (
+        ".a { color: red; } .b span { font-weight: bold; } "
+        "div.c { font-size: 150%; } p { background-color: gray; }"
+    )
+    for _ in range(20):
+        parts = []
+        for _ in range(40):
+            tag = rng.choice(tags)
+            parts.append("<{} class={}>x".format(tag, rng.choice(classes)))
+            if rng.random() < 0.5:
+                parts.append("</{}>".format(tag))
+        nodes, rules = prepare("".join(parts), css)
+        elements = [node for node in walk(nodes) if isinstance(node, Element)]
+        for _ in range(5):
+            element = rng.choice(elements)
+            if rng.random() < 0.5:
+                element.set_attribute("class", rng.choice(classes))
+            else:
+                element.set_attribute("style", "color:" + rng.choice(["blue", "red"]))
+        restyle(nodes, rules)
+        incremental = [node.style for node in walk(nodes)]
+        style(nodes, rules)
+        assert incremental == [node.style for node in walk(nodes)]
+
+
+def test_tab_keypress_restyles_incrementally(mocker):
+    from src.cssparser import STYLE_SHARING_STATS
+    from src.graphics.tab import Tab
+
+    html = "<form><input name=q></form>" + "<p>text</p>" * 200
+    mocker.patch("src.network._get_headers_and_stream", return_value=({}, [html]))
+    tab = Tab(800, 600)
+    tab.load("http://test.test/")
+    input = find_tag(tab.nodes, "input")
+    tab.forcus = input
+    for key in STYLE_SHARING_STATS:
+        STYLE_SHARING_STATS[key] = 0
+    tab.keypress("a")
+    tab.keypress("b")
+    tab.backspace()
+    assert input.get_attribute("value") == "a"
+    # 入力欄だけを計算し直す
+    assert sum(STYLE_SHARING_STATS.values()) == 3
@@ -0,0 +1,84 @@
+import random
+
+
+def styles(html, css, sharing=True):
+    from src.cssparser import CSSParser, style, style_node
+    from src.selector import cascade_priority
+    from src.text import HTMLParser
+    from src.util.node import walk
+
+    nodes = HTMLParser(html).parse()
+    rules = sorted(CSSParser(css).parse(), key=cascade_priority)
+    if sharing:
+        style(nodes, rules)
+    else:
+        for node in walk(nodes):
+            style_node(node, rules)
+    return [(node, node.style) for node in walk(nodes)]
+
+
+def reset_stats():
+    from src.cssparser import STYLE_SHARING_STATS
+
+    for name in STYLE_SHARING_STATS:
+        STYLE_SHARING_STATS[name] = 0
+    return STYLE_SHARING_STATS
+
+
+def test_siblings_and_cousins():
+    stats = reset_stats()
+    html = "<ul>" + "<li class=a>x</li>" * 50 + "</ul>"
+    html = "<div>{}</div><div>{}</div>".format(html, html)
+    shared = styles(html, "li.a { color: red; } ul { font-size: 90%; }")
+    li = [style for node, style in shared if getattr(node, "tag", "") == "li"]
+    assert len(li) == 100 and all(style["color"] == "red" for style in li)
+    # 親のスタイルが同じなら、いとこの要素の間でも共有する
+    assert stats["misses"] < 5 and stats["hits"] > 100
+
+
+def test_descendant_selector_limits_sharing():
+    stats = reset_stats()
+    html = (
+        "<div id=side><p class=x>a</p><p class=x>b</p></div>"
+        + "<div><p class=x>c</p><p class=x style='color:green'>d</p></div>"
+    )
+    css = "#side p { color: red; }"
+    shared = styles(html, css)
+    colors = [
+        style["color"] for node, style in shared if getattr(node, "tag", "") == "p"
+    ]
+    assert colors == ["red", "red", "black", "green"]
+    assert stats["hits"] == 1 and stats["skipped"] == 2
+
+
+def test_same_result_as_without_sharing():
+    rng = random.Random(0)
+    tags = ["div", "p", "span", "li", "b"]
+    classes = ["a", "b", "c"]
+    for _ in range(30):
+        parts = []
+        for _ in range(60):
+            tag = rng.choice(tags)
+            attributes = ""
+            if rng.random() < 0.6:
+                attributes += " class='{}'".format(rng.choice(classes))
+            if rng.random() < 0.1:
+                attributes += " id=i{}".format(rng.randint(0, 3))
+            if rng.random() < 0.1:
+                attributes += " style='color:green'"
+            parts.append("<{}{}>t".format(tag, attributes))
+            if rng.random() < 0.5:
+                parts.append("</{}>".format(tag))
+        css = " ".join(
+            "{} {{ color: {}; font-size: {}%; }}".format(selector, color, size)
+            for selector, color, size in [
+                (rng.choice(tags), "red", 120),
+                ("." + rng.choice(classes), "blue", 80),
+                ("#i{}".format(rng.randint(0, 3)), "gray", 150),
+                ("{} .{}".format(rng.choice(tags), rng.choice(classes)), "lime", 90),
+            ][: rng.randint(1, 4)]
+        )
+        html = "".join(parts)
+        with_sharing = styles(html, css)
+        without = styles(html, css, sharing=False)
+        assert [s for _, s in with_sharing] == [s for _, s in without]
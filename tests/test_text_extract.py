@@ -0,0 +1,58 @@
+import io
+
+HTML = (
+    "<html><head><title>skip &amp; me</title></head>"
+    + "<BODY class=main><h1>Tom &amp; Jerry</h1><p>1 &lt; 2 &copy; &#x41;&#66;</p>"
+    + "<p>&unknown; a > b</p></body>after body</html>"
+)
+TEXT = "Tom & Jerry1 < 2 © AB&unknown; a > b"
+
+
+def extract(chunks):
+    from src.network import extract_text
+
+    out = io.StringIO()
+    extract_text(chunks, out)
+    return out.getvalue()
+
+
+def test_lex():
+    from src.network import lex
+
+    assert lex(HTML) == TEXT
+    # bodyが始まるまでは何も出さない
+    assert lex("<html><p>no body &amp;</p></html>") == ""
+
+
+def test_chunk_boundaries():
+    # どこでチャンクが切れても結果は変わらない
+    for i in range(len(HTML)):
+        for j in range(i, len(HTML), 7):
+            assert extract([HTML[:i], HTML[i:j], HTML[j:]]) == TEXT
+
+
+def test_bounded_memory():
+    from src.network import TextExtractor
+
+    out = io.StringIO()
+    extractor = TextExtractor(out)
+    extractor.feed("<body>")
+    for i in range(1000):
+        extractor.feed("<p>paragraph {} &amp;".format(i))
+        extractor.feed("amp; " + "x" * 1000 + "</p><" + "!-- " * 100)
+        extractor.feed(" -->")
+        assert sum(map(len, extractor._text)) <= TextExtractor.MAX_ENTITY
+        assert len(extractor._tag_head) <= TextExtractor.MAX_TAG_HEAD
+    extractor.close()
+    assert out.getvalue().count("&amp;") == 1000
+
+
+def test_show(capsys, tmp_path):
+    from src.network import load, show
+
+    path = tmp_path / "page.html"
+    path.write_text(HTML)
+    load("file://" + str(path))
+    assert capsys.readouterr().out == TEXT + "\n"
+    show(iter([HTML[:10], HTML[10:]]), ["view-source"])
+    assert capsys.readouterr().out == HTML + "\n"
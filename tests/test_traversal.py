@@ -0,0 +1,110 @@
+import sys
+
+
+def make_tree():
+    from src.text import HTMLParser
+
+    return HTMLParser(
+        "<div><p>a<b>b</b></p><ul><li>1</li><li>2<i>x</i></li></ul>tail</div>"
+    ).parse()
+
+
+def recursive_pre(node, out):
+    out.append(node)
+    for child in node.children:
+        recursive_pre(child, out)
+    return out
+
+
+def recursive_post(node, out):
+    for child in node.children:
+        recursive_post(child, out)
+    out.append(node)
+    return out
+
+
+def test_walk_orders():
+    from src.text import Element, Text
+    from src.util.node import (
+        find,
+        find_instance,
+        find_last,
+        tree_to_list,
+        walk,
+        walk_post,
+    )
+
+    tree = make_tree()
+    assert list(walk(tree)) == recursive_pre(tree, [])
+    assert tree_to_list(tree, []) == recursive_pre(tree, [])
+    assert list(walk_post(tree)) == recursive_post(tree, [])
+
+    def is_tag(tag):
+        return lambda node: isinstance(node, Element) and node.tag == tag
+
+    # pruneしたノードの子孫には入らない
+    ul = find(tree, is_tag("ul"))
+    pruned = list(walk(tree, prune=is_tag("ul")))
+    assert ul in pruned and not any(is_tag("li")(node) for node in pruned)
+    # 部分木だけをたどる
+    assert list(walk(ul)) == recursive_pre(ul, [])
+    assert find_last(tree, is_tag("li")) is ul.children[1]
+    assert find(tree, is_tag("table")) is None
+    # 型で絞ってから調べる
+    assert (
+        find_instance(tree, Text, lambda text: text.text == "2").parent
+        is ul.children[1]
+    )
+    assert find_instance(tree, Element, lambda elt: elt.tag == "x") is None
+
+
+def test_deep_document(sorted_default_rules, capsys):
+    """5万段の入れ子でもRecursionErrorにならない"""
+    from src.cssparser import style
+    from src.layout import DocumentLayout
+    from src.text import HTMLParser, print_tree
+    from src.util.node import walk, walk_post
+
+    n = 50_000
+    assert n > sys.getrecursionlimit()
+    for tag in ("div", "b"):
+        html = "<{}>".format(tag) * n + "deep" + "</{}>".format(tag) * n
+        nodes = HTMLParser(html).parse()
+        assert sum(1 for _ in walk(nodes)) == sum(1 for _ in walk_post(nodes))
+        style(nodes, sorted_default_rules)
+        document = DocumentLayout(nodes)
+        document.layout()
+        display_list = []
+        document.paint(display_list)
+        assert document.height > 0
+
+    # 字下げの分だけ出力が大きくなるので、浅めの木で確かめる
+    n = sys.getrecursionlimit() * 2
+    nodes = HTMLParser("<div>" * n).parse()
+    capsys.readouterr()
+    print_tree(nodes)
+    assert len(capsys.readouterr().out.splitlines()) == n + 2
+
+
+def test_hit_test_allocation(mocker):
+    import tracemalloc
+
+    from src.graphics.tab import Tab
+    from src.util.node import tree_to_list
+
+    html = "<body>" + "<p>some words here</p>" * 2000 + "</body>"
+    mocker.patch("src.network._get_headers_and_stream", return_value=({}, [html]))
+    tab = Tab(800, 600)
+    tab.load("http://test.test/")
+
+    def peak(f):
+        tracemalloc.start()
+        f()
+        _, size = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return size
+
+    # 以前のclickはレイアウトツリー全体のリストを作っていた
+    full_list = peak(lambda: tree_to_list(tab.document, []))
+    click = peak(lambda: tab.click(50, 30))
+    assert click * 4 < full_list
@@ -3,6 +3,8 @@ This file contains unittests helpers for chapters 11 and onward
 """
 
 import io
+import socket as stdsocket
+
 import sdl2
 import skia
 
@@ -35,6 +37,8 @@ class socket:
                 if name.lower() == "content-length"
             )
 
+    sendall = send
+
     def makefile(self, mode, encoding=None, newline=None):
         assert self.connected and self.host and self.port
         if self.port == 80 and self.scheme == "http":
@@ -69,6 +73,13 @@ class socket:
 
     @classmethod
     def patch(cls, mocker):
+        from src.network import Resolver
+
+        # モックのソケットはconnectに渡されたホスト名でURLを組み立てる
+        def resolve(host, port):
+            return [(stdsocket.AF_INET, (host, port))]
+
+        mocker.patch("src.network.RESOLVER", Resolver(resolve=resolve))
         return mocker.patch("socket.socket", wraps=cls)
 
     @classmethod
@@ -101,7 +112,13 @@ class ssl:
 
     @classmethod
     def patch(cls, mocker):
-        return mocker.patch("ssl.create_default_context", wraps=cls)
+        from src.network import TLSSessionCache
+
+        # モックのcontextを差し込んだTLSSessionCacheに差し替える
+        tls = TLSSessionCache()
+        tls.set_context(cls())  # type: ignore
+        mocker.patch("src.network.TLS", tls)
+        return tls
 
 
 def SDL_GetWindowSurfacePatched(window):
@@ -0,0 +1,97 @@
+"""
+Local HTTP server used by the network tests
+"""
+
+import http.server
+import ssl
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Tuple, Union
+
+Route = Tuple[int, Dict[str, str], bytes]
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # クライアントが途中で切断するテストがあるので接続エラーは表示しない
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class LocalServer:
+    """127.0.0.1の空いているポートで動くHTTP/1.1サーバー
+
+    routes: path -> (status, headers, body) またはハンドラを受け取ってそれを返す関数
+    ssl_context: 渡すとHTTPSで待ち受ける
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, Union[Route, Callable[..., Route]]],
+        ssl_context: Union[ssl.SSLContext, None] = None,
+    ):
+        self.routes = routes
+        self.scheme = "https" if ssl_context else "http"
+        self.connections = 0
+        self.requests: List[Tuple[str, Dict[str, str]]] = []
+        self.delays: Dict[str, float] = {}
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                length = int(self.headers.get("content-length", "0"))
+                self.rfile.read(length)
+                self._respond()
+
+            def _respond(self):
+                server.requests.append(
+                    (self.path, {k.lower(): v for k, v in self.headers.items()})
+                )
+                if self.path in server.delays:
+                    time.sleep(server.delays[self.path])
+                route = server.routes.get(self.path, (404, {}, b"not found"))
+                if callable(route):
+                    route = route(self)
+                status, headers, body = route
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                if "transfer-encoding" not in {k.lower() for k in headers}:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = _Server(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        if ssl_context:
+            self.httpd.socket = ssl_context.wrap_socket(
+                self.httpd.socket, server_side=True
+            )
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.05,), daemon=True
+        )
+
+    def url(self, path: str) -> str:
+        return "{}://127.0.0.1:{}{}".format(self.scheme, self.port, path)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()